@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_init
 
 # Get Redis URL from environment or default to localhost
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -16,4 +17,17 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    beat_schedule={
+        "refresh-leaderboards": {
+            "task": "backend.tasks.refresh_leaderboards",
+            "schedule": float(os.getenv("LEADERBOARD_REFRESH_SECONDS", "600")),
+        },
+    },
 )
+
+
+@worker_init.connect
+def upgrade_database_on_start(**kwargs):
+    """Tasks query the new columns and constraints, so the schema is upgraded before any runs."""
+    from backend.shared.migrations import upgrade_database
+    upgrade_database()
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from .config import Config
+from .rate_limiter import RateLimiter, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRiotAPIClient:
+    """
+    asyncio counterpart of RiotAPIClient with one keep-alive connection pool
+    per routing host and a bound on in-flight requests.
+    Use as `async with AsyncRiotAPIClient() as client:` so pools are closed.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        connections_per_host: Optional[int] = None,
+        base_url_template: Optional[str] = None,
+        timeout: float = 10.0,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        self.max_concurrency = max_concurrency or Config.RIOT_MAX_CONCURRENCY
+        self.connections_per_host = connections_per_host or Config.RIOT_CONNECTIONS_PER_HOST
+        self.base_url_template = base_url_template or Config.RIOT_API_BASE_URL
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            await session.close()
+
+    def _base_url(self, routing: str) -> str:
+        return self.base_url_template.format(routing=routing)
+
+    def _get_session(self, routing: str) -> aiohttp.ClientSession:
+        session = self._sessions.get(routing)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connections_per_host,
+                limit_per_host=self.connections_per_host,
+                keepalive_timeout=30,
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+            )
+            self._sessions[routing] = session
+        return session
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore binds to the running event loop.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _get_json(self, routing: str, method: str, path: str, tag: str, params: Optional[dict] = None):
+        headers = {"X-Riot-Token": Config.RIOT_API_KEY}
+        session = self._get_session(routing)
+        url = f"{self._base_url(routing)}{path}"
+        for attempt in range(Config.RIOT_MAX_RETRIES):
+            # Wait for quota before taking a concurrency slot
+            await self.rate_limiter.acquire_async(routing, method)
+            async with self._get_semaphore():
+                try:
+                    async with session.get(url, headers=headers, params=params) as response:
+                        self.rate_limiter.update_from_headers(routing, method, response.headers)
+                        if response.status == 200:
+                            return await response.json()
+                        if response.status == 429:
+                            self.rate_limiter.penalize(routing, method, response.headers)
+                            continue
+                        body = await response.text()
+                        logger.error(f"[{tag}] HTTP {response.status} path={path}, body={body[:200]}")
+                        return None
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.error(f"[{tag}] request failed path={path}, attempt={attempt+1}: {e}")
+                    return None
+        logger.error(f"[{tag}] giving up after {Config.RIOT_MAX_RETRIES} rate-limited attempts path={path}")
+        return None
+
+    async def get_summoner_by_name(self, summoner_name):
+        return await self._get_json(
+            Config.PLATFORM_ROUTING_VALUE,
+            "summoner-v4.getBySummonerName",
+            f"/lol/summoner/v4/summoners/by-name/{summoner_name}",
+            "get_summoner_by_name",
+        )
+
+    async def get_account_by_riot_id(self, game_name, tag_line):
+        return await self._get_json(
+            Config.ROUTING_VALUE,
+            "account-v1.getByRiotId",
+            f"/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}",
+            "get_account_by_riot_id",
+        )
+
+    async def get_summoner_by_puuid(self, puuid):
+        return await self._get_json(
+            Config.PLATFORM_ROUTING_VALUE,
+            "summoner-v4.getByPUUID",
+            f"/lol/summoner/v4/summoners/by-puuid/{puuid}",
+            "get_summoner_by_puuid",
+        )
+
+    async def get_match_ids(self, puuid, start=0, count=20, start_time: Optional[int] = None):
+        """Match IDs of one page, newest first; [] past the end of history, None if the request failed."""
+        # queue=440 is Flex Rank
+        params = {
+            "queue": Config.QUEUE_ID,
+            "start": start,
+            "count": count,
+        }
+        if start_time is not None:
+            params["startTime"] = start_time
+        return await self._get_json(
+            Config.ROUTING_VALUE,
+            "match-v5.getMatchIdsByPUUID",
+            f"/lol/match/v5/matches/by-puuid/{puuid}/ids",
+            "get_match_ids",
+            params=params,
+        )
+
+    async def get_match_details(self, match_id):
+        return await self._get_json(
+            Config.ROUTING_VALUE,
+            "match-v5.getMatch",
+            f"/lol/match/v5/matches/{match_id}",
+            "get_match_details",
+        )
+
+    async def get_many_match_details(self, match_ids: List[str]) -> Dict[str, Optional[dict]]:
+        """Fetch many matches concurrently (bounded by ``max_concurrency``)."""
+        results = await asyncio.gather(*(self.get_match_details(m) for m in match_ids))
+        return dict(zip(match_ids, results))
@@ -0,0 +1,296 @@
+"""
+Maintenance commands that rebuild derived tables from stored data.
+
+    python -m backend.collector.backfill advanced-dimensions [--batch-size N] [--force]
+    python -m backend.collector.backfill role-aggregates
+    python -m backend.collector.backfill team-index [--batch-size N]
+    python -m backend.collector.backfill participants [--batch-size N]
+    python -m backend.collector.backfill playstyle-tags [--chunk-size N] [--workers N]
+    python -m backend.collector.backfill compress-raw [--batch-size N] [--sample-size N] [--retrain]
+    python -m backend.collector.backfill raw-storage-benchmark [--sample-size N]
+"""
+import argparse
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, or_, text
+from sqlalchemy.orm import Session
+
+from backend.shared.cache import response_cache
+from backend.shared.database import SessionLocal, Summoner, MatchDetail, MatchAdvancedDimension, MatchParticipant, MatchRawDictionary, MatchTeamMember, init_db, insert_ignore
+from backend.shared.match_storage import (
+    RAW_STORAGE_COLUMNS,
+    benchmark_raw_storage,
+    decode_raw,
+    encode_raw,
+    sample_payloads,
+    store_dictionary,
+    train_dictionary,
+)
+from backend.collector.data_processor import DataProcessor
+from backend.core_api.playstyle_retag import retag_population
+from backend.core_api.playstyle_tags import (
+    ADVANCED_DIMENSIONS_VERSION,
+    extract_advanced_dimension_rows,
+    rebuild_role_aggregates,
+    store_advanced_dimension_rows,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _iter_match_details(session: Session, batch_size: int):
+    """Yields (match_id, raw) batches in primary key order without holding the whole table."""
+    last_id = 0
+    while True:
+        rows = (
+            session.query(MatchDetail.id, MatchDetail.match_id, *RAW_STORAGE_COLUMNS)
+            .filter(MatchDetail.id > last_id)
+            .order_by(MatchDetail.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield [(match_id, decode_raw(*storage)) for _, match_id, *storage in rows]
+
+
+def backfill_advanced_dimensions(session: Session, batch_size: int = 200, force: bool = False) -> int:
+    """
+    Fills MatchAdvancedDimension for every registered participant of every stored match.
+    Rows already at ADVANCED_DIMENSIONS_VERSION are kept unless `force` is set.
+    Commits once per batch; returns the number of rows written.
+    """
+    summoner_ids: Dict[str, int] = {
+        puuid: summoner_id for puuid, summoner_id in session.query(Summoner.puuid, Summoner.id) if puuid
+    }
+    written = 0
+    for batch in _iter_match_details(session, batch_size):
+        match_ids = [match_id for match_id, _ in batch]
+        current = set()
+        if not force:
+            current = set(
+                session.query(MatchAdvancedDimension.summoner_id, MatchAdvancedDimension.match_id)
+                .filter(
+                    MatchAdvancedDimension.match_id.in_(match_ids),
+                    MatchAdvancedDimension.version == ADVANCED_DIMENSIONS_VERSION,
+                )
+                .all()
+            )
+
+        rows: List[dict] = []
+        for match_id, raw in batch:
+            if not raw:
+                continue
+            for row in extract_advanced_dimension_rows(raw, summoner_ids):
+                if (row["summoner_id"], row["match_id"]) not in current:
+                    rows.append(row)
+
+        if force:
+            (
+                session.query(MatchAdvancedDimension)
+                .filter(MatchAdvancedDimension.match_id.in_(match_ids))
+                .delete(synchronize_session=False)
+            )
+            insert_ignore(session, MatchAdvancedDimension, rows)
+        else:
+            store_advanced_dimension_rows(session, rows)
+        session.commit()
+        written += len(rows)
+        logger.info(f"[backfill] advanced dimensions: {written} rows written (through {match_ids[-1]})")
+    return written
+
+
+def backfill_team_index(session: Session, batch_size: int = 200) -> int:
+    """Fills MatchTeamMember for every registered participant of every stored match. Commits once per batch."""
+    summoner_ids: Dict[str, int] = {
+        puuid: summoner_id for puuid, summoner_id in session.query(Summoner.puuid, Summoner.id) if puuid
+    }
+    written = 0
+    for batch in _iter_match_details(session, batch_size):
+        rows: List[dict] = []
+        for match_id, raw in batch:
+            if raw:
+                rows.extend(DataProcessor.extract_team_members(raw, summoner_ids))
+        insert_ignore(session, MatchTeamMember, rows)
+        session.commit()
+        written += len(rows)
+        logger.info(f"[backfill] team index: {written} rows processed (through {batch[-1][0]})")
+    return written
+
+
+def backfill_participants(session: Session, batch_size: int = 200) -> int:
+    """Fills MatchParticipant with all participants of every stored match. Commits once per batch."""
+    written = 0
+    for batch in _iter_match_details(session, batch_size):
+        rows: List[dict] = []
+        for match_id, raw in batch:
+            if raw:
+                rows.extend(DataProcessor.extract_participants(raw))
+        insert_ignore(session, MatchParticipant, rows)
+        session.commit()
+        written += len(rows)
+        logger.info(f"[backfill] participants: {written} rows processed (through {batch[-1][0]})")
+    return written
+
+
+def backfill_role_aggregates(session: Session) -> int:
+    """Rebuilds the running playstyle aggregates of every summoner from stored rows (one commit each)."""
+    rebuilt = 0
+    for summoner in session.query(Summoner).order_by(Summoner.id).all():
+        rebuild_role_aggregates(session, summoner)
+        session.commit()
+        rebuilt += 1
+    logger.info(f"[backfill] role aggregates rebuilt for {rebuilt} summoners")
+    return rebuilt
+
+
+def backfill_compressed_raw(session: Session, batch_size: int = 200, sample_size: int = 500, retrain: bool = False) -> int:
+    """
+    Rewrites stored match JSON as zlib with the newest preset dictionary, training one from up to
+    `sample_size` stored payloads first if none exists (or `retrain` is set). Rows already on the
+    newest dictionary are skipped. Commits once per batch; returns the number of rows rewritten.
+    """
+    dictionary_id = session.query(func.max(MatchRawDictionary.id)).scalar()
+    if dictionary_id is None or retrain:
+        payloads = sample_payloads(session, sample_size)
+        if not payloads:
+            return 0
+        dictionary_id = store_dictionary(session, train_dictionary(payloads), len(payloads)).id
+        logger.info(f"[backfill] trained match raw dictionary {dictionary_id} on {len(payloads)} payloads")
+
+    rewritten = 0
+    last_id = 0
+    while True:
+        rows = (
+            session.query(MatchDetail.id, *RAW_STORAGE_COLUMNS)
+            .filter(
+                MatchDetail.id > last_id,
+                or_(MatchDetail.raw_dictionary_id.is_(None), MatchDetail.raw_dictionary_id != dictionary_id),
+            )
+            .order_by(MatchDetail.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return rewritten
+        last_id = rows[-1][0]
+
+        updates = []
+        for row_id, *storage in rows:
+            raw = decode_raw(*storage)
+            if not raw:
+                continue
+            raw_json, raw_compressed, raw_dictionary_id = encode_raw(raw, "zlib")
+            updates.append({
+                "id": row_id,
+                "raw_json": raw_json,
+                "raw_compressed": raw_compressed,
+                "raw_dictionary_id": raw_dictionary_id,
+            })
+        session.bulk_update_mappings(MatchDetail, updates)
+        session.commit()
+        rewritten += len(updates)
+        logger.info(f"[backfill] compressed raw: {rewritten} rows rewritten (through id {last_id})")
+
+
+def _table_size_bytes(session: Session, table_name: str) -> Optional[int]:
+    """On-disk size of a table (data + indexes) on MariaDB/MySQL; None elsewhere."""
+    if session.get_bind().dialect.name not in ("mysql", "mariadb"):
+        return None
+    return session.execute(
+        text(
+            "SELECT data_length + index_length FROM information_schema.tables"
+            " WHERE table_schema = DATABASE() AND table_name = :table_name"
+        ),
+        {"table_name": table_name},
+    ).scalar()
+
+
+def run_raw_storage_benchmark(session: Session, sample_size: int = 1000) -> Dict[str, object]:
+    """
+    Compares plain JSON, zlib and zlib with a preset dictionary on stored payloads. The dictionary
+    is trained on half of the sample and measured on the other half so it isn't scored on its
+    own training data.
+    """
+    payloads = sample_payloads(session, sample_size)
+    training, measured = payloads[::2], payloads[1::2]
+    dictionary = train_dictionary(training) if training else None
+    return {
+        "matches": len(measured),
+        "table_bytes": _table_size_bytes(session, MatchDetail.__tablename__),
+        "modes": benchmark_raw_storage(measured, dictionary),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m backend.collector.backfill", description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    adv = subparsers.add_parser("advanced-dimensions", help="Compute per-match advanced playstyle dimensions from MatchDetail")
+    adv.add_argument("--batch-size", type=int, default=200, help="MatchDetail rows per transaction")
+    adv.add_argument("--force", action="store_true", help="Recompute rows that are already at the current version")
+
+    subparsers.add_parser("role-aggregates", help="Rebuild per-(summoner, role) running playstyle aggregates")
+
+    team = subparsers.add_parser("team-index", help="Record team ID and team kills per match for duo lookups")
+    team.add_argument("--batch-size", type=int, default=200, help="MatchDetail rows per transaction")
+
+    participants = subparsers.add_parser("participants", help="Record every participant of every stored match")
+    participants.add_argument("--batch-size", type=int, default=200, help="MatchDetail rows per transaction")
+
+    tags = subparsers.add_parser("playstyle-tags", help="Re-tag summoners with outdated playstyle snapshots")
+    tags.add_argument("--chunk-size", type=int, default=200, help="Summoners per transaction")
+    tags.add_argument("--workers", type=int, default=4, help="Chunks processed in parallel")
+
+    compress = subparsers.add_parser("compress-raw", help="Store match JSON zlib-compressed with a trained preset dictionary")
+    compress.add_argument("--batch-size", type=int, default=200, help="MatchDetail rows per transaction")
+    compress.add_argument("--sample-size", type=int, default=500, help="Stored payloads to train the dictionary on")
+    compress.add_argument("--retrain", action="store_true", help="Train a new dictionary and rewrite every row with it")
+
+    bench = subparsers.add_parser("raw-storage-benchmark", help="Compare stored size and decode latency of raw match storage modes")
+    bench.add_argument("--sample-size", type=int, default=1000, help="Stored payloads to measure")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+
+    session = SessionLocal()
+    try:
+        if args.command == "advanced-dimensions":
+            written = backfill_advanced_dimensions(session, batch_size=args.batch_size, force=args.force)
+            logger.info(f"[backfill] advanced dimensions done: {written} rows (version {ADVANCED_DIMENSIONS_VERSION})")
+        elif args.command == "role-aggregates":
+            backfill_role_aggregates(session)
+        elif args.command == "team-index":
+            written = backfill_team_index(session, batch_size=args.batch_size)
+            logger.info(f"[backfill] team index done: {written} rows")
+        elif args.command == "participants":
+            written = backfill_participants(session, batch_size=args.batch_size)
+            logger.info(f"[backfill] participants done: {written} rows")
+        elif args.command == "playstyle-tags":
+            result = retag_population(chunk_size=args.chunk_size, workers=args.workers)
+            logger.info(f"[backfill] playstyle tags done: {result}")
+        elif args.command == "compress-raw":
+            rewritten = backfill_compressed_raw(
+                session, batch_size=args.batch_size, sample_size=args.sample_size, retrain=args.retrain
+            )
+            logger.info(f"[backfill] compressed raw done: {rewritten} rows")
+        elif args.command == "raw-storage-benchmark":
+            result = run_raw_storage_benchmark(session, sample_size=args.sample_size)
+            logger.info(f"[benchmark] {result['matches']} matches, match_details table: {result['table_bytes']} bytes")
+            for mode, stats in result["modes"].items():
+                logger.info(
+                    f"[benchmark] {mode}: {stats['bytes']} bytes ({stats['ratio']:.1%} of JSON), "
+                    f"{stats['decode_ms_per_match']:.3f} ms/match to decode"
+                )
+        if args.command in ("advanced-dimensions", "role-aggregates", "team-index"):
+            # These rewrite inputs of cached responses for any number of summoners
+            response_cache.invalidate_all()
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
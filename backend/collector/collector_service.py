@@ -1,9 +1,22 @@
+import threading
 import time
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from backend.shared.database import SessionLocal, Summoner, MatchPerformance, engine, Base, MatchDetail
+from backend.shared.database import SessionLocal, Summoner, MatchPerformance, engine, Base, MatchDetail, MatchParticipant, MatchTeamMember, SummonerIngestState, insert_ignore, utc_timestamp
+from backend.shared.cache import response_cache
+from backend.shared.match_storage import load_raw_matches, match_detail_row
+from backend.shared.migrations import upgrade_database
 from .riot_client import RiotAPIClient
 from .data_processor import DataProcessor
+from backend.shared.leaderboard import refresh_all_leaderboards
+from backend.core_api.playstyle_tags import apply_role_aggregates, extract_advanced_dimension_rows, store_advanced_dimension_rows
+from .config import Config
+from .pipeline import IngestPipeline, MatchClaims
+from .scheduler import AdaptivePollScheduler
 import logging
 
 # Ensure tables exist
@@ -17,162 +30,293 @@ class CollectorService:
         self.scheduler = BackgroundScheduler()
         self.riot_client = RiotAPIClient()
         self.db = SessionLocal()
+        # Match store lookups: hits are served from MatchDetail, misses go to Riot
+        self.stats = {"match_cache_hits": 0, "match_cache_misses": 0}
+        self.last_pipeline_stats = {}
+        self._stats_lock = threading.Lock()
 
     def start(self):
-        # Poll every 30 minutes
-        self.scheduler.add_job(self.poll_summoners, 'interval', minutes=30)
+        upgrade_database()
+        # Each minute, poll whoever is due according to their activity, within the Riot request budget
+        self.poll_scheduler = AdaptivePollScheduler(self)
+        self.scheduler.add_job(self.poll_scheduler.tick, 'interval', minutes=1, max_instances=1)
         self.scheduler.start()
         logger.info("Collector Service started.")
 
-    def poll_summoners(self):
-        logger.info("Polling all summoners...")
+    def poll_summoners(self, summoner_ids: Optional[List[int]] = None):
+        """Polls `summoner_ids` (every registered summoner if None) concurrently, as one cycle."""
+        if summoner_ids is None:
+            session = SessionLocal()
+            try:
+                summoner_ids = [row.id for row in session.query(Summoner.id).all()]
+            finally:
+                session.close()
+
+        # A match shared by several registered summoners is fetched and parsed once per cycle;
+        # the worker that claims it writes performances for every registered participant.
+        claims = MatchClaims()
+        with ThreadPoolExecutor(max_workers=Config.COLLECTOR_POLL_WORKERS) as executor:
+            futures = [executor.submit(self._poll_one_summoner, summoner_id, claims) for summoner_id in summoner_ids]
+            for future in futures:
+                future.result()
+        logger.info(f"Poll cycle finished: summoners={len(summoner_ids)}, matches claimed={claims.claimed}, duplicates skipped={claims.skipped}")
+
+    def _poll_one_summoner(self, summoner_id: int, claims: MatchClaims):
         session = SessionLocal()
         try:
-            summoners = session.query(Summoner).all()
-            for summoner in summoners:
-                self.update_summoner_data(session, summoner)
+            summoner = session.query(Summoner).filter(Summoner.id == summoner_id).first()
+            if summoner is not None:
+                self.update_summoner_data_incremental(session, summoner, claims=claims)
+        except Exception as e:
+            logger.error(f"Failed to poll summoner_id={summoner_id}: {e}")
         finally:
             session.close()
 
-    def update_summoner_data(self, session: Session, summoner: Summoner):
-        logger.info(f"Updating data for {summoner.summoner_name}...")
-        page_size = 50
-        start = 0
-
-        while True:
-            match_ids = self.riot_client.get_match_ids(summoner.puuid, start=start, count=page_size)
-            if not match_ids:
-                logger.info(f"No more matches for {summoner.summoner_name} (start={start})")
-                break
-
-            logger.info(f"Processing {len(match_ids)} matches for {summoner.summoner_name} (start={start})")
-            page_saved = 0
-
-            for match_id in match_ids:
-                match_details = self.riot_client.get_match_details(match_id)
-                if not match_details:
-                    continue
-
-                existing_match = session.query(MatchDetail).filter_by(match_id=match_id).first()
-                if not existing_match:
-                    raw_entry = MatchDetail(match_id=match_id, raw=match_details)
-                    session.add(raw_entry)
-                    session.commit()
-
-                info = match_details.get("info", {})
-                participants = info.get("participants", [])
-                if not participants:
-                    continue
-
-                puuids_in_match = [p.get("puuid") for p in participants if p.get("puuid")]
-                if not puuids_in_match:
-                    continue
-
-                # 현재 매치에 함께 참가한 등록된 소환사들을 모두 조회
-                related_summoners = session.query(Summoner).filter(Summoner.puuid.in_(puuids_in_match)).all()
-                for related_summoner in related_summoners:
-                    # Check if match already exists
-                    exists = session.query(MatchPerformance).filter_by(
-                        match_id=match_id,
-                        summoner_id=related_summoner.id
-                    ).first()
-                    if exists:
-                        continue
-
-                    performance_data = DataProcessor.extract_performance(match_details, related_summoner.puuid)
-                    if performance_data:
-                        performance = MatchPerformance(**performance_data)
-                        performance.summoner_id = related_summoner.id
-                        session.add(performance)
-                        session.commit()
-                        logger.info(f"Saved match {match_id} for {related_summoner.summoner_name}")
-                        page_saved += 1
-
-            logger.info(f"Page completed for {summoner.summoner_name}: start={start}, total={len(match_ids)}, saved={page_saved}")
-
-            if len(match_ids) < page_size:
-                break
-
-            start += page_size
-
-    def update_summoner_data_incremental(self, session: Session, summoner: Summoner):
-        logger.info(f"Incremental update for {summoner.summoner_name}...")
+    def _record_store_lookup(self, hits: int, misses: int):
+        with self._stats_lock:
+            self.stats["match_cache_hits"] += hits
+            self.stats["match_cache_misses"] += misses
+
+    def _load_stored_matches(self, session: Session, match_ids: List[str]) -> Dict[str, dict]:
+        """Returns raw JSON for the given match IDs that are already in MatchDetail (one IN query)."""
+        return load_raw_matches(session, match_ids)
+
+    def _load_registered_summoners(self, session: Session) -> Dict[str, Tuple[int, str]]:
+        """puuid -> (summoner id, summoner name) for every registered summoner."""
+        rows = session.query(Summoner.puuid, Summoner.id, Summoner.summoner_name).all()
+        return {puuid: (summoner_id, name) for puuid, summoner_id, name in rows if puuid}
+
+    @staticmethod
+    def _extract_match_rows(match_details: dict, registered: Dict[str, Tuple[int, str]]) -> List[dict]:
+        """MatchPerformance rows for every registered participant of one match (no DB access)."""
+        participants = match_details.get("info", {}).get("participants", [])
+        rows = []
+        for p in participants:
+            related = registered.get(p.get("puuid"))
+            if related is None:
+                continue
+            performance_data = DataProcessor.extract_performance(match_details, p.get("puuid"))
+            if performance_data:
+                performance_data["summoner_id"] = related[0]
+                rows.append(performance_data)
+        return rows
+
+    @staticmethod
+    def _participant_summoner_ids(match_details: dict, registered: Dict[str, Tuple[int, str]]) -> Dict[str, int]:
+        return {
+            p.get("puuid"): registered[p.get("puuid")][0]
+            for p in match_details.get("info", {}).get("participants", [])
+            if p.get("puuid") in registered
+        }
+
+    @staticmethod
+    def _extract_dimension_rows(match_details: dict, registered: Dict[str, Tuple[int, str]]) -> List[dict]:
+        """MatchAdvancedDimension rows for every registered participant of one match (no DB access)."""
+        return extract_advanced_dimension_rows(
+            match_details, CollectorService._participant_summoner_ids(match_details, registered)
+        )
+
+    @staticmethod
+    def _extract_team_rows(match_details: dict, registered: Dict[str, Tuple[int, str]]) -> List[dict]:
+        """MatchTeamMember rows for every registered participant of one match (no DB access)."""
+        return DataProcessor.extract_team_members(
+            match_details, CollectorService._participant_summoner_ids(match_details, registered)
+        )
+
+    @staticmethod
+    def _extract_participant_rows(match_details: dict) -> List[dict]:
+        """MatchParticipant rows for all participants of one match (no DB access)."""
+        return DataProcessor.extract_participants(match_details)
+
+    def _write_rows(
+        self,
+        session: Session,
+        raw_rows: List[dict],
+        performance_rows: List[dict],
+        dimension_rows: Optional[List[dict]] = None,
+        team_rows: Optional[List[dict]] = None,
+        participant_rows: Optional[List[dict]] = None,
+    ) -> List[dict]:
+        """
+        Writes a batch in a single transaction: raw JSON and participant rows for newly fetched
+        matches, the MatchPerformance rows that don't exist yet (resolved with one lookup on the
+        (summoner_id, match_id) unique key), their advanced dimension and team index rows,
+        and the running role aggregates they add to. Cached responses of the summoners that got
+        new matches are invalidated once the batch is committed.
+        Returns the performance rows that were saved.
+        """
+        if performance_rows:
+            summoner_ids = sorted({row["summoner_id"] for row in performance_rows})
+            # Writers of the same summoner take turns (locking in id order, so they can't deadlock):
+            # two pipelines saving the same match must not both add it to the role aggregates
+            session.query(Summoner.id).filter(Summoner.id.in_(summoner_ids)).order_by(Summoner.id).with_for_update().all()
+            # A locking read, so it sees what the writer we waited for committed after our snapshot began
+            existing = set(
+                session.query(MatchPerformance.match_id, MatchPerformance.summoner_id)
+                .filter(
+                    MatchPerformance.match_id.in_({row["match_id"] for row in performance_rows}),
+                    MatchPerformance.summoner_id.in_(summoner_ids),
+                )
+                .with_for_update(read=True)
+                .all()
+            )
+            # Also drops repeats within the batch; the unique key would skip them but the aggregates would not
+            new_rows = []
+            for row in performance_rows:
+                key = (row["match_id"], row["summoner_id"])
+                if key not in existing:
+                    existing.add(key)
+                    new_rows.append(row)
+            performance_rows = new_rows
+
+        insert_ignore(session, MatchDetail, [match_detail_row(row["match_id"], row["raw"]) for row in raw_rows])
+        insert_ignore(session, MatchParticipant, participant_rows or [])
+        insert_ignore(session, MatchPerformance, performance_rows)
+        store_advanced_dimension_rows(session, dimension_rows or [])
+        insert_ignore(session, MatchTeamMember, team_rows or [])
+        apply_role_aggregates(session, performance_rows, dimension_rows)
+        session.commit()
+        response_cache.invalidate_summoners({row["summoner_id"] for row in performance_rows})
+        return performance_rows
+
+    def _get_ingest_state(self, session: Session, summoner: Summoner) -> SummonerIngestState:
+        state = session.query(SummonerIngestState).filter(SummonerIngestState.summoner_id == summoner.id).first()
+        if state is not None:
+            return state
+
+        state = SummonerIngestState(summoner_id=summoner.id, backfill_cursor=0, backfill_complete=False)
+        # Summoners collected before ingest state existed: seed the watermark from stored matches once
         latest_match = (
             session.query(MatchPerformance)
             .filter(MatchPerformance.summoner_id == summoner.id)
             .order_by(MatchPerformance.game_creation.desc())
             .first()
         )
-
-        if latest_match is None:
-            logger.info("No existing matches found, falling back to full update.")
-            self.update_summoner_data(session, summoner)
+        if latest_match is not None:
+            state.last_match_id = latest_match.match_id
+            state.last_game_creation = latest_match.game_creation
+            state.backfill_complete = True
+        session.add(state)
+        session.commit()
+        return state
+
+    def _finish_ingest(self, session: Session, summoner: Summoner, state: SummonerIngestState, started_at: datetime):
+        latest_match = (
+            session.query(MatchPerformance)
+            .filter(MatchPerformance.summoner_id == summoner.id)
+            .order_by(MatchPerformance.game_creation.desc())
+            .first()
+        )
+        if latest_match is not None:
+            state.last_match_id = latest_match.match_id
+            state.last_game_creation = latest_match.game_creation
+        state.last_polled_at = started_at
+        session.commit()
+
+    def _after_ingest(self, session: Session, pipeline: IngestPipeline):
+        """Refreshes derived data for summoners that got new matches in this run."""
+        self.last_pipeline_stats = pipeline.stats()
+        self._refresh_derived(session, pipeline.affected_summoner_ids)
+
+    def _refresh_derived(self, session: Session, summoner_ids):
+        if not summoner_ids:
             return
+        try:
+            refresh_all_leaderboards(session, summoner_ids=summoner_ids)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to refresh leaderboards after ingest: {e}")
+
+    def backfill_from_stored_matches(self, session: Session, summoner: Summoner, chunk_size: int = 200) -> int:
+        """
+        Saves MatchPerformance (and its dimension/team rows) for every already stored match the
+        summoner took part in, found through the participant index; no Riot calls. Meant for newly
+        registered summoners, so their dashboard works before the Riot crawl fills the gaps.
+        Returns the number of matches saved.
+        """
+        # Created up front so it isn't seeded as a finished backfill from these rows
+        self._get_ingest_state(session, summoner)
+
+        known = select(MatchPerformance.match_id).where(MatchPerformance.summoner_id == summoner.id)
+        match_ids = [
+            match_id for (match_id,) in session.query(MatchParticipant.match_id)
+            .filter(MatchParticipant.puuid == summoner.puuid, MatchParticipant.match_id.not_in(known))
+            .order_by(MatchParticipant.game_creation.desc())
+        ]
+        registered = {summoner.puuid: (summoner.id, summoner.summoner_name)}
+        saved = 0
+        for i in range(0, len(match_ids), chunk_size):
+            stored = load_raw_matches(session, match_ids[i:i + chunk_size])
+            written = self._write_rows(
+                session,
+                [],
+                [row for raw in stored.values() for row in self._extract_match_rows(raw, registered)],
+                [row for raw in stored.values() for row in self._extract_dimension_rows(raw, registered)],
+                [row for raw in stored.values() for row in self._extract_team_rows(raw, registered)],
+            )
+            saved += len(written)
 
-        start_time = int(latest_match.game_creation.timestamp()) + 1
+        logger.info(f"Loaded {saved} stored matches for {summoner.summoner_name} without Riot calls")
+        if saved:
+            self._refresh_derived(session, {summoner.id})
+        return saved
 
-        page_size = 50
-        start = 0
+    def update_summoner_data(self, session: Session, summoner: Summoner, claims: Optional[MatchClaims] = None):
+        logger.info(f"Updating data for {summoner.summoner_name}...")
+        started_at = datetime.utcnow()
+        state = self._get_ingest_state(session, summoner)
+        # Resume an interrupted backfill; a finished one is re-crawled from the top
+        start = 0 if state.backfill_complete else (state.backfill_cursor or 0)
+        if start:
+            logger.info(f"Resuming backfill for {summoner.summoner_name} from start={start}")
+
+        def save_cursor(page_session: Session, page_start: int, match_ids: List[str]):
+            # Never past a page with failed downloads: the next run lists it again
+            if any(failed <= page_start for failed in pipeline.failed_pages):
+                return
+            state.backfill_cursor = page_start + pipeline.page_size
+            page_session.commit()
+
+        pipeline = IngestPipeline(self, claims=claims, on_page_complete=save_cursor)
+        pipeline.run(session, summoner, start=start)
+        self._after_ingest(session, pipeline)
+
+        # Only a real end of history with every match saved finishes the backfill; otherwise the
+        # cursor stays at the first page that wasn't fully saved and the next cycle resumes there
+        if pipeline.exhausted and not pipeline.fetch_failures:
+            state.backfill_complete = True
+            state.backfill_cursor = 0
+            self._finish_ingest(session, summoner, state, started_at)
+
+    def update_summoner_data_incremental(self, session: Session, summoner: Summoner, claims: Optional[MatchClaims] = None):
+        logger.info(f"Incremental update for {summoner.summoner_name}...")
+        started_at = datetime.utcnow()
+        state = self._get_ingest_state(session, summoner)
+
+        if not state.backfill_complete:
+            logger.info("Backfill not complete, continuing full update.")
+            self.update_summoner_data(session, summoner, claims=claims)
+            return
+
+        if state.last_game_creation is not None:
+            start_time = int(utc_timestamp(state.last_game_creation)) + 1
+        elif state.last_polled_at is not None:
+            # No flex games yet: only look at what started since shortly before the last poll. Riot
+            # filters on game start, so a game running during that poll started before it
+            overlap = timedelta(minutes=Config.COLLECTOR_POLL_OVERLAP_MINUTES)
+            start_time = int(utc_timestamp(state.last_polled_at - overlap))
+        else:
+            start_time = None
+
+        pipeline = IngestPipeline(self, claims=claims)
+        pipeline.run(session, summoner, start_time=start_time)
+        self._after_ingest(session, pipeline)
+        if pipeline.failed or pipeline.fetch_failures:
+            # Keep the watermark so the next poll lists the same window again; saved matches are store hits then
+            logger.warning(f"Incremental update for {summoner.summoner_name} incomplete; watermark not advanced")
+            return
+        self._finish_ingest(session, summoner, state, started_at)
 
-        while True:
-            match_ids = self.riot_client.get_match_ids(
-                summoner.puuid,
-                start=start,
-                count=page_size,
-                start_time=start_time,
-            )
-            if not match_ids:
-                logger.info("No newer matches returned for incremental update.")
-                break
-
-            logger.info(f"Processing {len(match_ids)} incremental matches for {summoner.summoner_name} (start={start})")
-            page_saved = 0
-
-            for match_id in match_ids:
-                match_details = self.riot_client.get_match_details(match_id)
-                if not match_details:
-                    continue
-
-                existing_match = session.query(MatchDetail).filter_by(match_id=match_id).first()
-                if not existing_match:
-                    raw_entry = MatchDetail(match_id=match_id, raw=match_details)
-                    session.add(raw_entry)
-                    session.commit()
-
-                info = match_details.get("info", {})
-                participants = info.get("participants", [])
-                if not participants:
-                    continue
-
-                puuids_in_match = [p.get("puuid") for p in participants if p.get("puuid")]
-                if not puuids_in_match:
-                    continue
-
-                related_summoners = session.query(Summoner).filter(Summoner.puuid.in_(puuids_in_match)).all()
-                for related_summoner in related_summoners:
-                    exists = session.query(MatchPerformance).filter_by(
-                        match_id=match_id,
-                        summoner_id=related_summoner.id
-                    ).first()
-                    if exists:
-                        continue
-
-                    performance_data = DataProcessor.extract_performance(match_details, related_summoner.puuid)
-                    if performance_data:
-                        performance = MatchPerformance(**performance_data)
-                        performance.summoner_id = related_summoner.id
-                        session.add(performance)
-                        session.commit()
-                        logger.info(f"Saved match {match_id} for {related_summoner.summoner_name} (incremental)")
-                        page_saved += 1
-
-            logger.info(f"Incremental page completed for {summoner.summoner_name}: start={start}, total={len(match_ids)}, saved={page_saved}")
-
-            if len(match_ids) < page_size:
-                break
-
-            start += page_size
-                
     def add_summoner(self, name: str):
         # This might be called by the API service, or we just rely on DB shared state
         # Logic: Check Riot, get info, save to DB
@@ -7,7 +7,32 @@ class Config:
     REGION = "kr" # Defaulting to KR as per "League of Legends" (Korean context implied)
     ROUTING_VALUE = "asia" # for match-v5
     PLATFORM_ROUTING_VALUE = "kr" # for summoner-v4
-    
+    # "{routing}" is replaced with ROUTING_VALUE / PLATFORM_ROUTING_VALUE
+    RIOT_API_BASE_URL = os.getenv("RIOT_API_BASE_URL", "https://{routing}.api.riotgames.com")
+    RIOT_MAX_CONCURRENCY = int(os.getenv("RIOT_MAX_CONCURRENCY", "20"))
+    RIOT_CONNECTIONS_PER_HOST = int(os.getenv("RIOT_CONNECTIONS_PER_HOST", "10"))
+    # Used until the API reports real limits via X-App-Rate-Limit (dev key default)
+    RIOT_APP_RATE_LIMIT = os.getenv("RIOT_APP_RATE_LIMIT", "20:1,100:120")
+    RIOT_RATE_LIMIT_MARGIN = int(os.getenv("RIOT_RATE_LIMIT_MARGIN", "1"))
+    RIOT_RATE_LIMIT_BACKEND = os.getenv("RIOT_RATE_LIMIT_BACKEND", "memory") # memory | redis
+    RIOT_MAX_RETRIES = int(os.getenv("RIOT_MAX_RETRIES", "5"))
+    # Collector ingest pipeline
+    COLLECTOR_FETCH_WORKERS = int(os.getenv("COLLECTOR_FETCH_WORKERS", "8"))
+    COLLECTOR_QUEUE_SIZE = int(os.getenv("COLLECTOR_QUEUE_SIZE", "100"))
+    COLLECTOR_WRITE_BATCH = int(os.getenv("COLLECTOR_WRITE_BATCH", "50"))
+    COLLECTOR_FLUSH_INTERVAL = float(os.getenv("COLLECTOR_FLUSH_INTERVAL", "2.0"))
+    COLLECTOR_POLL_WORKERS = int(os.getenv("COLLECTOR_POLL_WORKERS", "4"))
+    # Adaptive poll scheduler: global Riot budget and poll interval bounds
+    COLLECTOR_REQUESTS_PER_MINUTE = int(os.getenv("COLLECTOR_REQUESTS_PER_MINUTE", "40"))
+    COLLECTOR_MIN_POLL_MINUTES = int(os.getenv("COLLECTOR_MIN_POLL_MINUTES", "15"))
+    COLLECTOR_MAX_POLL_MINUTES = int(os.getenv("COLLECTOR_MAX_POLL_MINUTES", "1440"))
+    # How far back an incremental poll of a summoner without stored games re-lists from its last poll:
+    # games still running (or not yet listed by Riot) then have a startTime before that poll
+    COLLECTOR_POLL_OVERLAP_MINUTES = int(os.getenv("COLLECTOR_POLL_OVERLAP_MINUTES", "120"))
+    # Assumed length of a summoner's match history when budgeting an unfinished backfill
+    COLLECTOR_BACKFILL_MATCHES_ESTIMATE = int(os.getenv("COLLECTOR_BACKFILL_MATCHES_ESTIMATE", "500"))
+    REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 
     # Update key at runtime
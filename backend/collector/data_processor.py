@@ -1,4 +1,17 @@
-from datetime import datetime
+from backend.shared.database import utc_from_millis
+
+# MatchParticipant column -> key in the participant's "challenges" object
+PARTICIPANT_CHALLENGE_FIELDS = {
+    "kill_participation": "killParticipation",
+    "damage_per_minute": "damagePerMinute",
+    "team_damage_percentage": "teamDamagePercentage",
+    "gold_per_minute": "goldPerMinute",
+    "vision_score_per_minute": "visionScorePerMinute",
+    "solo_kills": "soloKills",
+    "takedowns_first_x_minutes": "takedownsFirstXMinutes",
+    "lane_minions_first_10_minutes": "laneMinionsFirst10Minutes",
+    "control_wards_placed": "controlWardsPlaced",
+}
 
 class DataProcessor:
     @staticmethod
@@ -37,7 +50,7 @@ class DataProcessor:
 
         return {
             "match_id": match_data.get("metadata", {}).get("matchId"),
-            "game_creation": datetime.fromtimestamp(info.get("gameCreation", 0) / 1000),
+            "game_creation": utc_from_millis(info.get("gameCreation", 0)),
             "lane": team_position if team_position else lane, # Prefer teamPosition
             "role": role,
             "champion_name": target_participant.get("championName"),
@@ -51,3 +64,65 @@ class DataProcessor:
             "total_minions_killed": target_participant.get("totalMinionsKilled", 0) + target_participant.get("neutralMinionsKilled", 0),
             "total_damage_dealt_to_champions": target_participant.get("totalDamageDealtToChampions", 0)
         }
+
+    @staticmethod
+    def extract_team_members(match_data, summoner_ids):
+        """
+        MatchTeamMember rows (team ID and team total kills) for participants whose puuid
+        is in `summoner_ids` (puuid -> summoner id).
+        """
+        participants = match_data.get("info", {}).get("participants", [])
+        match_id = match_data.get("metadata", {}).get("matchId")
+
+        team_kills = {}
+        for p in participants:
+            team_id = p.get("teamId")
+            team_kills[team_id] = team_kills.get(team_id, 0) + int(p.get("kills", 0))
+
+        rows = []
+        for p in participants:
+            summoner_id = summoner_ids.get(p.get("puuid"))
+            if summoner_id is None or p.get("teamId") is None:
+                continue
+            rows.append({
+                "summoner_id": summoner_id,
+                "match_id": match_id,
+                "team_id": p.get("teamId"),
+                "team_kills": team_kills[p.get("teamId")],
+            })
+        return rows
+
+    @staticmethod
+    def extract_participants(match_data):
+        """MatchParticipant rows for all participants of a match, registered or not."""
+        info = match_data.get("info", {})
+        match_id = match_data.get("metadata", {}).get("matchId")
+        game_creation = utc_from_millis(info.get("gameCreation", 0))
+
+        rows = []
+        for index, p in enumerate(info.get("participants", [])):
+            if not p.get("puuid"):
+                continue
+            challenges = p.get("challenges") or {}
+            row = {
+                "match_id": match_id,
+                "puuid": p.get("puuid"),
+                "participant_id": p.get("participantId", index + 1),
+                "game_creation": game_creation,
+                "game_duration": info.get("gameDuration"),
+                "team_id": p.get("teamId"),
+                "team_position": p.get("teamPosition", ""),
+                "champion_name": p.get("championName"),
+                "win": p.get("win"),
+                "kills": p.get("kills", 0),
+                "deaths": p.get("deaths", 0),
+                "assists": p.get("assists", 0),
+                "gold_earned": p.get("goldEarned", 0),
+                "total_damage_dealt_to_champions": p.get("totalDamageDealtToChampions", 0),
+                "total_minions_killed": p.get("totalMinionsKilled", 0) + p.get("neutralMinionsKilled", 0),
+                "vision_score": p.get("visionScore", 0),
+            }
+            for column, key in PARTICIPANT_CHALLENGE_FIELDS.items():
+                row[column] = challenges.get(key)
+            rows.append(row)
+        return rows
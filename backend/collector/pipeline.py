@@ -0,0 +1,382 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from backend.shared.database import SessionLocal, Summoner
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+# Match IDs requested per match list call
+MATCH_ID_PAGE_SIZE = 50
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, busy_seconds: float, items: int = 1):
+        with self._lock:
+            self.processed += items
+            self.busy_seconds += busy_seconds
+
+    def as_dict(self) -> Dict[str, float]:
+        end = self.finished_at or time.monotonic()
+        elapsed = (end - self.started_at) if self.started_at else 0.0
+        return {
+            "processed": self.processed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_per_sec": round(self.processed / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+
+class _BoundedQueue:
+    """queue.Queue that also records its peak depth."""
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.max_depth = 0
+
+    def put(self, item, stop: threading.Event):
+        # Blocks while the queue is full (back-pressure), but gives up once the pipeline stops
+        while not stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                self.max_depth = max(self.max_depth, self.queue.qsize())
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, stop: threading.Event):
+        # Returns _DONE instead of blocking forever once the pipeline stops
+        while not stop.is_set():
+            try:
+                return self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"depth": self.queue.qsize(), "max_depth": self.max_depth, "capacity": self.queue.maxsize}
+
+
+class MatchClaims:
+    """Match IDs already taken by some pipeline in the current poll cycle (thread-safe)."""
+
+    def __init__(self):
+        self._claimed = set()
+        self._lock = threading.Lock()
+        self.skipped = 0
+
+    @property
+    def claimed(self) -> int:
+        return len(self._claimed)
+
+    def claim(self, match_ids: List[str]) -> List[str]:
+        """Returns the IDs this caller now owns; the rest belong to another pipeline."""
+        with self._lock:
+            owned = [match_id for match_id in match_ids if match_id not in self._claimed]
+            self._claimed.update(owned)
+            self.skipped += len(match_ids) - len(owned)
+        return owned
+
+    def release(self, match_ids: List[str]):
+        """Gives back IDs the owner couldn't save, so a pipeline listing them later takes them over."""
+        with self._lock:
+            self._claimed.difference_update(match_ids)
+
+
+class _Item:
+    __slots__ = ("page_start", "match_id", "raw", "is_new", "rows", "dimension_rows", "team_rows", "participant_rows")
+
+    def __init__(self, page_start: int, match_id: str, raw: Optional[dict] = None, is_new: bool = False):
+        self.page_start = page_start
+        self.match_id = match_id
+        self.raw = raw
+        self.is_new = is_new
+        self.rows: List[dict] = []
+        self.dimension_rows: List[dict] = []
+        self.team_rows: List[dict] = []
+        self.participant_rows: List[dict] = []
+
+
+class IngestPipeline:
+    """
+    Staged collector for one summoner:
+    ID pager -> detail fetchers (threads) -> DataProcessor extraction -> batched DB writer.
+
+    Stages are linked by bounded queues, so when the writer falls behind the fetchers
+    block and the pager stops paging. Every match ID reaches the writer (failed fetches
+    as empty items) so pages can be reported complete in order.
+    """
+
+    def __init__(
+        self,
+        collector,
+        session_factory: Callable[[], Session] = SessionLocal,
+        fetch_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        page_size: int = MATCH_ID_PAGE_SIZE,
+        on_page_complete: Optional[Callable[[Session, int, List[str]], None]] = None,
+        claims: Optional[MatchClaims] = None,
+    ):
+        self.collector = collector
+        self.session_factory = session_factory
+        self.fetch_workers = fetch_workers or Config.COLLECTOR_FETCH_WORKERS
+        self.batch_size = batch_size or Config.COLLECTOR_WRITE_BATCH
+        self.page_size = page_size
+        self.on_page_complete = on_page_complete
+        self.claims = claims
+        queue_size = queue_size or Config.COLLECTOR_QUEUE_SIZE
+
+        self.fetch_queue = _BoundedQueue("fetch", queue_size)
+        self.parse_queue = _BoundedQueue("parse", queue_size)
+        self.write_queue = _BoundedQueue("write", queue_size)
+        self.stage_stats = {
+            name: StageStats(name) for name in ("pager", "fetcher", "parser", "writer")
+        }
+        self.saved = 0
+        # Summoners that got new MatchPerformance rows during this run
+        self.affected_summoner_ids = set()
+        # True once Riot answered with the end of the match list (an empty or short page)
+        self.exhausted = False
+        # True if listing match IDs failed (HTTP error, rate limit give-up); the history wasn't fully read
+        self.failed = False
+        # Matches whose details couldn't be downloaded (their claims are released), and their pages
+        self.fetch_failures = 0
+        self.failed_pages = set()
+        self._stop = threading.Event()
+        self._fetchers_left = 0
+        self._fetchers_lock = threading.Lock()
+        self._registered = {}
+        # page start -> (match IDs in page, number still to be written); insertion-ordered
+        self._pages: Dict[int, List] = {}
+        self._pages_lock = threading.Lock()
+
+    # --- stages ---
+
+    def _pager(self, puuid: str, start_time: Optional[int], start: int):
+        stats = self.stage_stats["pager"]
+        stats.started_at = time.monotonic()
+        session = self.session_factory()
+        try:
+            while not self._stop.is_set():
+                began = time.monotonic()
+                match_ids = self.collector.riot_client.get_match_ids(
+                    puuid, start=start, count=self.page_size, start_time=start_time
+                )
+                if match_ids is None:
+                    logger.error(f"[pipeline] listing matches failed for puuid={puuid[:12]}... (start={start})")
+                    self.failed = True
+                    break
+                if not match_ids:
+                    logger.info(f"No more matches for puuid={puuid[:12]}... (start={start})")
+                    self.exhausted = True
+                    break
+
+                page_ids = self.claims.claim(match_ids) if self.claims is not None else list(match_ids)
+                stored_matches = self.collector._load_stored_matches(session, page_ids)
+                hits = sum(1 for match_id in page_ids if match_id in stored_matches)
+                self.collector._record_store_lookup(hits, len(page_ids) - hits)
+                logger.info(
+                    f"Processing {len(page_ids)} of {len(match_ids)} matches (start={start}): "
+                    f"store hits={hits}, misses={len(page_ids) - hits}"
+                )
+
+                with self._pages_lock:
+                    self._pages[start] = [page_ids, len(page_ids)]
+                stats.record(time.monotonic() - began, len(page_ids))
+
+                for match_id in page_ids:
+                    if match_id in stored_matches:
+                        self.parse_queue.put(_Item(start, match_id, stored_matches[match_id]), self._stop)
+                    else:
+                        self.fetch_queue.put(_Item(start, match_id), self._stop)
+
+                if len(match_ids) < self.page_size:
+                    self.exhausted = True
+                    break
+                start += self.page_size
+        except Exception as e:
+            logger.error(f"[pipeline] pager failed: {e}")
+            self.failed = True
+        finally:
+            session.close()
+            for _ in range(self.fetch_workers):
+                self.fetch_queue.put(_DONE, self._stop)
+            stats.finished_at = time.monotonic()
+
+    def _fetcher(self):
+        stats = self.stage_stats["fetcher"]
+        try:
+            while True:
+                item = self.fetch_queue.get(self._stop)
+                if item is _DONE:
+                    break
+                began = time.monotonic()
+                try:
+                    item.raw = self.collector.riot_client.get_match_details(item.match_id)
+                except Exception as e:
+                    logger.error(f"[pipeline] fetch failed match_id={item.match_id}: {e}")
+                    item.raw = None
+                item.is_new = item.raw is not None
+                if item.raw is None:
+                    with self._fetchers_lock:
+                        self.fetch_failures += 1
+                        self.failed_pages.add(item.page_start)
+                    if self.claims is not None:
+                        self.claims.release([item.match_id])
+                stats.record(time.monotonic() - began)
+                if not self.parse_queue.put(item, self._stop):
+                    break
+        finally:
+            with self._fetchers_lock:
+                self._fetchers_left -= 1
+                last = self._fetchers_left == 0
+            if last:
+                stats.finished_at = time.monotonic()
+                self.parse_queue.put(_DONE, self._stop)
+
+    def _parser(self):
+        stats = self.stage_stats["parser"]
+        stats.started_at = time.monotonic()
+        try:
+            while True:
+                item = self.parse_queue.get(self._stop)
+                if item is _DONE:
+                    break
+                began = time.monotonic()
+                if item.raw:
+                    try:
+                        item.rows = self.collector._extract_match_rows(item.raw, self._registered)
+                        item.dimension_rows = self.collector._extract_dimension_rows(item.raw, self._registered)
+                        item.team_rows = self.collector._extract_team_rows(item.raw, self._registered)
+                        if item.is_new:
+                            # Stored matches got theirs when first fetched (or from the backfill)
+                            item.participant_rows = self.collector._extract_participant_rows(item.raw)
+                    except Exception as e:
+                        logger.error(f"[pipeline] extraction failed match_id={item.match_id}: {e}")
+                        item.rows = []
+                        item.dimension_rows = []
+                        item.team_rows = []
+                        item.participant_rows = []
+                stats.record(time.monotonic() - began)
+                if not self.write_queue.put(item, self._stop):
+                    break
+        finally:
+            stats.finished_at = time.monotonic()
+            self.write_queue.put(_DONE, self._stop)
+
+    def _flush(self, session: Session, batch: List[_Item]):
+        if batch:
+            stats = self.stage_stats["writer"]
+            began = time.monotonic()
+            raw_rows = [{"match_id": item.match_id, "raw": item.raw} for item in batch if item.is_new]
+            performance_rows = [row for item in batch for row in item.rows]
+            dimension_rows = [row for item in batch for row in item.dimension_rows]
+            team_rows = [row for item in batch for row in item.team_rows]
+            participant_rows = [row for item in batch for row in item.participant_rows]
+            written = self.collector._write_rows(
+                session, raw_rows, performance_rows, dimension_rows, team_rows, participant_rows
+            )
+            self.saved += len(written)
+            self.affected_summoner_ids.update(row["summoner_id"] for row in written)
+            stats.record(time.monotonic() - began, len(batch))
+
+        completed = []
+        with self._pages_lock:
+            for item in batch:
+                self._pages[item.page_start][1] -= 1
+            # Report pages in order, and only once every earlier page is written too
+            for page_start, (match_ids, remaining) in list(self._pages.items()):
+                if remaining > 0:
+                    break
+                completed.append((page_start, match_ids))
+                del self._pages[page_start]
+        for page_start, match_ids in completed:
+            logger.info(f"Page completed: start={page_start}, total={len(match_ids)}, saved so far={self.saved}")
+            if self.on_page_complete is not None:
+                self.on_page_complete(session, page_start, match_ids)
+
+    def _page_complete_in(self, batch: List[_Item]) -> bool:
+        with self._pages_lock:
+            if not self._pages:
+                return False
+            page_start, (_, remaining) = next(iter(self._pages.items()))
+        return sum(1 for item in batch if item.page_start == page_start) >= remaining
+
+    def _writer(self, session: Session):
+        stats = self.stage_stats["writer"]
+        stats.started_at = time.monotonic()
+        batch: List[_Item] = []
+        try:
+            while True:
+                try:
+                    item = self.write_queue.queue.get(timeout=Config.COLLECTOR_FLUSH_INTERVAL)
+                except queue.Empty:
+                    self._flush(session, batch)
+                    batch = []
+                    continue
+                if item is _DONE:
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size or self._page_complete_in(batch):
+                    self._flush(session, batch)
+                    batch = []
+            self._flush(session, batch)
+        finally:
+            stats.finished_at = time.monotonic()
+
+    # --- driver ---
+
+    def run(self, session: Session, summoner: Summoner, start_time: Optional[int] = None, start: int = 0) -> int:
+        """
+        Runs the pipeline to completion, paging from match list offset `start`.
+        The writer uses `session`; returns the number of performances saved.
+        """
+        self._registered = self.collector._load_registered_summoners(session)
+        self._fetchers_left = self.fetch_workers
+        self.stage_stats["fetcher"].started_at = time.monotonic()
+
+        threads = [threading.Thread(target=self._pager, args=(summoner.puuid, start_time, start), daemon=True)]
+        threads += [threading.Thread(target=self._fetcher, daemon=True) for _ in range(self.fetch_workers)]
+        threads.append(threading.Thread(target=self._parser, daemon=True))
+        for t in threads:
+            t.start()
+
+        try:
+            self._writer(session)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            # Unblocks upstream stages if the writer bailed out early
+            self._stop.set()
+            for t in threads:
+                t.join(timeout=5)
+
+        logger.info(f"Pipeline finished for {summoner.summoner_name}: saved={self.saved}, stats={self.stats()}")
+        return self.saved
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            "stages": {name: s.as_dict() for name, s in self.stage_stats.items()},
+            "queues": {q.name: q.as_dict() for q in (self.fetch_queue, self.parse_queue, self.write_queue)},
+            "saved": self.saved,
+        }
@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+# Bucket key for the application-wide limit of a routing value
+APP_SCOPE = "__app__"
+
+
+def parse_rate_limit_header(value: Optional[str]) -> List[Tuple[int, int]]:
+    """Parses Riot's "limit:seconds,limit:seconds" header format into (value, seconds) pairs."""
+    pairs: List[Tuple[int, int]] = []
+    if not value:
+        return pairs
+    for part in value.split(","):
+        try:
+            left, right = part.strip().split(":", 1)
+            pairs.append((int(left), int(right)))
+        except ValueError:
+            continue
+    return pairs
+
+
+class _Window:
+    def __init__(self, limit: int, seconds: int, margin: int):
+        self.limit = limit
+        self.seconds = seconds
+        self.margin = margin
+        self.count = 0
+        self.reset_at = 0.0
+
+    @property
+    def usable(self) -> int:
+        # Stay just under the advertised limit, but never below one request
+        return max(1, self.limit - self.margin)
+
+
+class RateLimiter:
+    """
+    Proactive token-bucket limiter for the Riot API, keyed by (routing value, method).
+
+    Every request must fit both the app buckets of its routing value and the
+    buckets of its method. Limits start from Config.RIOT_APP_RATE_LIMIT and are
+    replaced by whatever X-App-Rate-Limit / X-Method-Rate-Limit headers say.
+    Thread-safe; use `get_rate_limiter()` to share one instance per process.
+    """
+
+    def __init__(self, app_limits: Optional[str] = None, margin: Optional[int] = None, clock=time.monotonic):
+        self._lock = threading.Lock()
+        self._clock = clock
+        self._margin = Config.RIOT_RATE_LIMIT_MARGIN if margin is None else margin
+        self._default_app_limits = parse_rate_limit_header(
+            app_limits if app_limits is not None else Config.RIOT_APP_RATE_LIMIT
+        )
+        self._windows: Dict[Tuple[str, str], List[_Window]] = {}
+        self._blocked_until: Dict[Tuple[str, str], float] = {}
+
+    # --- reservation ---
+
+    def _keys(self, routing: str, method: str) -> List[Tuple[str, str]]:
+        app_key = (routing, APP_SCOPE)
+        if app_key not in self._windows:
+            self._windows[app_key] = [_Window(l, s, self._margin) for l, s in self._default_app_limits]
+        return [app_key, (routing, method)]
+
+    def _reserve_windows(self, keys: List[Tuple[str, str]], now: float) -> float:
+        windows = [w for key in keys for w in self._windows.get(key, [])]
+        wait = 0.0
+        for w in windows:
+            if now >= w.reset_at:
+                w.count = 0
+            if w.count >= w.usable:
+                wait = max(wait, w.reset_at - now)
+        if wait > 0:
+            return wait
+        for w in windows:
+            if w.count == 0:
+                w.reset_at = now + w.seconds
+            w.count += 1
+        return 0.0
+
+    def reserve(self, routing: str, method: str) -> float:
+        """Takes one request slot if available. Returns 0 on success, otherwise seconds to wait."""
+        with self._lock:
+            now = self._clock()
+            keys = self._keys(routing, method)
+            blocked = max(self._blocked_until.get(k, 0.0) for k in keys) - now
+            if blocked > 0:
+                return blocked
+            return self._reserve_windows(keys, now)
+
+    def acquire(self, routing: str, method: str):
+        while True:
+            wait = self.reserve(routing, method)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, routing: str, method: str):
+        while True:
+            wait = self.reserve(routing, method)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    # --- feedback from responses ---
+
+    def _apply_limits(self, key: Tuple[str, str], limits_header, counts_header, now: float):
+        limits = parse_rate_limit_header(limits_header)
+        if not limits:
+            return
+        counts = {seconds: count for count, seconds in parse_rate_limit_header(counts_header)}
+        existing = {w.seconds: w for w in self._windows.get(key, [])}
+        windows: List[_Window] = []
+        for limit, seconds in limits:
+            w = existing.get(seconds) or _Window(limit, seconds, self._margin)
+            w.limit = limit
+            server_count = counts.get(seconds)
+            if server_count is not None:
+                if now >= w.reset_at:
+                    w.count = 0
+                    w.reset_at = now + seconds
+                # Other processes sharing the key may have spent quota we haven't seen
+                w.count = max(w.count, server_count)
+            windows.append(w)
+        self._windows[key] = windows
+
+    def update_from_headers(self, routing: str, method: str, headers):
+        if headers is None:
+            return
+        with self._lock:
+            now = self._clock()
+            self._apply_limits(
+                (routing, APP_SCOPE),
+                headers.get("X-App-Rate-Limit"),
+                headers.get("X-App-Rate-Limit-Count"),
+                now,
+            )
+            self._apply_limits(
+                (routing, method),
+                headers.get("X-Method-Rate-Limit"),
+                headers.get("X-Method-Rate-Limit-Count"),
+                now,
+            )
+
+    def penalize(self, routing: str, method: str, headers=None) -> float:
+        """Records a 429. Blocks the offending scope for Retry-After seconds and returns the delay."""
+        headers = headers or {}
+        retry_after = headers.get("Retry-After")
+        try:
+            delay = float(retry_after) if retry_after is not None else 2.0
+        except ValueError:
+            delay = 2.0
+        scope = APP_SCOPE if headers.get("X-Rate-Limit-Type") == "application" else method
+        with self._lock:
+            key = (routing, scope)
+            until = self._clock() + delay
+            self._blocked_until[key] = max(self._blocked_until.get(key, 0.0), until)
+        logger.warning(f"[rate_limiter] 429 routing={routing}, method={method}, scope={scope}, retry_after={delay}s")
+        return delay
+
+
+class RedisRateLimiter(RateLimiter):
+    """
+    Same interface as RateLimiter, but request counts and 429 back-offs live in
+    Redis so every Celery worker draws from one shared budget. Limits learned
+    from headers are still kept per process.
+    """
+
+    def __init__(self, redis_url: str, prefix: str = "riot:rl", **kwargs):
+        super().__init__(**kwargs)
+        import redis
+
+        self._redis = redis.Redis.from_url(redis_url)
+        self._prefix = prefix
+
+    def _reserve_windows(self, keys: List[Tuple[str, str]], now: float) -> float:
+        wall = time.time()
+        entries = []
+        for key in keys:
+            for w in self._windows.get(key, []):
+                bucket = int(wall // w.seconds)
+                redis_key = f"{self._prefix}:{key[0]}:{key[1]}:{w.seconds}:{bucket}"
+                entries.append((redis_key, w, (bucket + 1) * w.seconds - wall))
+        if not entries:
+            return 0.0
+
+        pipe = self._redis.pipeline()
+        for redis_key, w, _ in entries:
+            pipe.incr(redis_key)
+            pipe.expire(redis_key, w.seconds + 1)
+        results = pipe.execute()
+        counts = results[0::2]
+
+        wait = 0.0
+        for (redis_key, w, remaining), count in zip(entries, counts):
+            if count > w.usable:
+                wait = max(wait, remaining)
+        if wait > 0:
+            # Give the slots back; this request did not happen
+            pipe = self._redis.pipeline()
+            for redis_key, _, _ in entries:
+                pipe.decr(redis_key)
+            pipe.execute()
+        return wait
+
+    def reserve(self, routing: str, method: str) -> float:
+        with self._lock:
+            keys = self._keys(routing, method)
+            ttls = [self._redis.pttl(f"{self._prefix}:blocked:{k[0]}:{k[1]}") for k in keys]
+            blocked = max(ttls) / 1000.0
+            if blocked > 0:
+                return blocked
+            return self._reserve_windows(keys, self._clock())
+
+    def penalize(self, routing: str, method: str, headers=None) -> float:
+        delay = super().penalize(routing, method, headers)
+        headers = headers or {}
+        scope = APP_SCOPE if headers.get("X-Rate-Limit-Type") == "application" else method
+        self._redis.set(f"{self._prefix}:blocked:{routing}:{scope}", 1, px=max(1, int(delay * 1000)))
+        return delay
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Returns the process-wide limiter (Redis-backed when RIOT_RATE_LIMIT_BACKEND=redis)."""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            if Config.RIOT_RATE_LIMIT_BACKEND == "redis":
+                try:
+                    _shared_limiter = RedisRateLimiter(Config.REDIS_URL)
+                except Exception as e:
+                    logger.error(f"Failed to create Redis rate limiter: {e}. Falling back to in-process limiter.")
+                    _shared_limiter = RateLimiter()
+            else:
+                _shared_limiter = RateLimiter()
+        return _shared_limiter
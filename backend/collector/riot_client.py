@@ -1,8 +1,9 @@
 import requests
-import time
 import logging
 from typing import Optional
+from requests.adapters import HTTPAdapter
 from .config import Config
+from .rate_limiter import get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -11,38 +12,65 @@ class RiotAPIClient:
         self.headers = {
             "X-Riot-Token": Config.RIOT_API_KEY
         }
+        self.session = requests.Session()
+        # Every poll worker runs its own fetchers on this session; without a pool that large,
+        # connections beyond the default 10 are opened and thrown away on each request
+        pool_size = Config.COLLECTOR_POLL_WORKERS * Config.COLLECTOR_FETCH_WORKERS
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=pool_size))
+        self.rate_limiter = get_rate_limiter()
 
     def _update_headers(self):
         self.headers["X-Riot-Token"] = Config.RIOT_API_KEY
 
-    def get_summoner_by_name(self, summoner_name):
+    def _get(self, routing, method, path, tag, params=None):
+        """GET through the shared rate limiter. Returns the response on 200, otherwise None."""
         self._update_headers()
-        url = f"https://{Config.PLATFORM_ROUTING_VALUE}.api.riotgames.com/lol/summoner/v4/summoners/by-name/{summoner_name}"
-        response = requests.get(url, headers=self.headers)
-        if response.status_code == 200:
-            return response.json()
+        url = Config.RIOT_API_BASE_URL.format(routing=routing) + path
+        for attempt in range(Config.RIOT_MAX_RETRIES):
+            self.rate_limiter.acquire(routing, method)
+            response = self.session.get(url, headers=self.headers, params=params)
+            self.rate_limiter.update_from_headers(routing, method, response.headers)
+            if response.status_code == 200:
+                return response
+            if response.status_code == 429:
+                # Block the offending scope; the next acquire() waits it out
+                self.rate_limiter.penalize(routing, method, response.headers)
+                continue
+            logger.error(f"[{tag}] HTTP {response.status_code} path={path}, body={response.text[:200]}")
+            return None
+        logger.error(f"[{tag}] giving up after {Config.RIOT_MAX_RETRIES} rate-limited attempts path={path}")
         return None
 
+    def get_summoner_by_name(self, summoner_name):
+        response = self._get(
+            Config.PLATFORM_ROUTING_VALUE,
+            "summoner-v4.getBySummonerName",
+            f"/lol/summoner/v4/summoners/by-name/{summoner_name}",
+            "get_summoner_by_name",
+        )
+        return response.json() if response is not None else None
+
     def get_account_by_riot_id(self, game_name, tag_line):
-        self._update_headers()
-        url = f"https://{Config.ROUTING_VALUE}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}"
-        response = requests.get(url, headers=self.headers)
-        if response.status_code == 200:
-            return response.json()
-        return None
+        response = self._get(
+            Config.ROUTING_VALUE,
+            "account-v1.getByRiotId",
+            f"/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}",
+            "get_account_by_riot_id",
+        )
+        return response.json() if response is not None else None
 
     def get_summoner_by_puuid(self, puuid):
-        self._update_headers()
-        url = f"https://{Config.PLATFORM_ROUTING_VALUE}.api.riotgames.com/lol/summoner/v4/summoners/by-puuid/{puuid}"
-        response = requests.get(url, headers=self.headers)
-        if response.status_code == 200:
-            return response.json()
-        return None
+        response = self._get(
+            Config.PLATFORM_ROUTING_VALUE,
+            "summoner-v4.getByPUUID",
+            f"/lol/summoner/v4/summoners/by-puuid/{puuid}",
+            "get_summoner_by_puuid",
+        )
+        return response.json() if response is not None else None
 
     def get_match_ids(self, puuid, start=0, count=20, start_time: Optional[int] = None):
-        self._update_headers()
+        """Match IDs of one page, newest first; [] past the end of history, None if the request failed."""
         # queue=440 is Flex Rank
-        url = f"https://{Config.ROUTING_VALUE}.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids"
         params = {
             "queue": Config.QUEUE_ID,
             "start": start,
@@ -50,47 +78,28 @@ class RiotAPIClient:
         }
         if start_time is not None:
             params["startTime"] = start_time
-        # Simple retry loop to handle rate limiting (HTTP 429)
-        for attempt in range(3):
-            logger.info(f"[get_match_ids] puuid={puuid[:12]}..., start={start}, count={count}, attempt={attempt+1}")
-            response = requests.get(url, headers=self.headers, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"[get_match_ids] 200 OK puuid={puuid[:12]}..., start={start}, got={len(data)}")
-                return data
-            if response.status_code == 429:
-                # Respect Retry-After header when present
-                retry_after = response.headers.get("Retry-After")
-                try:
-                    delay = int(retry_after) if retry_after is not None else 2
-                except ValueError:
-                    delay = 2
-                logger.warning(f"[get_match_ids] 429 rate limited puuid={puuid[:12]}..., start={start}, retry_after={delay}s")
-                time.sleep(delay)
-                continue
-            logger.error(f"[get_match_ids] HTTP {response.status_code} puuid={puuid[:12]}..., start={start}, body={response.text[:200]}")
-            break
-        return []
+        logger.info(f"[get_match_ids] puuid={puuid[:12]}..., start={start}, count={count}")
+        response = self._get(
+            Config.ROUTING_VALUE,
+            "match-v5.getMatchIdsByPUUID",
+            f"/lol/match/v5/matches/by-puuid/{puuid}/ids",
+            "get_match_ids",
+            params=params,
+        )
+        if response is None:
+            return None
+        data = response.json()
+        logger.info(f"[get_match_ids] 200 OK puuid={puuid[:12]}..., start={start}, got={len(data)}")
+        return data
 
     def get_match_details(self, match_id):
-        self._update_headers()
-        url = f"https://{Config.ROUTING_VALUE}.api.riotgames.com/lol/match/v5/matches/{match_id}"
-        # Simple retry loop to handle rate limiting (HTTP 429)
-        for attempt in range(3):
-            logger.info(f"[get_match_details] match_id={match_id}, attempt={attempt+1}")
-            response = requests.get(url, headers=self.headers)
-            if response.status_code == 200:
-                logger.info(f"[get_match_details] 200 OK match_id={match_id}")
-                return response.json()
-            if response.status_code == 429:
-                retry_after = response.headers.get("Retry-After")
-                try:
-                    delay = int(retry_after) if retry_after is not None else 2
-                except ValueError:
-                    delay = 2
-                logger.warning(f"[get_match_details] 429 rate limited match_id={match_id}, retry_after={delay}s")
-                time.sleep(delay)
-                continue
-            logger.error(f"[get_match_details] HTTP {response.status_code} match_id={match_id}, body={response.text[:200]}")
-            break
-        return None
+        response = self._get(
+            Config.ROUTING_VALUE,
+            "match-v5.getMatch",
+            f"/lol/match/v5/matches/{match_id}",
+            "get_match_details",
+        )
+        if response is None:
+            return None
+        logger.info(f"[get_match_details] 200 OK match_id={match_id}")
+        return response.json()
@@ -0,0 +1,166 @@
+import heapq
+import logging
+import math
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from backend.shared.database import SessionLocal, Summoner, MatchPerformance, SummonerIngestState
+from .config import Config
+from .pipeline import MATCH_ID_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_WEEK = 7 * 24 * 60
+
+
+def compute_poll_interval(games_last_week: int, last_game_at: Optional[datetime], now: datetime) -> timedelta:
+    """Frequent players are polled often; dormant accounts back off towards once a day."""
+    if games_last_week >= 10:
+        minutes = 15
+    elif games_last_week >= 3:
+        minutes = 30
+    elif games_last_week >= 1:
+        minutes = 120
+    elif last_game_at is not None and now - last_game_at <= timedelta(days=30):
+        minutes = 360
+    else:
+        minutes = 1440
+    minutes = max(Config.COLLECTOR_MIN_POLL_MINUTES, min(Config.COLLECTOR_MAX_POLL_MINUTES, minutes))
+    return timedelta(minutes=minutes)
+
+
+def estimate_poll_cost(games_last_week: int, interval: timedelta) -> int:
+    """Riot requests a poll is expected to use: one match-ID page plus the new matches since the last poll."""
+    expected_new_games = games_last_week * (interval.total_seconds() / 60.0) / MINUTES_PER_WEEK
+    return 1 + int(math.ceil(expected_new_games))
+
+
+def estimate_backfill_cost(backfill_cursor: int) -> int:
+    """
+    Riot requests to finish a backfill from match list offset `backfill_cursor`: a match-ID page
+    plus one detail download per match for every remaining page. The match list doesn't report its
+    length, so the history is assumed to hold Config.COLLECTOR_BACKFILL_MATCHES_ESTIMATE matches.
+    """
+    remaining = max(Config.COLLECTOR_BACKFILL_MATCHES_ESTIMATE - (backfill_cursor or 0), MATCH_ID_PAGE_SIZE)
+    return int(math.ceil(remaining / MATCH_ID_PAGE_SIZE)) * (1 + MATCH_ID_PAGE_SIZE)
+
+
+class AdaptivePollScheduler:
+    """
+    Priority queue of (next poll time, summoner id). Each tick polls the summoners that are due,
+    earliest first, as long as the estimated Riot request cost fits a budget that refills at
+    Config.COLLECTOR_REQUESTS_PER_MINUTE. Next poll times are persisted on SummonerIngestState.
+    """
+
+    def __init__(
+        self,
+        collector,
+        requests_per_minute: Optional[int] = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+        clock: Callable[[], datetime] = datetime.utcnow,
+    ):
+        self.collector = collector
+        self.requests_per_minute = requests_per_minute or Config.COLLECTOR_REQUESTS_PER_MINUTE
+        self.session_factory = session_factory
+        self.clock = clock
+        self.tokens = float(self.requests_per_minute)
+        self._last_refill: Optional[datetime] = None
+        self._heap: List[Tuple[datetime, int]] = []
+        self._costs: Dict[int, int] = {}
+        self._known = set()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: datetime):
+        if self._last_refill is not None:
+            elapsed_minutes = (now - self._last_refill).total_seconds() / 60.0
+            # Never bank more than one minute of budget
+            self.tokens = min(float(self.requests_per_minute), self.tokens + elapsed_minutes * self.requests_per_minute)
+        self._last_refill = now
+
+    def _sync_summoners(self, session: Session, now: datetime):
+        """Adds summoners registered since the last tick; new ones are due immediately."""
+        rows = (
+            session.query(Summoner.id, SummonerIngestState)
+            .outerjoin(SummonerIngestState, SummonerIngestState.summoner_id == Summoner.id)
+            .all()
+        )
+        for summoner_id, state in rows:
+            if summoner_id in self._known:
+                continue
+            self._known.add(summoner_id)
+            self._costs[summoner_id] = self._backfill_cost(state) or 1
+            heapq.heappush(self._heap, ((state.next_poll_at if state is not None else None) or now, summoner_id))
+
+    @staticmethod
+    def _backfill_cost(state: Optional[SummonerIngestState]) -> Optional[int]:
+        """What the next poll costs if it continues an unfinished backfill, else None."""
+        if state is not None and state.backfill_complete:
+            return None
+        return estimate_backfill_cost(state.backfill_cursor if state is not None else 0)
+
+    def _reschedule(self, session: Session, summoner_id: int, now: datetime) -> datetime:
+        state = session.query(SummonerIngestState).filter(SummonerIngestState.summoner_id == summoner_id).first()
+        games_last_week = (
+            session.query(MatchPerformance)
+            .filter(
+                MatchPerformance.summoner_id == summoner_id,
+                MatchPerformance.game_creation >= now - timedelta(days=7),
+            )
+            .count()
+        )
+        last_game_at = state.last_game_creation if state is not None else None
+        interval = compute_poll_interval(games_last_week, last_game_at, now)
+        next_poll_at = now + interval
+        if state is not None:
+            state.next_poll_at = next_poll_at
+            session.commit()
+        self._costs[summoner_id] = self._backfill_cost(state) or estimate_poll_cost(games_last_week, interval)
+        heapq.heappush(self._heap, (next_poll_at, summoner_id))
+        return next_poll_at
+
+    def next_due(self) -> List[int]:
+        """Pops the summoners to poll now, spending budget. Stops at the first one that doesn't fit."""
+        now = self.clock()
+        self._refill(now)
+        due: List[int] = []
+        while self._heap and self._heap[0][0] <= now:
+            summoner_id = self._heap[0][1]
+            cost = self._costs.get(summoner_id, 1)
+            # A poll costing more than a whole minute's budget still runs once the budget is full
+            if cost > self.tokens and (due or self.tokens < self.requests_per_minute):
+                break
+            heapq.heappop(self._heap)
+            self.tokens -= cost
+            due.append(summoner_id)
+        return due
+
+    def tick(self):
+        if not self._lock.acquire(blocking=False):
+            logger.info("Previous scheduler tick still running, skipping.")
+            return
+        try:
+            session = self.session_factory()
+            try:
+                self._sync_summoners(session, self.clock())
+            finally:
+                session.close()
+
+            due = self.next_due()
+            if not due:
+                return
+            logger.info(f"Scheduler tick: polling {len(due)} summoners, budget left={self.tokens:.1f}, queued={len(self._heap)}")
+
+            self.collector.poll_summoners(due)
+
+            session = self.session_factory()
+            try:
+                now = self.clock()
+                for summoner_id in due:
+                    self._reschedule(session, summoner_id, now)
+            finally:
+                session.close()
+        finally:
+            self._lock.release()
@@ -2,13 +2,10 @@ import unittest
 from unittest.mock import MagicMock, patch
 from backend.collector.collector_service import CollectorService
 from backend.collector.mock_data import MOCK_SUMMONER, MOCK_MATCH_IDS, MOCK_MATCH_DETAIL
-from backend.shared.database import SessionLocal, Summoner, MatchPerformance, Base, engine
+from backend.shared.database import SessionLocal, Summoner, MatchPerformance
 
 class TestCollectorService(unittest.TestCase):
     def setUp(self):
-        # Reset DB
-        Base.metadata.drop_all(bind=engine)
-        Base.metadata.create_all(bind=engine)
         self.service = CollectorService()
 
     @patch('backend.collector.riot_client.RiotAPIClient.get_summoner_by_name')
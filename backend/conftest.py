@@ -0,0 +1,33 @@
+"""
+Every test runs against its own throwaway SQLite database, never the one DB_URL points to.
+
+The app's sessionmaker is rebound to a fresh file database per test (a file rather than
+:memory: so the collector's threads get real, separate connections). unittest-style tests
+reach the engine as `self.engine`.
+"""
+import os
+
+# Set before the app modules are imported: the collector creates tables on the configured
+# database at import time, and a developer's local Redis must not serve responses across tests
+os.environ["DB_URL"] = "sqlite://"
+os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+
+import pytest
+from sqlalchemy import create_engine
+
+from backend.shared.database import Base, SessionLocal
+
+
+@pytest.fixture(autouse=True)
+def test_database(request, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    app_bind = SessionLocal.kw["bind"]
+    SessionLocal.configure(bind=engine)
+    if request.instance is not None:
+        request.instance.engine = engine
+    try:
+        yield engine
+    finally:
+        SessionLocal.configure(bind=app_bind)
+        engine.dispose()
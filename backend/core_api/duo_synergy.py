@@ -1,12 +1,21 @@
-from typing import Dict, List, Tuple
+import threading
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy.orm import Session
+import numpy as np
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session, aliased
 
-from backend.shared.database import Summoner, MatchPerformance, MatchDetail
+from backend.collector.data_processor import DataProcessor
+from backend.shared.database import Summoner, MatchPerformance, MatchTeamMember, SummonerRoleAggregate, insert_ignore
+from backend.shared.match_storage import load_raw_matches
 from backend.core_api.playstyle_tags import (
+    ADVANCED_DIMENSIONS_VERSION,
+    MATCH_DETAIL_CHUNK_SIZE,
+    ROLE_ALL,
     DimensionScores,
-    compute_dimensions,
-    compute_advanced_dimensions_for_role,
+    dimension_scores_from_aggregate,
+    load_role_aggregates,
+    load_role_aggregates_bulk,
 )
 
 
@@ -14,43 +23,8 @@ def _compute_overall_dimension_scores_for_summoner(
     db: Session,
     summoner: Summoner,
 ) -> Tuple[DimensionScores, int]:
-    matches = (
-        db.query(MatchPerformance)
-        .filter(MatchPerformance.summoner_id == summoner.id)
-        .all()
-    )
-    games = len(matches)
-    if games == 0:
-        return DimensionScores(
-            aggro=0.0,
-            risk=0.0,
-            vision=0.0,
-            farm=0.0,
-            damage=0.0,
-            winrate=0.0,
-        ), 0
-
-    basic = compute_dimensions(matches)
-    adv = compute_advanced_dimensions_for_role(db, summoner, matches)
-
-    dims = DimensionScores(
-        aggro=basic.aggro,
-        risk=basic.risk,
-        vision=basic.vision,
-        farm=basic.farm,
-        damage=basic.damage,
-        winrate=basic.winrate,
-        earlyAggro=adv["earlyAggro"],
-        lateCarry=adv["lateCarry"],
-        laneLead=adv["laneLead"],
-        objectiveFocus=adv["objectiveFocus"],
-        teamfight=adv["teamfight"],
-        roam=adv["roam"],
-        splitPush=adv["splitPush"],
-        farmFocus=adv["farmFocus"],
-        visionControl=adv["visionControl"],
-    )
-    return dims, games
+    overall = load_role_aggregates(db, summoner)[ROLE_ALL]
+    return dimension_scores_from_aggregate(overall), overall.games or 0
 
 
 def _sim_scalar(v1: float, v2: float) -> float:
@@ -130,69 +104,193 @@ def compute_style_synergy(
     return style, breakdown
 
 
+# DimensionScores fields behind each style_breakdown category, and category weights (see compute_style_synergy)
+STYLE_GROUPS: Dict[str, List[str]] = {
+    "early_game": ["earlyAggro", "laneLead", "aggro"],
+    "late_game": ["lateCarry", "farmFocus", "damage"],
+    "vision_objective": ["visionControl", "vision", "objectiveFocus"],
+    "map_pressure": ["roam", "splitPush", "teamfight"],
+}
+STYLE_WEIGHTS: Dict[str, float] = {
+    "early_game": 0.25,
+    "late_game": 0.25,
+    "vision_objective": 0.20,
+    "map_pressure": 0.20,
+    "risk_control": 0.10,
+}
+
+
+def _sim_scalar_cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    avg = (a[:, None] + b[None, :]) / 2.0
+    diff = np.abs(a[:, None] - b[None, :])
+    return np.clip((1.0 - diff) * avg, 0.0, 1.0)
+
+
+def _sim_risk_cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    align = 1.0 - np.abs(a[:, None] - b[None, :])
+    level = np.maximum(0.0, 1.0 - (a[:, None] + b[None, :]) / 2.0)
+    return np.clip(align * level, 0.0, 1.0)
+
+
+def _dimension_columns(dims_list: List[DimensionScores]) -> Dict[str, np.ndarray]:
+    """DimensionScores field -> vector over `dims_list`."""
+    return {
+        field: np.array([getattr(d, field) for d in dims_list], dtype=np.float64)
+        for field in DimensionScores.model_fields
+    }
+
+
+def compute_style_synergy_cross(
+    columns_a: Dict[str, np.ndarray],
+    columns_b: Dict[str, np.ndarray],
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """compute_style_synergy for every (a, b) pair: (len a x len b) style scores and breakdown matrices."""
+    breakdown: Dict[str, np.ndarray] = {}
+    for category, (f1, f2, f3) in STYLE_GROUPS.items():
+        breakdown[category] = (
+            _sim_scalar_cross(columns_a[f1], columns_b[f1])
+            + _sim_scalar_cross(columns_a[f2], columns_b[f2])
+            + _sim_scalar_cross(columns_a[f3], columns_b[f3])
+        ) / 3.0
+    breakdown["risk_control"] = _sim_risk_cross(columns_a["risk"], columns_b["risk"])
+
+    style = (
+        STYLE_WEIGHTS["early_game"] * breakdown["early_game"]
+        + STYLE_WEIGHTS["late_game"] * breakdown["late_game"]
+        + STYLE_WEIGHTS["vision_objective"] * breakdown["vision_objective"]
+        + STYLE_WEIGHTS["map_pressure"] * breakdown["map_pressure"]
+        + STYLE_WEIGHTS["risk_control"] * breakdown["risk_control"]
+    )
+    return np.clip(style, 0.0, 1.0), breakdown
+
+
+def compute_style_synergy_matrix(dims_list: List[DimensionScores]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """compute_style_synergy for every pair at once: (N x N) style scores and breakdown matrices."""
+    columns = _dimension_columns(dims_list)
+    return compute_style_synergy_cross(columns, columns)
+
+
+def ensure_team_index(db: Session, summoner_ids: List[int], chunk_size: int = MATCH_DETAIL_CHUNK_SIZE) -> int:
+    """
+    Builds team index rows from stored match JSON for matches of `summoner_ids` that have none
+    (ingested before the index existed), for every registered participant of those matches.
+    Does not commit; returns the number of rows written.
+    """
+    if not summoner_ids:
+        return 0
+    missing = [
+        match_id for (match_id,) in db.query(MatchPerformance.match_id)
+        .outerjoin(MatchTeamMember, and_(
+            MatchTeamMember.summoner_id == MatchPerformance.summoner_id,
+            MatchTeamMember.match_id == MatchPerformance.match_id,
+        ))
+        .filter(MatchPerformance.summoner_id.in_(summoner_ids), MatchTeamMember.id.is_(None))
+        .distinct()
+    ]
+    written = 0
+    for i in range(0, len(missing), chunk_size):
+        stored = load_raw_matches(db, missing[i:i + chunk_size])
+        puuids = {
+            p.get("puuid") for raw in stored.values()
+            for p in (raw.get("info", {}) or {}).get("participants", []) or []
+        }
+        registered = dict(db.query(Summoner.puuid, Summoner.id).filter(Summoner.puuid.in_(puuids)))
+        rows = [row for raw in stored.values() for row in DataProcessor.extract_team_members(raw, registered)]
+        insert_ignore(db, MatchTeamMember, rows)
+        written += len(rows)
+    return written
+
+
 def _get_duo_match_stats(
     db: Session,
     s1: Summoner,
     s2: Summoner,
 ) -> List[Tuple[MatchPerformance, MatchPerformance, int]]:
-    matches1 = (
-        db.query(MatchPerformance)
-        .filter(MatchPerformance.summoner_id == s1.id)
-        .all()
-    )
-    matches2 = (
-        db.query(MatchPerformance)
-        .filter(MatchPerformance.summoner_id == s2.id)
+    """Games both summoners played on the same team, from one self-join over the team index."""
+    team1 = aliased(MatchTeamMember)
+    team2 = aliased(MatchTeamMember)
+    mp1 = aliased(MatchPerformance)
+    mp2 = aliased(MatchPerformance)
+    rows = (
+        db.query(mp1, mp2, team1.team_kills)
+        .select_from(team1)
+        .join(team2, and_(team2.match_id == team1.match_id, team2.team_id == team1.team_id))
+        .join(mp1, and_(mp1.match_id == team1.match_id, mp1.summoner_id == team1.summoner_id))
+        .join(mp2, and_(mp2.match_id == team2.match_id, mp2.summoner_id == team2.summoner_id))
+        .filter(team1.summoner_id == s1.id, team2.summoner_id == s2.id)
         .all()
     )
+    return [(m1, m2, team_kills or 0) for m1, m2, team_kills in rows]
 
-    by_id1 = {m.match_id: m for m in matches1}
-    by_id2 = {m.match_id: m for m in matches2}
-
-    duo: List[Tuple[MatchPerformance, MatchPerformance, int]] = []
-
-    shared_ids = set(by_id1.keys()) & set(by_id2.keys())
-    if not shared_ids:
-        return duo
 
-    for match_id in shared_ids:
-        mp1 = by_id1[match_id]
-        mp2 = by_id2[match_id]
-
-        db_match = (
-            db.query(MatchDetail)
-            .filter(MatchDetail.match_id == match_id)
-            .first()
+def _get_group_duo_match_stats(
+    db: Session,
+    summoner_ids: List[int],
+) -> Dict[Tuple[int, int], List[Tuple[MatchPerformance, MatchPerformance, int]]]:
+    """Same-team games for every pair in a group, keyed (lower id, higher id), from one self-join."""
+    team1 = aliased(MatchTeamMember)
+    team2 = aliased(MatchTeamMember)
+    mp1 = aliased(MatchPerformance)
+    mp2 = aliased(MatchPerformance)
+    rows = (
+        db.query(mp1, mp2, team1.team_kills)
+        .select_from(team1)
+        .join(team2, and_(team2.match_id == team1.match_id, team2.team_id == team1.team_id))
+        .join(mp1, and_(mp1.match_id == team1.match_id, mp1.summoner_id == team1.summoner_id))
+        .join(mp2, and_(mp2.match_id == team2.match_id, mp2.summoner_id == team2.summoner_id))
+        .filter(
+            team1.summoner_id.in_(summoner_ids),
+            team2.summoner_id.in_(summoner_ids),
+            team1.summoner_id < team2.summoner_id,
         )
-        if not db_match or not db_match.raw:
-            continue
-
-        data = db_match.raw or {}
-        info = data.get("info", {}) or {}
-        participants = info.get("participants", []) or []
-
-        team1 = None
-        team2 = None
-        for p in participants:
-            puuid = p.get("puuid")
-            if puuid == s1.puuid:
-                team1 = p.get("teamId")
-            elif puuid == s2.puuid:
-                team2 = p.get("teamId")
-
-        if team1 is None or team2 is None:
-            continue
-        if team1 != team2:
-            continue
-
-        team_kills = 0
-        for p in participants:
-            if p.get("teamId") == team1:
-                team_kills += int(p.get("kills", 0))
+        .all()
+    )
+    by_pair: Dict[Tuple[int, int], List[Tuple[MatchPerformance, MatchPerformance, int]]] = {}
+    for m1, m2, team_kills in rows:
+        by_pair.setdefault((m1.summoner_id, m2.summoner_id), []).append((m1, m2, team_kills or 0))
+    return by_pair
 
-        duo.append((mp1, mp2, team_kills))
 
-    return duo
+def _get_partner_duo_match_stats(
+    db: Session,
+    summoner_id: int,
+    partner_ids: List[int],
+) -> Dict[int, List[Tuple[MatchPerformance, MatchPerformance, int]]]:
+    """Same-team games of one summoner with each of `partner_ids`, keyed by partner id, from one self-join."""
+    if not partner_ids:
+        return {}
+    team1 = aliased(MatchTeamMember)
+    team2 = aliased(MatchTeamMember)
+    mp1 = aliased(MatchPerformance)
+    mp2 = aliased(MatchPerformance)
+    rows = (
+        db.query(mp1, mp2, team1.team_kills)
+        .select_from(team1)
+        .join(team2, and_(team2.match_id == team1.match_id, team2.team_id == team1.team_id))
+        .join(mp1, and_(mp1.match_id == team1.match_id, mp1.summoner_id == team1.summoner_id))
+        .join(mp2, and_(mp2.match_id == team2.match_id, mp2.summoner_id == team2.summoner_id))
+        .filter(team1.summoner_id == summoner_id, team2.summoner_id.in_(partner_ids))
+        .all()
+    )
+    by_partner: Dict[int, List[Tuple[MatchPerformance, MatchPerformance, int]]] = {}
+    for m1, m2, team_kills in rows:
+        by_partner.setdefault(m2.summoner_id, []).append((m1, m2, team_kills or 0))
+    return by_partner
+
+
+def _get_shared_game_counts(db: Session, summoner_id: int) -> Dict[int, int]:
+    """partner id -> number of same-team games with `summoner_id`, from the team index only."""
+    team1 = aliased(MatchTeamMember)
+    team2 = aliased(MatchTeamMember)
+    rows = (
+        db.query(team2.summoner_id, func.count())
+        .select_from(team1)
+        .join(team2, and_(team2.match_id == team1.match_id, team2.team_id == team1.team_id))
+        .filter(team1.summoner_id == summoner_id, team2.summoner_id != summoner_id)
+        .group_by(team2.summoner_id)
+        .all()
+    )
+    return {partner_id: count for partner_id, count in rows}
 
 
 def compute_duo_performance(
@@ -244,19 +342,14 @@ def compute_duo_performance(
     return perf, games
 
 
-def compute_duo_synergy(
-    db: Session,
-    summoner1: Summoner,
-    summoner2: Summoner,
+def _combine_synergy(
+    style_score: float,
+    breakdown: Dict[str, float],
+    perf_score: float,
+    duo_games: int,
+    games1: int,
+    games2: int,
 ) -> Dict[str, object]:
-    dims1, games1 = _compute_overall_dimension_scores_for_summoner(db, summoner1)
-    dims2, games2 = _compute_overall_dimension_scores_for_summoner(db, summoner2)
-
-    style_score, breakdown = compute_style_synergy(dims1, dims2)
-
-    duo_matches = _get_duo_match_stats(db, summoner1, summoner2)
-    perf_score, duo_games = compute_duo_performance(duo_matches)
-
     total = 0.6 * style_score + 0.4 * perf_score
     total_int = int(round(total * 100.0))
     if total_int < 0:
@@ -273,3 +366,191 @@ def compute_duo_synergy(
         "summoner1_games": games1,
         "summoner2_games": games2,
     }
+
+
+def compute_duo_synergy(
+    db: Session,
+    summoner1: Summoner,
+    summoner2: Summoner,
+) -> Dict[str, object]:
+    dims1, games1 = _compute_overall_dimension_scores_for_summoner(db, summoner1)
+    dims2, games2 = _compute_overall_dimension_scores_for_summoner(db, summoner2)
+
+    style_score, breakdown = compute_style_synergy(dims1, dims2)
+
+    if ensure_team_index(db, [summoner1.id, summoner2.id]):
+        db.commit()
+    duo_matches = _get_duo_match_stats(db, summoner1, summoner2)
+    perf_score, duo_games = compute_duo_performance(duo_matches)
+
+    return _combine_synergy(style_score, breakdown, perf_score, duo_games, games1, games2)
+
+
+def compute_duo_synergy_matrix(
+    db: Session,
+    summoners: List[Summoner],
+) -> List[List[Optional[Dict[str, object]]]]:
+    """
+    compute_duo_synergy for every pair of `summoners` (diagonal is None). Each summoner's dimensions
+    are loaded once, style synergy is vectorized over all pairs and duo games come from one query.
+    """
+    ids = [s.id for s in summoners]
+    aggregates = load_role_aggregates_bulk(db, ids)
+    overall = [aggregates[summoner_id].get(ROLE_ALL) for summoner_id in ids]
+    dims_list = [dimension_scores_from_aggregate(row) for row in overall]
+    games = [(row.games or 0) for row in overall]
+
+    style, breakdown = compute_style_synergy_matrix(dims_list)
+    if ensure_team_index(db, ids):
+        db.commit()
+    duo_by_pair = _get_group_duo_match_stats(db, ids)
+
+    n = len(summoners)
+    matrix: List[List[Optional[Dict[str, object]]]] = [[None] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            pair = (ids[i], ids[j]) if ids[i] < ids[j] else (ids[j], ids[i])
+            perf_score, duo_games = compute_duo_performance(duo_by_pair.get(pair, []))
+            pair_breakdown = {category: float(values[i, j]) for category, values in breakdown.items()}
+            # Style and duo performance are symmetric; only the per-summoner game counts swap
+            matrix[i][j] = _combine_synergy(float(style[i, j]), pair_breakdown, perf_score, duo_games, games[i], games[j])
+            matrix[j][i] = _combine_synergy(float(style[i, j]), pair_breakdown, perf_score, duo_games, games[j], games[i])
+    return matrix
+
+
+class _PopulationVectors:
+    """Overall dimension vectors of every registered summoner, one numpy column per dimension."""
+
+    def __init__(self, key: tuple, ids: List[int], dims_list: List[DimensionScores], games: List[int]):
+        self.key = key
+        self.ids = np.array(ids, dtype=np.int64)
+        self.games = np.array(games, dtype=np.int64)
+        self.columns = _dimension_columns(dims_list)
+        self.index = {summoner_id: i for i, summoner_id in enumerate(ids)}
+
+
+_population_lock = threading.Lock()
+_population: Optional[_PopulationVectors] = None
+
+
+def _population_key(db: Session) -> tuple:
+    summoner_count = db.query(func.count(Summoner.id)).scalar_subquery()
+    return tuple(
+        db.query(
+            summoner_count,
+            func.count(SummonerRoleAggregate.id),
+            func.max(SummonerRoleAggregate.id),
+            func.max(SummonerRoleAggregate.updated_at),
+        )
+        .filter(
+            SummonerRoleAggregate.role == ROLE_ALL,
+            SummonerRoleAggregate.adv_version == ADVANCED_DIMENSIONS_VERSION,
+        )
+        .one()
+    )
+
+
+def _load_population_vectors(db: Session) -> _PopulationVectors:
+    """
+    Cached population vectors. The cache key is cheap to read (counts and the latest aggregate
+    update), so any ingest that touches an "ALL" aggregate invalidates it.
+    """
+    global _population
+    key = _population_key(db)
+    cached = _population
+    if cached is not None and cached.key == key:
+        return cached
+
+    with _population_lock:
+        if _population is not None and _population.key == key:
+            return _population
+        if key[0] != key[1]:
+            # Summoners without a current "ALL" aggregate; build them once so they can be scored too
+            current = db.query(SummonerRoleAggregate.summoner_id).filter(
+                SummonerRoleAggregate.role == ROLE_ALL,
+                SummonerRoleAggregate.adv_version == ADVANCED_DIMENSIONS_VERSION,
+            )
+            missing = [summoner_id for (summoner_id,) in db.query(Summoner.id).filter(~Summoner.id.in_(current))]
+            load_role_aggregates_bulk(db, missing)
+            key = _population_key(db)
+
+        rows = (
+            db.query(SummonerRoleAggregate)
+            .filter(
+                SummonerRoleAggregate.role == ROLE_ALL,
+                SummonerRoleAggregate.adv_version == ADVANCED_DIMENSIONS_VERSION,
+            )
+            .order_by(SummonerRoleAggregate.summoner_id)
+            .all()
+        )
+        _population = _PopulationVectors(
+            key,
+            [row.summoner_id for row in rows],
+            [dimension_scores_from_aggregate(row) for row in rows],
+            [(row.games or 0) for row in rows],
+        )
+        return _population
+
+
+def find_top_duo_partners(
+    db: Session,
+    summoner: Summoner,
+    limit: int = 10,
+) -> List[Tuple[int, Dict[str, object]]]:
+    """
+    The `limit` registered summoners with the highest duo synergy with `summoner`, as
+    (partner id, compute_duo_synergy result) pairs, best first.
+
+    Style synergy against the whole population is one vectorized pass over the cached vectors and
+    shared-game counts come from one GROUP BY over the team index. Since the performance part is
+    at most min(1, games / 20), every partner has total in [0.6 * style, 0.6 * style + 0.4 * min(1, games / 20)];
+    partners whose upper bound falls below the k-th best lower bound cannot make the cut, so only
+    the rest get their duo games loaded and scored.
+    """
+    if limit <= 0:
+        return []
+    dims, games = _compute_overall_dimension_scores_for_summoner(db, summoner)
+    population = _load_population_vectors(db)
+
+    partners = population.ids != summoner.id
+    ids = population.ids[partners]
+    if ids.size == 0:
+        return []
+    columns = {field: values[partners] for field, values in population.columns.items()}
+    partner_games = population.games[partners]
+
+    style, breakdown = compute_style_synergy_cross(_dimension_columns([dims]), columns)
+    style = style[0]
+
+    if ensure_team_index(db, [summoner.id]):
+        db.commit()
+    shared_counts = _get_shared_game_counts(db, summoner.id)
+    shared = np.array([shared_counts.get(int(partner_id), 0) for partner_id in ids], dtype=np.int64)
+
+    lower = 0.6 * style
+    upper = lower + 0.4 * np.minimum(1.0, shared / 20.0)
+    k = min(limit, ids.size)
+    threshold = np.partition(lower, ids.size - k)[ids.size - k]
+    candidates = np.flatnonzero(upper >= threshold)
+
+    duo_by_partner = _get_partner_duo_match_stats(
+        db,
+        summoner.id,
+        [int(ids[i]) for i in candidates if shared[i] > 0],
+    )
+
+    scored = []
+    for i in candidates:
+        partner_id = int(ids[i])
+        perf_score, duo_games = compute_duo_performance(duo_by_partner.get(partner_id, []))
+        scored.append((0.6 * float(style[i]) + 0.4 * perf_score, duo_games, partner_id, i, perf_score))
+    scored.sort(key=lambda item: (-item[0], -item[1], item[2]))
+
+    results = []
+    for _, duo_games, partner_id, i, perf_score in scored[:limit]:
+        pair_breakdown = {category: float(values[0, i]) for category, values in breakdown.items()}
+        results.append((
+            partner_id,
+            _combine_synergy(float(style[i]), pair_breakdown, perf_score, duo_games, games, int(partner_games[i])),
+        ))
+    return results
@@ -1,23 +1,47 @@
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Request, Response
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from pydantic import BaseModel
-from backend.shared.database import get_db, Summoner, MatchPerformance, MatchDetail, SummonerPlaystyleTag, SummonerAnalysis
+from typing import Dict, List, Optional
+from pydantic import BaseModel, TypeAdapter
+from backend.shared.database import get_db, Summoner, MatchPerformance, MatchDetail, SummonerPlaystyleTag, SummonerAnalysis, LeaderboardEntryRow, utc_from_millis
 from backend.collector.collector_service import CollectorService
 from backend.collector.config import Config
 from backend.core_api.ai_module import get_ai_provider, AIProvider
 from backend.core_api.playstyle_tags import upsert_playstyle_snapshot, TAG_VERSION
-from backend.core_api.duo_synergy import compute_duo_synergy
+from backend.core_api.duo_synergy import compute_duo_synergy, compute_duo_synergy_matrix, find_top_duo_partners
+from backend.shared.role_scores import aggregate_role_totals, scores_from_totals
+from backend.shared.leaderboard import TIMEFRAMES, read_leaderboard, refresh_all_leaderboards
+from backend.core_api.match_detail import (
+    IMMUTABLE_CACHE_CONTROL,
+    MATCH_DETAIL_RESPONSE_VERSION,
+    etag_matches,
+    load_match_detail_body,
+    match_detail_etag,
+)
+from backend.shared.cache import LEADERBOARD, response_cache, summoner_version
+from backend.shared.migrations import upgrade_database
 from backend.tasks import collect_summoner_data
 from fastapi.middleware.cors import CORSMiddleware
+import base64
+import binascii
 import logging
-from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from datetime import datetime
+from urllib.parse import quote
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="LoL Flex Rank Analyst")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Existing databases get new columns and constraints before the first request reads them
+    upgrade_database()
+    yield
+
+
+app = FastAPI(title="LoL Flex Rank Analyst", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,14 +56,6 @@ def get_collector_service():
     return CollectorService()
 
 # --- Constants ---
-ROLE_MAPPINGS = {
-    "TOP": ["TOP"],
-    "JUNGLE": ["JUNGLE"],
-    "MIDDLE": ["MIDDLE", "MID"],
-    "BOTTOM": ["BOTTOM", "BOT", "ADC"],
-    "UTILITY": ["UTILITY", "SUPPORT"]
-}
-
 # OP Score weights & baselines (0~10 scale)
 OP_W_KILL = 0.2
 OP_W_KDA = 0.25
@@ -61,6 +77,8 @@ class SummonerResponse(BaseModel):
     id: int
     name: str
     level: int
+    # Set on registration: matches loaded from already stored games before the Riot crawl
+    stored_matches_loaded: Optional[int] = None
     # Add other fields as needed
 
     class Config:
@@ -101,6 +119,7 @@ class MatchPerformanceResponse(BaseModel):
 class MatchListResponse(BaseModel):
     matches: List[MatchPerformanceResponse]
     has_more: bool
+    next_cursor: Optional[str] = None  # Pass as `cursor` to get the next page
 
 class MatchDetailParticipant(BaseModel):
     summoner_name: str
@@ -166,6 +185,20 @@ class DuoSynergyResponse(BaseModel):
     summoner1_games: int
     summoner2_games: int
 
+class DuoSynergyMatrixRequest(BaseModel):
+    summoner_names: List[str]
+
+
+class DuoSynergyMatrixResponse(BaseModel):
+    summoners: List[str]
+    # matrix[i][j] is the synergy of summoners[i] with summoners[j]; the diagonal is null
+    matrix: List[List[Optional[DuoSynergyResponse]]]
+
+class DuoPartnersResponse(BaseModel):
+    summoner: str
+    # Best partner first; summoner1 is always the requested summoner
+    partners: List[DuoSynergyResponse]
+
 class LeaderboardEntry(BaseModel):
     name: str
     level: int
@@ -184,6 +217,39 @@ class OpenAIConfigUpdate(BaseModel):
 
 # --- Endpoints ---
 
+# --- Response cache ---
+def _cache_key(endpoint: str, *parts: str) -> str:
+    return ":".join([endpoint] + [quote(str(part), safe="") for part in parts])
+
+
+def _cached_response(key: str) -> Optional[Response]:
+    body = response_cache.get(key)
+    if body is None:
+        return None
+    return Response(content=body, media_type="application/json", headers={"X-Cache": "HIT"})
+
+
+def _cache_response(key: str, versions: Optional[Dict[str, int]], response_type, value) -> Response:
+    """Serializes `value` as `response_type` (what response_model would do) and caches the body."""
+    adapter = TypeAdapter(response_type)
+    body = adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+    response_cache.put(key, body, versions)
+    return Response(content=body, media_type="application/json", headers={"X-Cache": "MISS"})
+
+
+def _snapshot_versions(db: Session, names: List[str]) -> Optional[Dict[str, int]]:
+    """
+    Cache versions for a response computed after this call.
+
+    Ends the session's transaction first: on REPEATABLE READ its snapshot was fixed by the
+    lookup that found the summoner, so a write whose version bump we read here could be
+    missing from it and its stale result cached under the new version.
+    """
+    versions = response_cache.versions(names)
+    db.rollback()
+    return versions
+
+
 @app.post("/summoners/", response_model=SummonerResponse)
 def register_summoner(
     summoner: SummonerCreate, 
@@ -204,15 +270,28 @@ def register_summoner(
     new_summoner = collector.add_summoner(summoner.name)
     if not new_summoner:
         raise HTTPException(status_code=404, detail="Summoner not found on Riot API")
-    
-    # Push collection task to the queue
+
+    # Games already stored for teammates registered earlier are usable right away
+    try:
+        loaded = collector.backfill_from_stored_matches(db, new_summoner)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to load stored matches for {new_summoner.summoner_name}: {e}")
+        loaded = 0
+
+    # Push collection task to the queue; the crawl only downloads matches that aren't stored
     try:
         collect_summoner_data.delay(new_summoner.id)
     except Exception as e:
         logger.error(f"Failed to enqueue background collection task: {e}. Falling back to synchronous collection.")
         collector.update_summoner_data(db, new_summoner)
 
-    return SummonerResponse(id=new_summoner.id, name=new_summoner.summoner_name, level=new_summoner.summoner_level)
+    return SummonerResponse(
+        id=new_summoner.id,
+        name=new_summoner.summoner_name,
+        level=new_summoner.summoner_level,
+        stored_matches_loaded=loaded,
+    )
 
 @app.get("/summoners/", response_model=List[SummonerResponse])
 def list_summoners(db: Session = Depends(get_db)):
@@ -225,90 +304,43 @@ def _compute_role_scores_for_summoner(
     since: Optional[datetime] = None,
 ) -> List[ScoreResponse]:
     """Internal helper to compute role scores, optionally filtered by time."""
-    scores: List[ScoreResponse] = []
-    roles = ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"]  # Standardizing
-
-    for role in roles:
-        # Filter matches for this role using fuzzy matching/strict mapping
-        possible_lanes = ROLE_MAPPINGS.get(role, [role])
-        query = db.query(MatchPerformance).filter(
-            MatchPerformance.summoner_id == summoner.id,
-            MatchPerformance.lane.in_(possible_lanes),
-        )
-        if since is not None:
-            query = query.filter(MatchPerformance.game_creation >= since)
-        matches = query.all()
-
-        if not matches:
-            continue
-
-        # Calculate Metrics
-        total_games = len(matches)
-        wins = sum(1 for m in matches if m.win)
-        avg_kda = sum(m.kda for m in matches) / total_games
-        avg_gold = sum(m.gold_per_min for m in matches) / total_games
-        avg_vision = sum(m.vision_score for m in matches) / total_games
-        win_rate = (wins / total_games) * 100
-
-        # Simple Scoring Algorithm (0-100)
-        # Weights: WR(40%), KDA(30%), Gold(15%), Vision(15%)
-        score_wr = min(100, win_rate)
-        score_kda = min(100, (avg_kda / 5.0) * 100)
-        score_gold = min(100, (avg_gold / 600) * 100)
-        score_vision = min(100, (avg_vision / 40) * 100)
-
-        final_score = (
-            score_wr * 0.4
-            + score_kda * 0.3
-            + score_gold * 0.15
-            + score_vision * 0.15
-        )
-
-        scores.append(
-            ScoreResponse(
-                role=role,
-                score=round(final_score, 1),
-                win_rate=round(win_rate, 1),
-                kda=round(avg_kda, 2),
-                avg_gold=round(avg_gold, 1),
-                vision_score=round(avg_vision, 1),
-            )
-        )
-
-    return scores
-
-
-def _volume_weight(games: int, target_games: int) -> float:
-    """Return a weight 0~1 that penalizes low game counts.
-
-    - 0 games: 0
-    - few games: ~0.3~0.5
-    - target_games 이상: 1.0
-    """
-    if games <= 0 or target_games <= 0:
-        return 0.0
-
-    ratio = min(1.0, games / float(target_games))
-    base = 0.3  # 최소 신뢰도
-    return base + (1.0 - base) * ratio
+    # One GROUP BY lane aggregate instead of loading every match per role
+    totals = aggregate_role_totals(db, summoner_ids=[summoner.id], since=since)
+    return [ScoreResponse(**s) for s in scores_from_totals(totals.get(summoner.id, {}))]
 
 
 @app.get("/summoners/{name}/scores", response_model=List[ScoreResponse])
 def get_summoner_scores(name: str, db: Session = Depends(get_db)):
     """Calculates 0-100 score for each role based on stored match data (all-time)."""
+    key = _cache_key("scores", name)
+    cached = _cached_response(key)
+    if cached is not None:
+        return cached
+
     summoner = db.query(Summoner).filter(Summoner.summoner_name == name).first()
     if not summoner:
         raise HTTPException(status_code=404, detail="Summoner not found")
 
-    return _compute_role_scores_for_summoner(summoner, db)
+    versions = _snapshot_versions(db, [summoner_version(summoner.id)])
+    return _cache_response(key, versions, List[ScoreResponse], _compute_role_scores_for_summoner(summoner, db))
 
 
 @app.get("/summoners/{name}/playstyle-tags", response_model=PlaystyleTagSnapshotResponse)
 def get_playstyle_tags(name: str, db: Session = Depends(get_db)):
+    key = _cache_key("playstyle-tags", name)
+    cached = _cached_response(key)
+    if cached is not None:
+        return cached
+
     summoner = db.query(Summoner).filter(Summoner.summoner_name == name).first()
     if not summoner:
         raise HTTPException(status_code=404, detail="Summoner not found")
 
+    versions = _snapshot_versions(db, [summoner_version(summoner.id)])
+    return _cache_response(key, versions, PlaystyleTagSnapshotResponse, _playstyle_tag_snapshot_response(db, summoner))
+
+
+def _playstyle_tag_snapshot_response(db: Session, summoner: Summoner) -> PlaystyleTagSnapshotResponse:
     snapshot = (
         db.query(SummonerPlaystyleTag)
         .filter(SummonerPlaystyleTag.summoner_id == summoner.id)
@@ -384,6 +416,11 @@ def get_duo_synergy_endpoint(
     summoner2: str,
     db: Session = Depends(get_db),
 ):
+    key = _cache_key("duo-synergy", summoner1, summoner2)
+    cached = _cached_response(key)
+    if cached is not None:
+        return cached
+
     s1 = db.query(Summoner).filter(Summoner.summoner_name == summoner1).first()
     if not s1:
         raise HTTPException(status_code=404, detail="Summoner1 not found")
@@ -392,7 +429,65 @@ def get_duo_synergy_endpoint(
     if not s2:
         raise HTTPException(status_code=404, detail="Summoner2 not found")
 
+    versions = _snapshot_versions(db, [summoner_version(s1.id), summoner_version(s2.id)])
     result = compute_duo_synergy(db, s1, s2)
+    return _cache_response(key, versions, DuoSynergyResponse, _duo_synergy_response(s1.summoner_name, s2.summoner_name, result))
+
+# Flex group size
+MAX_SYNERGY_GROUP = 10
+
+@app.post("/duo/synergy/matrix", response_model=DuoSynergyMatrixResponse)
+def get_duo_synergy_matrix_endpoint(request: DuoSynergyMatrixRequest, db: Session = Depends(get_db)):
+    """Pairwise duo synergy for a group of summoners in one call."""
+    names = list(dict.fromkeys(request.summoner_names))
+    if len(names) < 2:
+        raise HTTPException(status_code=400, detail="At least two summoners are required")
+    if len(names) > MAX_SYNERGY_GROUP:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SYNERGY_GROUP} summoners are allowed")
+
+    by_name = {s.summoner_name: s for s in db.query(Summoner).filter(Summoner.summoner_name.in_(names))}
+    missing = [name for name in names if name not in by_name]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Summoner not found: {', '.join(missing)}")
+
+    summoners = [by_name[name] for name in names]
+    matrix = compute_duo_synergy_matrix(db, summoners)
+    return DuoSynergyMatrixResponse(
+        summoners=names,
+        matrix=[
+            [
+                _duo_synergy_response(names[i], names[j], result) if result is not None else None
+                for j, result in enumerate(row)
+            ]
+            for i, row in enumerate(matrix)
+        ],
+    )
+
+MAX_DUO_PARTNERS = 50
+
+@app.get("/summoners/{name}/duo-partners", response_model=DuoPartnersResponse)
+def get_duo_partners_endpoint(name: str, limit: int = 10, db: Session = Depends(get_db)):
+    """Registered summoners with the highest duo synergy with `name`."""
+    if limit <= 0 or limit > MAX_DUO_PARTNERS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_DUO_PARTNERS}")
+
+    summoner = db.query(Summoner).filter(Summoner.summoner_name == name).first()
+    if not summoner:
+        raise HTTPException(status_code=404, detail="Summoner not found")
+
+    top = find_top_duo_partners(db, summoner, limit=limit)
+    names = dict(
+        db.query(Summoner.id, Summoner.summoner_name).filter(Summoner.id.in_([partner_id for partner_id, _ in top]))
+    )
+    return DuoPartnersResponse(
+        summoner=summoner.summoner_name,
+        partners=[
+            _duo_synergy_response(summoner.summoner_name, names[partner_id], result)
+            for partner_id, result in top
+        ],
+    )
+
+def _duo_synergy_response(name1: str, name2: str, result: dict) -> DuoSynergyResponse:
     breakdown_dict = result.get("style_breakdown", {}) or {}
 
     breakdown = DuoSynergyStyleBreakdown(
@@ -404,8 +499,8 @@ def get_duo_synergy_endpoint(
     )
 
     return DuoSynergyResponse(
-        summoner1=s1.summoner_name,
-        summoner2=s2.summoner_name,
+        summoner1=name1,
+        summoner2=name2,
         synergy_score=int(result.get("synergy_score", 0)),
         style_score=float(result.get("style_score", 0.0)),
         performance_score=float(result.get("performance_score", 0.0)),
@@ -415,111 +510,133 @@ def get_duo_synergy_endpoint(
         summoner2_games=int(result.get("summoner2_games", 0)),
     )
 
+def _encode_match_cursor(match: MatchPerformance) -> str:
+    raw = f"{match.game_creation.isoformat()}|{match.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_match_cursor(cursor: str):
+    """(game_creation, id) of the last match of the previous page."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        game_creation, match_pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(game_creation), int(match_pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @app.get("/summoners/{name}/matches", response_model=MatchListResponse)
 def get_summoner_matches(
     name: str,
     offset: int = 0,
     limit: int = 20,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
 ):
-    """Return paginated matches for a summoner, most recent first."""
+    """
+    Return paginated matches for a summoner, most recent first.
+
+    Pass the `next_cursor` of a page as `cursor` to get the next one: it seeks on the
+    (summoner_id, game_creation) index, so deep pages cost the same as the first and matches
+    ingested while scrolling don't shift the pages. `offset` is still accepted.
+    """
     if limit <= 0 or limit > 100:
         raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    if cursor is not None and offset:
+        raise HTTPException(status_code=400, detail="Use either cursor or offset")
 
     summoner = db.query(Summoner).filter(Summoner.summoner_name == name).first()
     if not summoner:
         raise HTTPException(status_code=404, detail="Summoner not found")
 
+    # id breaks ties between matches created at the same time, so every row has one position
     query = (
         db.query(MatchPerformance)
         .filter(MatchPerformance.summoner_id == summoner.id)
-        .order_by(MatchPerformance.game_creation.desc())
+        .order_by(MatchPerformance.game_creation.desc(), MatchPerformance.id.desc())
     )
+    if cursor is not None:
+        game_creation, match_pk = _decode_match_cursor(cursor)
+        # The redundant `<=` gives the planner a range on game_creation
+        query = query.filter(
+            MatchPerformance.game_creation <= game_creation,
+            or_(
+                MatchPerformance.game_creation < game_creation,
+                and_(MatchPerformance.game_creation == game_creation, MatchPerformance.id < match_pk),
+            ),
+        )
+    else:
+        query = query.offset(offset)
 
-    items = query.offset(offset).limit(limit + 1).all()
+    items = query.limit(limit + 1).all()
     has_more = len(items) > limit
     matches = items[:limit]
+    next_cursor = _encode_match_cursor(matches[-1]) if has_more else None
 
-    return MatchListResponse(matches=matches, has_more=has_more)
+    return MatchListResponse(matches=matches, has_more=has_more, next_cursor=next_cursor)
 
 
 @app.get("/leaderboard", response_model=List[LeaderboardEntry])
 def get_leaderboard(timeframe: str = "daily", db: Session = Depends(get_db)):
-    """Return leaderboard of summoners based on role scores within a timeframe."""
-    valid_timeframes = {"daily", "weekly", "monthly", "yearly"}
-    if timeframe not in valid_timeframes:
-        raise HTTPException(status_code=400, detail="Invalid timeframe")
-
-    now = datetime.utcnow()
-    if timeframe == "daily":
-        since = now - timedelta(days=1)
-        target_games = 5
-    elif timeframe == "weekly":
-        since = now - timedelta(days=7)
-        target_games = 10
-    elif timeframe == "monthly":
-        since = now - timedelta(days=30)
-        target_games = 20
-    else:  # yearly
-        since = now - timedelta(days=365)
-        target_games = 50
-
-    summoners = db.query(Summoner).all()
-    entries: List[LeaderboardEntry] = []
-
-    for summoner in summoners:
-        scores = _compute_role_scores_for_summoner(summoner, db, since=since)
-        if not scores:
-            continue
+    """Return leaderboard of summoners based on role scores within a timeframe.
 
-        role_candidates = []
-        for s in scores:
-            possible_lanes = ROLE_MAPPINGS.get(s.role, [s.role])
-            games = (
-                db.query(MatchPerformance)
-                .filter(
-                    MatchPerformance.summoner_id == summoner.id,
-                    MatchPerformance.game_creation >= since,
-                    MatchPerformance.lane.in_(possible_lanes),
-                )
-                .count()
-            )
-            if games == 0:
-                continue
+    Served from the materialized leaderboard table, which the collector refreshes for
+    summoners it ingests and the `refresh_leaderboards` task rebuilds periodically.
+    """
+    if timeframe not in TIMEFRAMES:
+        raise HTTPException(status_code=400, detail="Invalid timeframe")
 
-            weight = _volume_weight(games, target_games)
-            effective_score = round(s.score * weight, 1)
-            role_candidates.append((s.role, effective_score, games))
+    key = _cache_key("leaderboard", timeframe)
+    cached = _cached_response(key)
+    if cached is not None:
+        return cached
+
+    versions = response_cache.versions([LEADERBOARD])
+    rows = read_leaderboard(db, timeframe)
+    if not rows and not db.query(LeaderboardEntryRow.id).first():
+        # Nothing materialized yet (fresh database): build once on demand
+        refresh_all_leaderboards(db)
+        rows = read_leaderboard(db, timeframe)
+
+    entries = [
+        LeaderboardEntry(
+            name=summoner.summoner_name,
+            level=summoner.summoner_level,
+            best_role=entry.best_role,
+            best_score=entry.best_score,
+            games=entry.games,
+        )
+        for entry, summoner in rows
+    ]
+    return _cache_response(key, versions, List[LeaderboardEntry], entries)
 
-        if not role_candidates:
-            continue
+@app.get("/matches/{match_id}", response_model=MatchDetailResponse)
+def get_match_detail(match_id: str, request: Request, db: Session = Depends(get_db)):
+    """Served from the stored response body; clients revalidate with If-None-Match."""
+    # Stored matches never change, so only the global epoch applies
+    key = _cache_key("match", MATCH_DETAIL_RESPONSE_VERSION, match_id)
+    body = response_cache.get(key)
+    cache_status = "HIT"
+    if body is None:
+        versions = response_cache.versions([])
+        body = load_match_detail_body(db, match_id, _build_match_detail_body)
+        if body is None:
+            raise HTTPException(status_code=404, detail="Match not found")
+        response_cache.put(key, body, versions)
+        cache_status = "MISS"
 
-        # Select best role using volume-weighted (effective) score
-        best_role, best_effective_score, best_games = max(
-            role_candidates, key=lambda x: x[1]
-        )
+    etag = match_detail_etag(body)
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL, "X-Cache": cache_status}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
-        entries.append(
-            LeaderboardEntry(
-                name=summoner.summoner_name,
-                level=summoner.summoner_level,
-                best_role=best_role,
-                best_score=best_effective_score,
-                games=best_games,
-            )
-        )
 
-    # Sort by adjusted best_score desc, then by games desc
-    entries.sort(key=lambda e: (e.best_score, e.games), reverse=True)
+def _build_match_detail_body(match_id: str, db_match: MatchDetail) -> bytes:
+    return TypeAdapter(MatchDetailResponse).dump_json(_match_detail_response(match_id, db_match))
 
-    # Limit to top 50 to keep payload size manageable
-    return entries[:50]
 
-@app.get("/matches/{match_id}", response_model=MatchDetailResponse)
-def get_match_detail(match_id: str, db: Session = Depends(get_db)):
-    db_match = db.query(MatchDetail).filter(MatchDetail.match_id == match_id).first()
-    if not db_match:
-        raise HTTPException(status_code=404, detail="Match not found")
+def _match_detail_response(match_id: str, db_match: MatchDetail) -> MatchDetailResponse:
 
     data = db_match.raw or {}
     info = data.get("info", {})
@@ -601,9 +718,9 @@ def get_match_detail(match_id: str, db: Session = Depends(get_db)):
 
     raw_game_creation = info.get("gameCreation", 0)
     try:
-        game_creation = datetime.fromtimestamp(raw_game_creation / 1000) if raw_game_creation else datetime.utcfromtimestamp(0)
+        game_creation = utc_from_millis(raw_game_creation)
     except Exception:
-        game_creation = datetime.utcfromtimestamp(0)
+        game_creation = utc_from_millis(0)
 
     game_duration = int(info.get("gameDuration", 0))
     queue_id = int(info.get("queueId", 0))
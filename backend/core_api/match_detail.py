@@ -0,0 +1,67 @@
+"""
+Stored GET /matches/{match_id} responses.
+
+A finished match never changes, so its response body is built once, stored in
+match_detail_responses and served as-is with a strong ETag. Bump MATCH_DETAIL_RESPONSE_VERSION
+when the response format or the OP score formula changes; older rows are rebuilt on their next read.
+"""
+import hashlib
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from backend.shared.database import MatchDetail, MatchDetailResponseRow, insert_ignore
+
+MATCH_DETAIL_RESPONSE_VERSION = 2
+# Browsers and CDNs may keep it for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def match_detail_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for it)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def load_match_detail_body(db: Session, match_id: str, build: Callable[[str, MatchDetail], bytes]) -> Optional[bytes]:
+    """
+    The stored response body of `match_id`, building and storing it with `build(match_id, detail)`
+    when missing or outdated. None if the match isn't stored.
+    """
+    stored = (
+        db.query(MatchDetailResponseRow.version, MatchDetailResponseRow.body)
+        .filter(MatchDetailResponseRow.match_id == match_id)
+        .first()
+    )
+    if stored is not None and stored.version == MATCH_DETAIL_RESPONSE_VERSION:
+        return bytes(stored.body)
+
+    detail = db.query(MatchDetail).filter(MatchDetail.match_id == match_id).first()
+    if detail is None:
+        return None
+    body = build(match_id, detail)
+
+    if stored is None:
+        # A concurrent first read may have stored it already; both built the same bytes
+        insert_ignore(db, MatchDetailResponseRow, [
+            {"match_id": match_id, "version": MATCH_DETAIL_RESPONSE_VERSION, "body": body},
+        ])
+    else:
+        db.query(MatchDetailResponseRow).filter(MatchDetailResponseRow.match_id == match_id).update(
+            {"version": MATCH_DETAIL_RESPONSE_VERSION, "body": body}, synchronize_session=False
+        )
+    db.commit()
+    return body
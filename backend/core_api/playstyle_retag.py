@@ -0,0 +1,129 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from backend.shared.cache import response_cache
+from backend.shared.database import SessionLocal, Summoner, SummonerPlaystyleTag, SummonerRoleAggregate
+from backend.core_api.playstyle_tags import ROLE_ALL, TAG_VERSION, compute_playstyle_tags_bulk
+
+logger = logging.getLogger(__name__)
+
+
+def find_stale_summoner_ids(db: Session) -> List[int]:
+    """
+    Summoners whose playstyle snapshot is missing, was computed with another TAG_VERSION, or is
+    older than the last change to their match aggregates.
+    """
+    rows = (
+        db.query(Summoner.id)
+        .outerjoin(SummonerPlaystyleTag, SummonerPlaystyleTag.summoner_id == Summoner.id)
+        .outerjoin(
+            SummonerRoleAggregate,
+            and_(SummonerRoleAggregate.summoner_id == Summoner.id, SummonerRoleAggregate.role == ROLE_ALL),
+        )
+        .filter(
+            or_(
+                SummonerPlaystyleTag.id.is_(None),
+                SummonerPlaystyleTag.version != TAG_VERSION,
+                SummonerRoleAggregate.id.is_(None),
+                SummonerRoleAggregate.updated_at > SummonerPlaystyleTag.calculated_at,
+            )
+        )
+        .distinct()
+        .order_by(Summoner.id)
+        .all()
+    )
+    return [summoner_id for (summoner_id,) in rows]
+
+
+def retag_summoners(db: Session, summoner_ids: List[int]) -> int:
+    """Recomputes and bulk-upserts the snapshots of `summoner_ids` in one transaction."""
+    if not summoner_ids:
+        return 0
+    results = compute_playstyle_tags_bulk(db, summoner_ids)
+    existing = {
+        summoner_id: snapshot_id
+        for snapshot_id, summoner_id in db.query(SummonerPlaystyleTag.id, SummonerPlaystyleTag.summoner_id)
+        .filter(SummonerPlaystyleTag.summoner_id.in_(summoner_ids))
+    }
+
+    now = datetime.utcnow()
+    inserts, updates = [], []
+    for summoner_id, (tags, primary_role, total_games) in results.items():
+        values = {
+            "summoner_id": summoner_id,
+            "tags": tags,
+            "primary_role": primary_role,
+            "games_used": total_games,
+            "calculated_at": now,
+            "version": TAG_VERSION,
+        }
+        if summoner_id in existing:
+            values["id"] = existing[summoner_id]
+            updates.append(values)
+        else:
+            inserts.append(values)
+
+    if inserts:
+        db.bulk_insert_mappings(SummonerPlaystyleTag, inserts)
+    if updates:
+        db.bulk_update_mappings(SummonerPlaystyleTag, updates)
+    db.commit()
+    response_cache.invalidate_summoners(results)
+    return len(results)
+
+
+def retag_population(
+    chunk_size: int = 200,
+    workers: int = 4,
+    session_factory: Callable[[], Session] = SessionLocal,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, int]:
+    """
+    Re-tags every stale summoner in chunks processed by a thread pool (one session per chunk).
+    `progress(done, total)` is called after each chunk.
+    """
+    session = session_factory()
+    try:
+        summoner_ids = find_stale_summoner_ids(session)
+    finally:
+        session.close()
+
+    total = len(summoner_ids)
+    logger.info(f"[retag] {total} summoners need new playstyle tags (version {TAG_VERSION})")
+    if not total:
+        return {"total": 0, "retagged": 0, "failed_chunks": 0}
+
+    done = 0
+    failed_chunks = 0
+
+    def run_chunk(chunk: List[int]) -> int:
+        db = session_factory()
+        try:
+            return retag_summoners(db, chunk)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    chunks = [summoner_ids[i:i + chunk_size] for i in range(0, total, chunk_size)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_chunk, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            try:
+                retagged = future.result()
+            except Exception as e:
+                failed_chunks += 1
+                logger.error(f"[retag] chunk starting at summoner_id={futures[future][0]} failed: {e}")
+                continue
+            done += retagged
+            logger.info(f"[retag] {done}/{total} summoners re-tagged")
+            if progress is not None:
+                progress(done, total)
+
+    return {"total": total, "retagged": done, "failed_chunks": failed_chunks}
@@ -2,10 +2,53 @@ from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from backend.shared.database import Summoner, MatchPerformance, MatchDetail, SummonerPlaystyleTag
+from sqlalchemy import func
+from backend.core_api.tag_engine import TagMatrix
+from backend.shared.database import (
+    Summoner,
+    MatchPerformance,
+    MatchAdvancedDimension,
+    SummonerPlaystyleTag,
+    SummonerRoleAggregate,
+    insert_ignore,
+)
+from backend.shared.cache import response_cache
+from backend.shared.match_storage import load_raw_matches
+from backend.shared.role_scores import LANE_TO_ROLE, ROLES
 
 TAG_VERSION = "v1"
 
+ADVANCED_DIMENSIONS = [
+    "earlyAggro",
+    "lateCarry",
+    "laneLead",
+    "objectiveFocus",
+    "teamfight",
+    "roam",
+    "splitPush",
+    "farmFocus",
+    "visionControl",
+]
+
+# Bump when _compute_advanced_dimensions_for_match changes; stored rows with another version get recomputed
+ADVANCED_DIMENSIONS_VERSION = 1
+
+# DimensionScores field -> MatchAdvancedDimension column
+ADVANCED_DIMENSION_COLUMNS = {
+    "earlyAggro": "early_aggro",
+    "lateCarry": "late_carry",
+    "laneLead": "lane_lead",
+    "objectiveFocus": "objective_focus",
+    "teamfight": "teamfight",
+    "roam": "roam",
+    "splitPush": "split_push",
+    "farmFocus": "farm_focus",
+    "visionControl": "vision_control",
+}
+
+# Bound on IN-list size when bulk loading MatchDetail rows
+MATCH_DETAIL_CHUNK_SIZE = 200
+
 
 class DimensionScores(BaseModel):
     aggro: float
@@ -36,39 +79,36 @@ class TagDefinition(BaseModel):
     color: Optional[str] = None
 
 
-ROLE_MAPPINGS: Dict[str, List[str]] = {
-    "TOP": ["TOP"],
-    "JUNGLE": ["JUNGLE"],
-    "MIDDLE": ["MIDDLE", "MID"],
-    "BOTTOM": ["BOTTOM", "BOT", "ADC"],
-    "UTILITY": ["UTILITY", "SUPPORT"],
-}
-
-
 def _safe_div(numerator: float, denominator: float) -> float:
     if denominator <= 0:
         return 0.0
     return numerator / denominator
 
 
-def compute_dimensions(matches: List[MatchPerformance]) -> DimensionScores:
-    games = len(matches)
+def _dimensions_from_totals(
+    games: int,
+    wins: int,
+    total_kills: int,
+    total_deaths: int,
+    total_assists: int,
+    sum_gold_per_min: float,
+    sum_vision: float,
+    sum_cs: float,
+    sum_damage: float,
+) -> DimensionScores:
     if games == 0:
         return DimensionScores(aggro=0.0, risk=0.0, vision=0.0, farm=0.0, damage=0.0, winrate=0.0)
 
-    total_kills = sum(m.kills for m in matches)
-    total_deaths = sum(m.deaths for m in matches)
-    total_assists = sum(m.assists for m in matches)
     avg_kda = _safe_div(total_kills + total_assists, max(1, total_deaths))
 
     avg_kills = _safe_div(total_kills, games)
     avg_assists = _safe_div(total_assists, games)
     avg_deaths = _safe_div(total_deaths, games)
-    avg_gold_per_min = _safe_div(sum(m.gold_per_min for m in matches), games)
-    avg_vision = _safe_div(sum(m.vision_score for m in matches), games)
-    avg_cs = _safe_div(sum(m.total_minions_killed for m in matches), games)
-    avg_damage = _safe_div(sum(m.total_damage_dealt_to_champions for m in matches), games)
-    win_rate = _safe_div(sum(1 for m in matches if m.win), games)
+    avg_gold_per_min = _safe_div(sum_gold_per_min, games)
+    avg_vision = _safe_div(sum_vision, games)
+    avg_cs = _safe_div(sum_cs, games)
+    avg_damage = _safe_div(sum_damage, games)
+    win_rate = _safe_div(wins, games)
 
     aggro = min(1.0, (avg_kills + 0.7 * avg_assists) / 15.0)
     risk_component = min(1.0, avg_deaths / 8.0)
@@ -89,6 +129,20 @@ def compute_dimensions(matches: List[MatchPerformance]) -> DimensionScores:
     )
 
 
+def compute_dimensions(matches: List[MatchPerformance]) -> DimensionScores:
+    return _dimensions_from_totals(
+        len(matches),
+        sum(1 for m in matches if m.win),
+        sum(m.kills for m in matches),
+        sum(m.deaths for m in matches),
+        sum(m.assists for m in matches),
+        sum(m.gold_per_min for m in matches),
+        sum(m.vision_score for m in matches),
+        sum(m.total_minions_killed for m in matches),
+        sum(m.total_damage_dealt_to_champions for m in matches),
+    )
+
+
 def _extract_participant(raw: dict, puuid: str) -> Optional[dict]:
     info = raw.get("info", {}) or {}
     participants = info.get("participants", []) or []
@@ -195,48 +249,131 @@ def _compute_advanced_dimensions_for_match(raw: dict, participant: dict) -> Dict
     }
 
 
+def load_advanced_dimensions_by_match(
+    db: Session,
+    match_ids: List[str],
+    puuid: str,
+    chunk_size: int = MATCH_DETAIL_CHUNK_SIZE,
+) -> Dict[str, Dict[str, float]]:
+    """
+    match_id -> advanced dimensions of `puuid` in that match.
+    Raw JSON is loaded in chunked IN queries (column rows, not ORM objects) and dropped as soon as
+    the target participant is extracted; matches without raw data or the participant are omitted.
+    """
+    unique_ids = list(dict.fromkeys(match_ids))
+    result: Dict[str, Dict[str, float]] = {}
+    for i in range(0, len(unique_ids), chunk_size):
+        chunk = unique_ids[i:i + chunk_size]
+        for match_id, raw in load_raw_matches(db, chunk).items():
+            participant = _extract_participant(raw, puuid)
+            if not participant:
+                continue
+            result[match_id] = _compute_advanced_dimensions_for_match(raw, participant)
+    return result
+
+
+def advanced_dimension_row(summoner_id: int, match_id: str, adv: Dict[str, float]) -> dict:
+    row = {
+        "summoner_id": summoner_id,
+        "match_id": match_id,
+        "version": ADVANCED_DIMENSIONS_VERSION,
+        "computed_at": datetime.utcnow(),
+    }
+    for key, column in ADVANCED_DIMENSION_COLUMNS.items():
+        row[column] = adv.get(key, 0.0)
+    return row
+
+
+def extract_advanced_dimension_rows(raw: dict, summoner_ids: Dict[str, int]) -> List[dict]:
+    """MatchAdvancedDimension rows for every participant whose puuid is in `summoner_ids` (puuid -> summoner id)."""
+    match_id = (raw.get("metadata", {}) or {}).get("matchId")
+    rows = []
+    for p in (raw.get("info", {}) or {}).get("participants", []) or []:
+        summoner_id = summoner_ids.get(p.get("puuid"))
+        if summoner_id is None:
+            continue
+        rows.append(advanced_dimension_row(summoner_id, match_id, _compute_advanced_dimensions_for_match(raw, p)))
+    return rows
+
+
+def store_advanced_dimension_rows(db: Session, rows: List[dict]) -> None:
+    """Inserts rows, replacing ones computed with an older version. Does not commit."""
+    if not rows:
+        return
+    (
+        db.query(MatchAdvancedDimension)
+        .filter(
+            MatchAdvancedDimension.summoner_id.in_({row["summoner_id"] for row in rows}),
+            MatchAdvancedDimension.match_id.in_({row["match_id"] for row in rows}),
+            MatchAdvancedDimension.version != ADVANCED_DIMENSIONS_VERSION,
+        )
+        .delete(synchronize_session=False)
+    )
+    insert_ignore(db, MatchAdvancedDimension, rows)
+
+
+def ensure_advanced_dimensions(
+    db: Session,
+    summoner: Summoner,
+    match_ids: List[str],
+    chunk_size: int = MATCH_DETAIL_CHUNK_SIZE,
+) -> int:
+    """
+    Computes and stores rows for matches that have none at the current version (ingested before the
+    table existed, or after a formula change). Does not commit; returns the number of rows written.
+    """
+    unique_ids = list(dict.fromkeys(match_ids))
+    present = set()
+    for i in range(0, len(unique_ids), chunk_size):
+        chunk = unique_ids[i:i + chunk_size]
+        present.update(
+            match_id for (match_id,) in db.query(MatchAdvancedDimension.match_id).filter(
+                MatchAdvancedDimension.summoner_id == summoner.id,
+                MatchAdvancedDimension.version == ADVANCED_DIMENSIONS_VERSION,
+                MatchAdvancedDimension.match_id.in_(chunk),
+            )
+        )
+    missing = [match_id for match_id in unique_ids if match_id not in present]
+    if not missing:
+        return 0
+
+    by_match = load_advanced_dimensions_by_match(db, missing, summoner.puuid, chunk_size=chunk_size)
+    rows = [advanced_dimension_row(summoner.id, match_id, adv) for match_id, adv in by_match.items()]
+    store_advanced_dimension_rows(db, rows)
+    return len(rows)
+
+
 def compute_advanced_dimensions_for_role(
     db: Session,
     summoner: Summoner,
     matches: List[MatchPerformance],
+    chunk_size: int = MATCH_DETAIL_CHUNK_SIZE,
 ) -> Dict[str, float]:
+    """Averages the stored per-match rows in SQL; matches without raw data or the participant don't count."""
+    sums = {k: 0.0 for k in ADVANCED_DIMENSIONS}
     if not matches:
-        return {
-            "earlyAggro": 0.0,
-            "lateCarry": 0.0,
-            "laneLead": 0.0,
-            "objectiveFocus": 0.0,
-            "teamfight": 0.0,
-            "roam": 0.0,
-            "splitPush": 0.0,
-            "farmFocus": 0.0,
-            "visionControl": 0.0,
-        }
-
-    sums = {
-        "earlyAggro": 0.0,
-        "lateCarry": 0.0,
-        "laneLead": 0.0,
-        "objectiveFocus": 0.0,
-        "teamfight": 0.0,
-        "roam": 0.0,
-        "splitPush": 0.0,
-        "farmFocus": 0.0,
-        "visionControl": 0.0,
-    }
-    count = 0
+        return sums
 
-    for mp in matches:
-        db_match = db.query(MatchDetail).filter(MatchDetail.match_id == mp.match_id).first()
-        if not db_match or not db_match.raw:
-            continue
-        participant = _extract_participant(db_match.raw, summoner.puuid)
-        if not participant:
-            continue
-        adv = _compute_advanced_dimensions_for_match(db_match.raw, participant)
-        for k in sums.keys():
-            sums[k] += adv.get(k, 0.0)
-        count += 1
+    match_ids = list(dict.fromkeys(mp.match_id for mp in matches))
+    if ensure_advanced_dimensions(db, summoner, match_ids, chunk_size=chunk_size):
+        db.commit()
+
+    columns = [getattr(MatchAdvancedDimension, ADVANCED_DIMENSION_COLUMNS[k]) for k in ADVANCED_DIMENSIONS]
+    count = 0
+    for i in range(0, len(match_ids), chunk_size):
+        chunk = match_ids[i:i + chunk_size]
+        row = (
+            db.query(func.count(MatchAdvancedDimension.id), *[func.sum(c) for c in columns])
+            .filter(
+                MatchAdvancedDimension.summoner_id == summoner.id,
+                MatchAdvancedDimension.version == ADVANCED_DIMENSIONS_VERSION,
+                MatchAdvancedDimension.match_id.in_(chunk),
+            )
+            .one()
+        )
+        count += row[0] or 0
+        for k, value in zip(ADVANCED_DIMENSIONS, row[1:]):
+            sums[k] += value or 0.0
 
     if count <= 0:
         return {k: 0.0 for k in sums.keys()}
@@ -270,6 +407,189 @@ def compute_dimension_scores_for_role(
     )
 
 
+ROLE_ALL = "ALL"
+
+# SummonerRoleAggregate column -> MatchPerformance field it sums
+_BASIC_SUM_COLUMNS = {
+    "kills": "kills",
+    "deaths": "deaths",
+    "assists": "assists",
+    "sum_gold_per_min": "gold_per_min",
+    "sum_vision_score": "vision_score",
+    "sum_minions_killed": "total_minions_killed",
+    "sum_damage_to_champions": "total_damage_dealt_to_champions",
+}
+
+
+def _empty_totals() -> Dict[str, float]:
+    totals: Dict[str, float] = {"games": 0, "wins": 0, "adv_games": 0}
+    totals.update({column: 0 for column in _BASIC_SUM_COLUMNS})
+    totals.update({"sum_" + column: 0.0 for column in ADVANCED_DIMENSION_COLUMNS.values()})
+    return totals
+
+
+def _add_match(totals: Dict[str, float], performance: dict, advanced: Optional[dict]):
+    """Adds one MatchPerformance row (and its MatchAdvancedDimension row, if any) to running totals."""
+    totals["games"] += 1
+    totals["wins"] += 1 if performance.get("win") else 0
+    for column, field in _BASIC_SUM_COLUMNS.items():
+        totals[column] += performance.get(field) or 0
+    if advanced is not None:
+        totals["adv_games"] += 1
+        for column in ADVANCED_DIMENSION_COLUMNS.values():
+            totals["sum_" + column] += advanced.get(column) or 0.0
+
+
+def _aggregate_roles(lane: Optional[str]) -> List[str]:
+    role = LANE_TO_ROLE.get(lane)
+    return [ROLE_ALL, role] if role else [ROLE_ALL]
+
+
+def rebuild_role_aggregates(db: Session, summoner: Summoner) -> Dict[str, Dict[str, float]]:
+    """Recomputes a summoner's aggregates from stored rows. Does not commit; returns role -> totals."""
+    performance_columns = [MatchPerformance.match_id, MatchPerformance.lane, MatchPerformance.win] + [
+        getattr(MatchPerformance, field) for field in _BASIC_SUM_COLUMNS.values()
+    ]
+    performances = [
+        dict(zip(["match_id", "lane", "win"] + list(_BASIC_SUM_COLUMNS.values()), row))
+        for row in db.query(*performance_columns).filter(MatchPerformance.summoner_id == summoner.id)
+    ]
+
+    ensure_advanced_dimensions(db, summoner, [p["match_id"] for p in performances])
+    advanced_columns = list(ADVANCED_DIMENSION_COLUMNS.values())
+    advanced = {
+        row[0]: dict(zip(advanced_columns, row[1:]))
+        for row in db.query(
+            MatchAdvancedDimension.match_id,
+            *[getattr(MatchAdvancedDimension, column) for column in advanced_columns],
+        ).filter(
+            MatchAdvancedDimension.summoner_id == summoner.id,
+            MatchAdvancedDimension.version == ADVANCED_DIMENSIONS_VERSION,
+        )
+    }
+
+    totals_by_role: Dict[str, Dict[str, float]] = {ROLE_ALL: _empty_totals()}
+    for performance in performances:
+        for role in _aggregate_roles(performance["lane"]):
+            _add_match(totals_by_role.setdefault(role, _empty_totals()), performance, advanced.get(performance["match_id"]))
+
+    db.query(SummonerRoleAggregate).filter(SummonerRoleAggregate.summoner_id == summoner.id).delete(synchronize_session=False)
+    now = datetime.utcnow()
+    insert_ignore(db, SummonerRoleAggregate, [
+        dict(totals, summoner_id=summoner.id, role=role, adv_version=ADVANCED_DIMENSIONS_VERSION, updated_at=now)
+        for role, totals in totals_by_role.items()
+    ])
+    return totals_by_role
+
+
+def apply_role_aggregates(db: Session, performance_rows: List[dict], dimension_rows: Optional[List[dict]] = None):
+    """
+    Adds newly inserted MatchPerformance rows (and their advanced dimension rows) to the running
+    aggregates with in-place UPDATE col = col + delta. Summoners without current aggregates are
+    rebuilt from stored rows instead. Does not commit.
+    """
+    if not performance_rows:
+        return
+    advanced = {(row["summoner_id"], row["match_id"]): row for row in dimension_rows or []}
+    summoner_ids = {row["summoner_id"] for row in performance_rows}
+    ready = {
+        summoner_id for (summoner_id,) in db.query(SummonerRoleAggregate.summoner_id).filter(
+            SummonerRoleAggregate.summoner_id.in_(summoner_ids),
+            SummonerRoleAggregate.role == ROLE_ALL,
+            SummonerRoleAggregate.adv_version == ADVANCED_DIMENSIONS_VERSION,
+        )
+    }
+
+    deltas: Dict[Tuple[int, str], Dict[str, float]] = {}
+    for row in performance_rows:
+        summoner_id = row["summoner_id"]
+        if summoner_id not in ready:
+            continue
+        for role in _aggregate_roles(row.get("lane")):
+            _add_match(deltas.setdefault((summoner_id, role), _empty_totals()), row, advanced.get((summoner_id, row["match_id"])))
+
+    if deltas:
+        now = datetime.utcnow()
+        # First game in a role: create the row, then add to it like every other one
+        insert_ignore(db, SummonerRoleAggregate, [
+            dict(_empty_totals(), summoner_id=summoner_id, role=role, adv_version=ADVANCED_DIMENSIONS_VERSION, updated_at=now)
+            for summoner_id, role in deltas
+        ])
+        for (summoner_id, role), totals in deltas.items():
+            values = {getattr(SummonerRoleAggregate, column): getattr(SummonerRoleAggregate, column) + delta for column, delta in totals.items()}
+            values[SummonerRoleAggregate.updated_at] = now
+            (
+                db.query(SummonerRoleAggregate)
+                .filter(SummonerRoleAggregate.summoner_id == summoner_id, SummonerRoleAggregate.role == role)
+                .update(values, synchronize_session=False)
+            )
+
+    for summoner_id in summoner_ids - ready:
+        summoner = db.get(Summoner, summoner_id)
+        if summoner is not None:
+            rebuild_role_aggregates(db, summoner)
+
+
+def load_role_aggregates_bulk(db: Session, summoner_ids: List[int]) -> Dict[int, Dict[str, SummonerRoleAggregate]]:
+    """
+    summoner id -> role -> aggregate row (including "ALL") in one query. Summoners whose aggregates
+    are missing or were built with an older dimension version are rebuilt first.
+    """
+    summoner_ids = list(summoner_ids)
+    result: Dict[int, Dict[str, SummonerRoleAggregate]] = {summoner_id: {} for summoner_id in summoner_ids}
+    if not summoner_ids:
+        return result
+    for row in db.query(SummonerRoleAggregate).filter(SummonerRoleAggregate.summoner_id.in_(summoner_ids)):
+        result[row.summoner_id][row.role] = row
+
+    stale = [
+        summoner_id for summoner_id, rows in result.items()
+        if ROLE_ALL not in rows or rows[ROLE_ALL].adv_version != ADVANCED_DIMENSIONS_VERSION
+    ]
+    if stale:
+        for summoner in db.query(Summoner).filter(Summoner.id.in_(stale)):
+            rebuild_role_aggregates(db, summoner)
+        db.commit()
+        for summoner_id in stale:
+            result[summoner_id] = {}
+        for row in db.query(SummonerRoleAggregate).filter(SummonerRoleAggregate.summoner_id.in_(stale)):
+            result[row.summoner_id][row.role] = row
+    return result
+
+
+def load_role_aggregates(db: Session, summoner: Summoner) -> Dict[str, SummonerRoleAggregate]:
+    """role -> aggregate row (including "ALL") for one summoner."""
+    return load_role_aggregates_bulk(db, [summoner.id])[summoner.id]
+
+
+def dimension_scores_from_aggregate(aggregate: SummonerRoleAggregate) -> DimensionScores:
+    basic = _dimensions_from_totals(
+        aggregate.games or 0,
+        aggregate.wins or 0,
+        aggregate.kills or 0,
+        aggregate.deaths or 0,
+        aggregate.assists or 0,
+        aggregate.sum_gold_per_min or 0.0,
+        aggregate.sum_vision_score or 0,
+        aggregate.sum_minions_killed or 0,
+        aggregate.sum_damage_to_champions or 0,
+    )
+    adv_games = aggregate.adv_games or 0
+    adv = {
+        key: _safe_div(getattr(aggregate, "sum_" + column) or 0.0, adv_games)
+        for key, column in ADVANCED_DIMENSION_COLUMNS.items()
+    }
+    return DimensionScores(
+        aggro=basic.aggro,
+        risk=basic.risk,
+        vision=basic.vision,
+        farm=basic.farm,
+        damage=basic.damage,
+        winrate=basic.winrate,
+        **adv,
+    )
+
+
 TAG_DEFINITIONS: List[TagDefinition] = [
     # Global axes: Early pressure
     TagDefinition(
@@ -888,59 +1208,46 @@ TAG_DEFINITIONS: List[TagDefinition] = [
 ]
 
 
-def evaluate_tags_for_role(dims: DimensionScores, games: int, role: str) -> List[Dict[str, str]]:
-    if games <= 0:
-        return []
-    results: List[Dict[str, str]] = []
-    for definition in TAG_DEFINITIONS:
-        if definition.role_scope not in ("ANY", role):
-            continue
-        if games < definition.min_games:
-            continue
-        if definition.risk_max is not None and dims.risk > definition.risk_max:
-            continue
-        score = 0.0
-        for key, weight in definition.weights.items():
-            value = getattr(dims, key, 0.0)
-            score += value * weight
-        if score >= definition.threshold:
-            results.append({
-                "id": definition.id,
-                "label_ko": definition.label_ko,
-                "color": definition.color,
-            })
-    return results
+# Compiled once at import; rebuilt only if TAG_DEFINITIONS changes (i.e. with a new TAG_VERSION)
+TAG_MATRIX = TagMatrix(TAG_DEFINITIONS, list(DimensionScores.model_fields), ROLES)
 
 
-def compute_playstyle_tags_for_summoner(db: Session, summoner: Summoner) -> Tuple[List[Dict[str, str]], Optional[str], int]:
-    roles = ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"]
-    role_to_matches: Dict[str, List[MatchPerformance]] = {}
-    total_games = 0
-
-    for role in roles:
-        possible_lanes = ROLE_MAPPINGS.get(role, [role])
-        matches = (
-            db.query(MatchPerformance)
-            .filter(
-                MatchPerformance.summoner_id == summoner.id,
-                MatchPerformance.lane.in_(possible_lanes),
-            )
-            .all()
-        )
-        if not matches:
-            continue
-        role_to_matches[role] = matches
-        total_games += len(matches)
+def evaluate_tags_batch(
+    dims_list: List[DimensionScores],
+    games: List[int],
+    roles: List[str],
+) -> List[List[Dict[str, str]]]:
+    """Tags for many (dimensions, games, role) rows with a single matrix multiply."""
+    return TAG_MATRIX.evaluate_tags(dims_list, games, roles)
 
-    if not role_to_matches:
-        return [], None, 0
 
-    primary_role = max(role_to_matches.items(), key=lambda item: len(item[1]))[0]
+def evaluate_tags_for_role(dims: DimensionScores, games: int, role: str) -> List[Dict[str, str]]:
+    return evaluate_tags_batch([dims], [games], [role])[0]
+
+
+def compute_playstyle_tags_bulk(
+    db: Session,
+    summoner_ids: List[int],
+) -> Dict[int, Tuple[List[Dict[str, str]], Optional[str], int]]:
+    """(tags, primary_role, total_games) per summoner; every (summoner, role) row is scored in one batch."""
+    aggregates_by_summoner = load_role_aggregates_bulk(db, summoner_ids)
 
-    tag_map: Dict[str, Dict[str, Optional[str]]] = {}
-    for role, matches in role_to_matches.items():
-        dims = compute_dimension_scores_for_role(db, summoner, matches)
-        tags = evaluate_tags_for_role(dims, len(matches), role)
+    keys: List[Tuple[int, str]] = []
+    dims_list: List[DimensionScores] = []
+    games: List[int] = []
+    for summoner_id, aggregates in aggregates_by_summoner.items():
+        for role in ROLES:
+            if role in aggregates and aggregates[role].games:
+                keys.append((summoner_id, role))
+                dims_list.append(dimension_scores_from_aggregate(aggregates[role]))
+                games.append(aggregates[role].games)
+    tags_by_row = evaluate_tags_batch(dims_list, games, [role for _, role in keys])
+
+    role_games: Dict[int, Dict[str, int]] = {summoner_id: {} for summoner_id in aggregates_by_summoner}
+    tag_maps: Dict[int, Dict[str, Dict[str, Optional[str]]]] = {summoner_id: {} for summoner_id in aggregates_by_summoner}
+    for (summoner_id, role), row_games, tags in zip(keys, games, tags_by_row):
+        role_games[summoner_id][role] = row_games
+        tag_map = tag_maps[summoner_id]
         for tag in tags:
             tag_id = tag.get("id")
             if tag_id and tag_id not in tag_map:
@@ -950,8 +1257,18 @@ def compute_playstyle_tags_for_summoner(db: Session, summoner: Summoner) -> Tupl
                     "color": tag.get("color"),
                 }
 
-    ordered_tags = list(tag_map.values())
-    return ordered_tags, primary_role, total_games
+    results: Dict[int, Tuple[List[Dict[str, str]], Optional[str], int]] = {}
+    for summoner_id, per_role in role_games.items():
+        if not per_role:
+            results[summoner_id] = ([], None, 0)
+            continue
+        primary_role = max(per_role.items(), key=lambda item: item[1])[0]
+        results[summoner_id] = (list(tag_maps[summoner_id].values()), primary_role, sum(per_role.values()))
+    return results
+
+
+def compute_playstyle_tags_for_summoner(db: Session, summoner: Summoner) -> Tuple[List[Dict[str, str]], Optional[str], int]:
+    return compute_playstyle_tags_bulk(db, [summoner.id])[summoner.id]
 
 
 def upsert_playstyle_snapshot(db: Session, summoner: Summoner) -> Tuple[SummonerPlaystyleTag, List[Dict[str, str]], Optional[str], int]:
@@ -981,5 +1298,6 @@ def upsert_playstyle_snapshot(db: Session, summoner: Summoner) -> Tuple[Summoner
         snapshot.version = TAG_VERSION
 
     db.commit()
+    response_cache.invalidate_summoners([summoner.id])
     db.refresh(snapshot)
     return snapshot, tags, primary_role, total_games
@@ -0,0 +1,85 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class TagMatrix:
+    """
+    Tag definitions compiled into arrays so a batch of (dimension vector, games, role) rows is
+    scored with one matrix multiply:
+
+        scores = dims @ weights.T                      (rows x tags)
+        hit    = scores >= threshold & games >= min_games & role allowed & risk <= risk_max
+    """
+
+    def __init__(self, definitions: Sequence, dimension_fields: Sequence[str], roles: Sequence[str]):
+        self.definitions = list(definitions)
+        self.dimension_fields = list(dimension_fields)
+        self.field_index = {field: i for i, field in enumerate(self.dimension_fields)}
+        # Last column is for roles outside `roles`; only "ANY" tags apply there
+        self.role_index = {role: i for i, role in enumerate(roles)}
+        self.other_role = len(roles)
+
+        n_tags = len(self.definitions)
+        self.weights = np.zeros((n_tags, len(self.dimension_fields)), dtype=np.float64)
+        self.thresholds = np.empty(n_tags, dtype=np.float64)
+        self.min_games = np.empty(n_tags, dtype=np.int64)
+        self.risk_max = np.full(n_tags, np.inf, dtype=np.float64)
+        self.role_mask = np.zeros((len(roles) + 1, n_tags), dtype=bool)
+
+        for t, definition in enumerate(self.definitions):
+            for key, weight in definition.weights.items():
+                # Unknown dimensions score 0, like getattr(dims, key, 0.0)
+                if key in self.field_index:
+                    self.weights[t, self.field_index[key]] = weight
+            self.thresholds[t] = definition.threshold
+            self.min_games[t] = definition.min_games
+            if definition.risk_max is not None:
+                self.risk_max[t] = definition.risk_max
+            if definition.role_scope == "ANY":
+                self.role_mask[:, t] = True
+            elif definition.role_scope in self.role_index:
+                self.role_mask[self.role_index[definition.role_scope], t] = True
+
+        self._risk_column = self.field_index.get("risk")
+
+    def vectorize(self, dims_list: Sequence) -> np.ndarray:
+        return np.array(
+            [[getattr(dims, field) for field in self.dimension_fields] for dims in dims_list],
+            dtype=np.float64,
+        ).reshape(len(dims_list), len(self.dimension_fields))
+
+    def evaluate(self, dims: np.ndarray, games: Sequence[int], roles: Sequence[str]) -> np.ndarray:
+        """Boolean (rows x tags) matrix of tags each row earns."""
+        games_arr = np.asarray(games, dtype=np.int64)
+        role_rows = np.array([self.role_index.get(role, self.other_role) for role in roles], dtype=np.int64)
+
+        hits = (dims @ self.weights.T) >= self.thresholds
+        hits &= games_arr[:, None] >= self.min_games
+        hits &= (games_arr > 0)[:, None]
+        hits &= self.role_mask[role_rows]
+        if self._risk_column is not None:
+            hits &= dims[:, self._risk_column][:, None] <= self.risk_max
+        return hits
+
+    def evaluate_tags(
+        self,
+        dims_list: Sequence,
+        games: Sequence[int],
+        roles: Sequence[str],
+    ) -> List[List[Dict[str, Optional[str]]]]:
+        """Tag dicts per row, in definition order."""
+        if not dims_list:
+            return []
+        hits = self.evaluate(self.vectorize(dims_list), games, roles)
+        results = []
+        for row in hits:
+            results.append([
+                {
+                    "id": self.definitions[t].id,
+                    "label_ko": self.definitions[t].label_ko,
+                    "color": self.definitions[t].color,
+                }
+                for t in np.flatnonzero(row)
+            ])
+        return results
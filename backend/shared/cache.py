@@ -0,0 +1,184 @@
+"""
+Response cache for read endpoints on the Redis instance Celery already uses (REDIS_URL).
+
+Each entry records the version counters it was computed from; writers bump those counters
+after committing (the collector per summoner, leaderboard refreshes for the leaderboard), so an
+entry is never served once the data behind it has changed. Entries also expire after
+RESPONSE_CACHE_TTL seconds as a safety net.
+
+If Redis is unreachable every lookup is a miss and endpoints compute from the DB as before.
+Invalidations are retried with a longer timeout; any process that found Redis unreachable (an
+API worker missing a read just as much as a collector losing an invalidation) bumps the global
+epoch once it is back, since writes made meanwhile may not have been invalidated.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+# Socket timeouts are short: a slow Redis must not be slower than the DB it stands in for
+REDIS_TIMEOUT_SECONDS = 0.05
+RETRY_AFTER_SECONDS = 30
+# Invalidations run after a write has committed, off the request path: they can afford to wait
+INVALIDATION_TIMEOUT_SECONDS = 1.0
+INVALIDATION_ATTEMPTS = 3
+
+KEY_PREFIX = "response-cache"
+EPOCH = "epoch"
+LEADERBOARD = "leaderboard"
+
+
+def summoner_version(summoner_id: int) -> str:
+    return f"summoner:{summoner_id}"
+
+
+class ResponseCache:
+    """
+    Stores `<versions JSON>\\n<response JSON>` per key. A hit costs two round trips (GET, then MGET
+    of the recorded versions) and no DB access.
+    """
+
+    def __init__(self, client: Optional[redis.Redis] = None, ttl: int = RESPONSE_CACHE_TTL, enabled: bool = RESPONSE_CACHE_ENABLED):
+        self._client = client
+        self._invalidation_client = client
+        self.ttl = ttl
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+        self._epoch_bump_pending = False
+
+    def _redis(self) -> Optional[redis.Redis]:
+        if not self.enabled or time.monotonic() < self._down_until:
+            return None
+        if self._client is None:
+            self._client = redis.Redis.from_url(
+                REDIS_URL,
+                socket_connect_timeout=REDIS_TIMEOUT_SECONDS,
+                socket_timeout=REDIS_TIMEOUT_SECONDS,
+            )
+        if self._epoch_bump_pending and not self._bump_epoch(self._client):
+            return None
+        return self._client
+
+    def _bump_epoch(self, client: redis.Redis) -> bool:
+        """Delivers a pending epoch bump; False if Redis is still unreachable."""
+        with self._lock:
+            if not self._epoch_bump_pending:
+                return True
+            try:
+                client.incr(self._version_key(EPOCH))
+            except redis.RedisError as e:
+                self._unavailable(e)
+                return False
+            self._epoch_bump_pending = False
+            return True
+
+    def _unavailable(self, error: Exception):
+        # Whatever was written while this process couldn't reach Redis may have lost its invalidation
+        self._epoch_bump_pending = True
+        if time.monotonic() >= self._down_until:
+            logger.warning(f"[cache] Redis unavailable, serving from the DB for {RETRY_AFTER_SECONDS}s: {error}")
+        self._down_until = time.monotonic() + RETRY_AFTER_SECONDS
+
+    @staticmethod
+    def _version_key(name: str) -> str:
+        return f"{KEY_PREFIX}:version:{name}"
+
+    @staticmethod
+    def _entry_key(key: str) -> str:
+        return f"{KEY_PREFIX}:entry:{key}"
+
+    def versions(self, names: Iterable[str]) -> Optional[Dict[str, int]]:
+        """Current counters of `names` (plus the epoch), read before computing a response to store."""
+        client = self._redis()
+        if client is None:
+            return None
+        names = [EPOCH] + [name for name in names if name != EPOCH]
+        try:
+            values = client.mget([self._version_key(name) for name in names])
+        except redis.RedisError as e:
+            self._unavailable(e)
+            return None
+        return {name: int(value or 0) for name, value in zip(names, values)}
+
+    def get(self, key: str) -> Optional[bytes]:
+        """The cached response body for `key`, if every version it was computed from is current."""
+        client = self._redis()
+        if client is None:
+            return None
+        try:
+            entry = client.get(self._entry_key(key))
+            if entry is None:
+                return None
+            header, body = entry.split(b"\n", 1)
+            recorded = json.loads(header)
+            current = client.mget([self._version_key(name) for name in recorded])
+        except redis.RedisError as e:
+            self._unavailable(e)
+            return None
+        if any(int(value or 0) != version for value, version in zip(current, recorded.values())):
+            return None
+        return body
+
+    def put(self, key: str, body: bytes, versions: Optional[Dict[str, int]]):
+        """Stores `body` under the versions read before it was computed (None: versions unknown, skip)."""
+        if versions is None:
+            return
+        client = self._redis()
+        if client is None:
+            return
+        header = json.dumps(versions, separators=(",", ":")).encode("utf-8")
+        try:
+            client.set(self._entry_key(key), header + b"\n" + body, ex=self.ttl)
+        except redis.RedisError as e:
+            self._unavailable(e)
+
+    def invalidate(self, names: Iterable[str]):
+        """
+        Bumps the counters of `names`; call after the change is committed.
+
+        Tried even while reads are skipping Redis, and retried before giving up: a lost
+        invalidation is only repaired by flushing the whole cache.
+        """
+        names = sorted(set(names))
+        if not names or not self.enabled:
+            return
+        if self._invalidation_client is None:
+            self._invalidation_client = redis.Redis.from_url(
+                REDIS_URL,
+                socket_connect_timeout=INVALIDATION_TIMEOUT_SECONDS,
+                socket_timeout=INVALIDATION_TIMEOUT_SECONDS,
+            )
+        client = self._invalidation_client
+        for attempt in range(INVALIDATION_ATTEMPTS):
+            try:
+                # Bumping a counter twice is harmless, so a retry starts over
+                for name in names:
+                    client.incr(self._version_key(name))
+            except redis.RedisError as e:
+                error = e
+                time.sleep(0.1 * 2 ** attempt)
+                continue
+            if self._epoch_bump_pending:
+                self._bump_epoch(client)
+            return
+        logger.error(f"[cache] Could not invalidate {names}; the cache is flushed once Redis is reachable: {error}")
+        self._unavailable(error)
+
+    def invalidate_summoners(self, summoner_ids: Iterable[int]):
+        self.invalidate(summoner_version(summoner_id) for summoner_id in summoner_ids)
+
+    def invalidate_all(self):
+        self.invalidate([EPOCH])
+
+
+response_cache = ResponseCache()
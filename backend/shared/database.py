@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, ForeignKey, DateTime, JSON, Text
+from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, ForeignKey, DateTime, JSON, Text, Index, UniqueConstraint, LargeBinary
+from sqlalchemy.dialects.mysql import LONGBLOB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
+from datetime import datetime, timezone
 import os
 
 # Default to MariaDB for development; can be overridden via DB_URL env var
@@ -20,6 +21,63 @@ def get_db():
     finally:
         db.close()
 
+def utc_from_millis(millis) -> datetime:
+    """Riot epoch milliseconds as a naive UTC datetime, the time base of every DateTime column (like utcnow())."""
+    return datetime.fromtimestamp(millis / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+def utc_timestamp(value: datetime) -> float:
+    """Epoch seconds of a naive UTC datetime read back from a DateTime column."""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+def insert_ignore(session, model, rows):
+    """
+    Bulk-inserts rows (list of column dicts), skipping any that collide with an existing
+    unique key: ON DUPLICATE KEY UPDATE on MariaDB/MySQL, ON CONFLICT DO NOTHING on SQLite.
+    Does not commit.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    dialect = session.get_bind().dialect.name
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+        pk = table.primary_key.columns.values()[0]
+        stmt = insert(table).on_duplicate_key_update({pk.name: pk})
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).on_conflict_do_nothing()
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).on_conflict_do_nothing()
+    else:
+        stmt = table.insert()
+    session.execute(stmt, rows)
+
+def upsert(session, model, rows, key, update):
+    """
+    Bulk-inserts rows (list of column dicts); a row whose `key` columns (a unique key) already
+    exist overwrites that row's `update` columns instead. Does not commit.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    dialect = session.get_bind().dialect.name
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        stmt = stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in update})
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(index_elements=list(key), set_={column: stmt.excluded[column] for column in update})
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(index_elements=list(key), set_={column: stmt.excluded[column] for column in update})
+    else:
+        stmt = table.insert()
+    session.execute(stmt, rows)
+
 class Summoner(Base):
     __tablename__ = "summoners"
 
@@ -35,9 +93,16 @@ class Summoner(Base):
     matches = relationship("MatchPerformance", back_populates="summoner")
     playstyle_tags = relationship("SummonerPlaystyleTag", back_populates="summoner")
     analysis = relationship("SummonerAnalysis", back_populates="summoner", uselist=False)
+    ingest_state = relationship("SummonerIngestState", back_populates="summoner", uselist=False)
 
 class MatchPerformance(Base):
     __tablename__ = "match_performances"
+    __table_args__ = (
+        UniqueConstraint("summoner_id", "match_id", name="uq_match_performance_summoner_match"),
+        # Per-summoner history (newest first, time windows) and per-lane role scoring
+        Index("ix_match_performances_summoner_created", "summoner_id", "game_creation"),
+        Index("ix_match_performances_summoner_lane_created", "summoner_id", "lane", "game_creation"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     summoner_id = Column(Integer, ForeignKey("summoners.id"))
@@ -69,7 +134,42 @@ class MatchDetail(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     match_id = Column(String(50), unique=True, index=True)
-    raw = Column(JSON)
+    # Riot match JSON is stored either as plain JSON or zlib-compressed (MATCH_RAW_STORAGE);
+    # read and write it through `raw`, which hides the storage mode
+    raw_json = Column("raw", JSON)
+    raw_compressed = Column(LargeBinary().with_variant(LONGBLOB(), "mysql", "mariadb"))
+    raw_dictionary_id = Column(Integer, ForeignKey("match_raw_dictionaries.id")) # NULL: no preset dictionary
+
+    @property
+    def raw(self):
+        from backend.shared.match_storage import decode_raw
+        return decode_raw(self.raw_json, self.raw_compressed, self.raw_dictionary_id)
+
+    @raw.setter
+    def raw(self, value):
+        from backend.shared.match_storage import encode_raw
+        self.raw_json, self.raw_compressed, self.raw_dictionary_id = encode_raw(value)
+
+
+class MatchRawDictionary(Base):
+    """zlib preset dictionary trained on stored match payloads; rows are never changed once written."""
+    __tablename__ = "match_raw_dictionaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    data = Column(LargeBinary().with_variant(LONGBLOB(), "mysql", "mariadb"))
+    sample_size = Column(Integer) # Payloads it was trained on
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class MatchDetailResponseRow(Base):
+    """Serialized GET /matches/{match_id} response, built on first read; finished matches never change."""
+    __tablename__ = "match_detail_responses"
+
+    id = Column(Integer, primary_key=True, index=True)
+    match_id = Column(String(50), unique=True, index=True)
+    version = Column(Integer) # MATCH_DETAIL_RESPONSE_VERSION it was built with
+    body = Column(LargeBinary().with_variant(LONGBLOB(), "mysql", "mariadb"))
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 
 class SummonerPlaystyleTag(Base):
@@ -96,5 +196,158 @@ class SummonerAnalysis(Base):
 
     summoner = relationship("Summoner", back_populates="analysis")
 
+class SummonerIngestState(Base):
+    __tablename__ = "summoner_ingest_states"
+
+    id = Column(Integer, primary_key=True, index=True)
+    summoner_id = Column(Integer, ForeignKey("summoners.id"), index=True, unique=True)
+    last_match_id = Column(String(50)) # Newest stored match for this summoner
+    last_game_creation = Column(DateTime)
+    last_polled_at = Column(DateTime) # Last poll that ran to completion
+    backfill_cursor = Column(Integer, default=0) # Match list offset to resume a full crawl from
+    backfill_complete = Column(Boolean, default=False)
+    next_poll_at = Column(DateTime, index=True) # Set by the adaptive poll scheduler
+
+    summoner = relationship("Summoner", back_populates="ingest_state")
+
+class LeaderboardEntryRow(Base):
+    """Materialized leaderboard row; refreshed by the collector and a scheduled task."""
+    __tablename__ = "leaderboard_entries"
+    __table_args__ = (
+        UniqueConstraint("timeframe", "summoner_id", name="uq_leaderboard_timeframe_summoner"),
+        Index("ix_leaderboard_timeframe_rank", "timeframe", "best_score", "games"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    timeframe = Column(String(10)) # daily, weekly, monthly, yearly
+    summoner_id = Column(Integer, ForeignKey("summoners.id"), index=True)
+    best_role = Column(String(20))
+    best_score = Column(Float) # Volume-weighted score of best_role
+    games = Column(Integer)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+    summoner = relationship("Summoner")
+
+class MatchParticipant(Base):
+    """
+    One row per participant (all 10, registered or not) of every stored match, typed and indexed
+    so participant-level questions don't need MatchDetail.raw.
+    """
+    __tablename__ = "match_participants"
+    __table_args__ = (
+        UniqueConstraint("match_id", "puuid", name="uq_match_participant_match_puuid"),
+        Index("ix_match_participants_puuid_created", "puuid", "game_creation"),
+        Index("ix_match_participants_match_team", "match_id", "team_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    match_id = Column(String(50))
+    puuid = Column(String(100))
+    participant_id = Column(Integer) # 1-10 within the match
+    game_creation = Column(DateTime)
+    game_duration = Column(Integer) # seconds
+    team_id = Column(Integer) # 100 blue, 200 red
+    team_position = Column(String(20)) # TOP, JUNGLE, MIDDLE, BOTTOM, UTILITY or ""
+    champion_name = Column(String(50))
+    win = Column(Boolean)
+    kills = Column(Integer)
+    deaths = Column(Integer)
+    assists = Column(Integer)
+    gold_earned = Column(Integer)
+    total_damage_dealt_to_champions = Column(Integer)
+    total_minions_killed = Column(Integer) # lane + neutral, like MatchPerformance
+    vision_score = Column(Integer)
+    # Key challenge fields (NULL when Riot omitted them)
+    kill_participation = Column(Float)
+    damage_per_minute = Column(Float)
+    team_damage_percentage = Column(Float)
+    gold_per_minute = Column(Float)
+    vision_score_per_minute = Column(Float)
+    solo_kills = Column(Integer)
+    takedowns_first_x_minutes = Column(Integer)
+    lane_minions_first_10_minutes = Column(Integer)
+    control_wards_placed = Column(Integer)
+
+
+class MatchAdvancedDimension(Base):
+    """Advanced playstyle dimensions of one summoner in one match, computed from MatchDetail.raw at ingest."""
+    __tablename__ = "match_advanced_dimensions"
+    __table_args__ = (
+        UniqueConstraint("summoner_id", "match_id", name="uq_match_adv_dim_summoner_match"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    summoner_id = Column(Integer, ForeignKey("summoners.id"), index=True)
+    match_id = Column(String(50), index=True)
+    early_aggro = Column(Float)
+    late_carry = Column(Float)
+    lane_lead = Column(Float)
+    objective_focus = Column(Float)
+    teamfight = Column(Float)
+    roam = Column(Float)
+    split_push = Column(Float)
+    farm_focus = Column(Float)
+    vision_control = Column(Float)
+    version = Column(Integer, index=True) # ADVANCED_DIMENSIONS_VERSION the row was computed with
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+class MatchTeamMember(Base):
+    """Team of a registered summoner in a match plus that team's total kills; duo games come from a self-join."""
+    __tablename__ = "match_team_members"
+    __table_args__ = (
+        UniqueConstraint("summoner_id", "match_id", name="uq_match_team_member_summoner_match"),
+        Index("ix_match_team_members_match_team", "match_id", "team_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    summoner_id = Column(Integer, ForeignKey("summoners.id"))
+    match_id = Column(String(50))
+    team_id = Column(Integer) # 100 (blue) / 200 (red)
+    team_kills = Column(Integer)
+
+class SummonerRoleAggregate(Base):
+    """Running sums of playstyle inputs per (summoner, role); role "ALL" covers every match of the summoner."""
+    __tablename__ = "summoner_role_aggregates"
+    __table_args__ = (
+        UniqueConstraint("summoner_id", "role", name="uq_role_aggregate_summoner_role"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    summoner_id = Column(Integer, ForeignKey("summoners.id"), index=True)
+    role = Column(String(20))
+
+    # MatchPerformance sums
+    games = Column(Integer, default=0)
+    wins = Column(Integer, default=0)
+    kills = Column(Integer, default=0)
+    deaths = Column(Integer, default=0)
+    assists = Column(Integer, default=0)
+    sum_gold_per_min = Column(Float, default=0.0)
+    sum_vision_score = Column(Integer, default=0)
+    sum_minions_killed = Column(Integer, default=0)
+    sum_damage_to_champions = Column(Integer, default=0)
+
+    # MatchAdvancedDimension sums (matches with stored raw JSON only)
+    adv_games = Column(Integer, default=0)
+    sum_early_aggro = Column(Float, default=0.0)
+    sum_late_carry = Column(Float, default=0.0)
+    sum_lane_lead = Column(Float, default=0.0)
+    sum_objective_focus = Column(Float, default=0.0)
+    sum_teamfight = Column(Float, default=0.0)
+    sum_roam = Column(Float, default=0.0)
+    sum_split_push = Column(Float, default=0.0)
+    sum_farm_focus = Column(Float, default=0.0)
+    sum_vision_control = Column(Float, default=0.0)
+    adv_version = Column(Integer) # ADVANCED_DIMENSIONS_VERSION the advanced sums were built with
+
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class AppliedMigration(Base):
+    """Data migrations that already ran (schema migrations inspect the schema instead)."""
+    __tablename__ = "applied_migrations"
+
+    name = Column(String(100), primary_key=True)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
 def init_db():
     Base.metadata.create_all(bind=engine)
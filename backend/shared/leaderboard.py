@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from backend.shared.cache import LEADERBOARD, response_cache
+from backend.shared.database import Summoner, LeaderboardEntryRow, upsert
+from backend.shared.role_scores import aggregate_role_totals, scores_from_totals, volume_weight
+
+# timeframe -> (window, games needed for full volume weight)
+TIMEFRAMES: Dict[str, Tuple[timedelta, int]] = {
+    "daily": (timedelta(days=1), 5),
+    "weekly": (timedelta(days=7), 10),
+    "monthly": (timedelta(days=30), 20),
+    "yearly": (timedelta(days=365), 50),
+}
+
+LEADERBOARD_SIZE = 50
+
+
+def compute_leaderboard_rows(
+    db: Session,
+    timeframe: str,
+    summoner_ids: Optional[Iterable[int]] = None,
+    now: Optional[datetime] = None,
+) -> List[Dict[str, object]]:
+    """Best volume-weighted role per summoner within the timeframe (one aggregate query)."""
+    window, target_games = TIMEFRAMES[timeframe]
+    since = (now or datetime.utcnow()) - window
+
+    rows = []
+    totals_by_summoner = aggregate_role_totals(db, summoner_ids=summoner_ids, since=since)
+    for summoner_id, role_totals in totals_by_summoner.items():
+        role_candidates = []
+        for s in scores_from_totals(role_totals):
+            games = role_totals[s["role"]][0]
+            weight = volume_weight(games, target_games)
+            effective_score = round(s["score"] * weight, 1)
+            role_candidates.append((s["role"], effective_score, games))
+
+        if not role_candidates:
+            continue
+
+        # Select best role using volume-weighted (effective) score
+        best_role, best_effective_score, best_games = max(role_candidates, key=lambda x: x[1])
+        rows.append({
+            "timeframe": timeframe,
+            "summoner_id": summoner_id,
+            "best_role": best_role,
+            "best_score": best_effective_score,
+            "games": best_games,
+        })
+    return rows
+
+
+def refresh_leaderboard(
+    db: Session,
+    timeframe: str,
+    summoner_ids: Optional[Iterable[int]] = None,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    Recomputes the materialized rows for a timeframe (only `summoner_ids` when given).
+
+    Safe to run concurrently with other refreshes (the beat task overlapping the collector's):
+    rows are upserted on (timeframe, summoner_id), so whichever commits last wins.
+    """
+    now = now or datetime.utcnow()
+    if summoner_ids is not None:
+        summoner_ids = list(summoner_ids)
+        if not summoner_ids:
+            return 0
+    rows = compute_leaderboard_rows(db, timeframe, summoner_ids=summoner_ids, now=now)
+
+    # Only summoners that dropped out of the window; everyone else is overwritten below
+    stale = db.query(LeaderboardEntryRow).filter(LeaderboardEntryRow.timeframe == timeframe)
+    if summoner_ids is not None:
+        stale = stale.filter(LeaderboardEntryRow.summoner_id.in_(summoner_ids))
+    ranked = [row["summoner_id"] for row in rows]
+    if ranked:
+        stale = stale.filter(LeaderboardEntryRow.summoner_id.not_in(ranked))
+    removed = stale.delete(synchronize_session=False)
+
+    for row in rows:
+        row["computed_at"] = now
+    upsert(db, LeaderboardEntryRow, rows, key=("timeframe", "summoner_id"), update=("best_role", "best_score", "games", "computed_at"))
+    db.commit()
+    if removed or rows:
+        response_cache.invalidate([LEADERBOARD])
+    return len(rows)
+
+
+def refresh_all_leaderboards(db: Session, summoner_ids: Optional[Iterable[int]] = None) -> Dict[str, int]:
+    now = datetime.utcnow()
+    if summoner_ids is not None:
+        summoner_ids = list(summoner_ids)
+    return {
+        timeframe: refresh_leaderboard(db, timeframe, summoner_ids=summoner_ids, now=now)
+        for timeframe in TIMEFRAMES
+    }
+
+
+def read_leaderboard(db: Session, timeframe: str, limit: int = LEADERBOARD_SIZE) -> List[Tuple[LeaderboardEntryRow, Summoner]]:
+    """Top entries by adjusted best_score desc, then games desc."""
+    return (
+        db.query(LeaderboardEntryRow, Summoner)
+        .join(Summoner, Summoner.id == LeaderboardEntryRow.summoner_id)
+        .filter(LeaderboardEntryRow.timeframe == timeframe)
+        .order_by(
+            LeaderboardEntryRow.best_score.desc(),
+            LeaderboardEntryRow.games.desc(),
+            Summoner.id.asc(),
+        )
+        .limit(limit)
+        .all()
+    )
@@ -0,0 +1,224 @@
+"""
+Storage of raw Riot match JSON in MatchDetail.
+
+MATCH_RAW_STORAGE selects how new rows are written:
+  json  - plain JSON column (default, what older rows use)
+  zlib  - compact JSON compressed with zlib, using the newest preset dictionary trained on stored
+          payloads when one exists (see `python -m backend.collector.backfill compress-raw`)
+
+Rows of both kinds can coexist; `MatchDetail.raw` and `decode_raw` read either.
+"""
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from backend.shared.database import SessionLocal, MatchDetail, MatchRawDictionary
+
+RAW_STORAGE_MODES = ("json", "zlib")
+MATCH_RAW_STORAGE = os.getenv("MATCH_RAW_STORAGE", "json")
+COMPRESSION_LEVEL = 6
+# zlib only looks back 32KB, so a larger dictionary would never be referenced
+DICTIONARY_SIZE = 32 * 1024
+DICTIONARY_REFRESH_SECONDS = 300
+
+# MatchDetail columns a stored payload is decoded from, in decode_raw argument order
+RAW_STORAGE_COLUMNS = (MatchDetail.raw_json, MatchDetail.raw_compressed, MatchDetail.raw_dictionary_id)
+
+
+def _serialize(raw: dict) -> bytes:
+    return json.dumps(raw, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def compress_payload(raw: dict, dictionary: Optional[bytes] = None) -> bytes:
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=dictionary) if dictionary else zlib.compressobj(COMPRESSION_LEVEL)
+    return compressor.compress(_serialize(raw)) + compressor.flush()
+
+
+def decompress_payload(data: bytes, dictionary: Optional[bytes] = None) -> dict:
+    decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+    return json.loads(decompressor.decompress(data) + decompressor.flush())
+
+
+class _DictionaryCache:
+    """Process-wide cache of preset dictionaries; they are immutable, so only new ids need loading."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[int, bytes] = {}
+        self._current_id: Optional[int] = None
+        self._loaded_at = 0.0
+
+    def _load(self):
+        session = SessionLocal()
+        try:
+            query = session.query(MatchRawDictionary.id, MatchRawDictionary.data)
+            if self._data:
+                query = query.filter(~MatchRawDictionary.id.in_(list(self._data)))
+            for dictionary_id, data in query:
+                self._data[dictionary_id] = bytes(data)
+        finally:
+            session.close()
+        self._current_id = max(self._data) if self._data else None
+        self._loaded_at = time.monotonic()
+
+    def get(self, dictionary_id: int) -> bytes:
+        with self._lock:
+            if dictionary_id not in self._data:
+                self._load()
+            if dictionary_id not in self._data:
+                raise KeyError(f"match raw dictionary {dictionary_id} does not exist")
+            return self._data[dictionary_id]
+
+    def current(self) -> Tuple[Optional[int], Optional[bytes]]:
+        with self._lock:
+            if time.monotonic() - self._loaded_at > DICTIONARY_REFRESH_SECONDS:
+                self._load()
+            if self._current_id is None:
+                return None, None
+            return self._current_id, self._data[self._current_id]
+
+    def reset(self):
+        with self._lock:
+            self._data = {}
+            self._current_id = None
+            self._loaded_at = 0.0
+
+
+_dictionaries = _DictionaryCache()
+
+
+def reset_dictionary_cache():
+    """Forget loaded dictionaries (after training a new one or switching databases)."""
+    _dictionaries.reset()
+
+
+def encode_raw(raw: Optional[dict], mode: Optional[str] = None) -> Tuple[Optional[dict], Optional[bytes], Optional[int]]:
+    """(raw_json, raw_compressed, raw_dictionary_id) column values for `raw`."""
+    mode = mode or MATCH_RAW_STORAGE
+    if raw is None:
+        return None, None, None
+    if mode == "json":
+        return raw, None, None
+    if mode == "zlib":
+        dictionary_id, dictionary = _dictionaries.current()
+        return None, compress_payload(raw, dictionary), dictionary_id
+    raise ValueError(f"Unknown MATCH_RAW_STORAGE mode {mode!r}; expected one of {RAW_STORAGE_MODES}")
+
+
+def decode_raw(raw_json: Optional[dict], raw_compressed: Optional[bytes], raw_dictionary_id: Optional[int]) -> Optional[dict]:
+    if raw_compressed is None:
+        return raw_json
+    dictionary = _dictionaries.get(raw_dictionary_id) if raw_dictionary_id is not None else None
+    return decompress_payload(raw_compressed, dictionary)
+
+
+def match_detail_row(match_id: str, raw: Optional[dict], mode: Optional[str] = None) -> dict:
+    """Table column dict for inserting one MatchDetail with insert_ignore."""
+    raw_json, raw_compressed, raw_dictionary_id = encode_raw(raw, mode)
+    return {
+        "match_id": match_id,
+        "raw": raw_json,
+        "raw_compressed": raw_compressed,
+        "raw_dictionary_id": raw_dictionary_id,
+    }
+
+
+def load_raw_matches(db: Session, match_ids: List[str]) -> Dict[str, dict]:
+    """match_id -> raw JSON for the stored matches among `match_ids` (one IN query, column rows only)."""
+    if not match_ids:
+        return {}
+    result: Dict[str, dict] = {}
+    for match_id, *storage in db.query(MatchDetail.match_id, *RAW_STORAGE_COLUMNS).filter(MatchDetail.match_id.in_(match_ids)):
+        raw = decode_raw(*storage)
+        if raw:
+            result[match_id] = raw
+    return result
+
+
+# Digits split a payload into the fixed parts (keys, enums, punctuation) that repeat across matches
+_NUMBER = re.compile(rb"-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?")
+
+
+def train_dictionary(payloads: Iterable[dict], size: int = DICTIONARY_SIZE) -> bytes:
+    """
+    Builds a zlib preset dictionary from sample payloads: the byte runs between numbers that
+    recur most (weighted by length), packed up to `size` bytes.
+    """
+    counts: Counter = Counter()
+    for raw in payloads:
+        for segment in _NUMBER.split(_serialize(raw)):
+            if len(segment) >= 4:
+                counts[segment] += 1
+
+    chosen: List[bytes] = []
+    total = 0
+    for segment, count in sorted(counts.items(), key=lambda item: (item[1] * len(item[0]), item[0]), reverse=True):
+        if count < 2:
+            break
+        if total + len(segment) > size:
+            continue
+        chosen.append(segment)
+        total += len(segment)
+    # Closer matches are cheaper to encode, so the most valuable segments go last
+    return b"".join(reversed(chosen))
+
+
+def store_dictionary(db: Session, data: bytes, sample_size: int) -> MatchRawDictionary:
+    """Saves a trained dictionary (commits); new zlib rows use it from then on."""
+    row = MatchRawDictionary(data=data, sample_size=sample_size)
+    db.add(row)
+    db.commit()
+    reset_dictionary_cache()
+    return row
+
+
+def sample_payloads(db: Session, limit: int) -> List[dict]:
+    """Up to `limit` stored payloads, newest first, for training."""
+    rows = (
+        db.query(*RAW_STORAGE_COLUMNS)
+        .order_by(MatchDetail.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [raw for raw in (decode_raw(*row) for row in rows) if raw]
+
+
+def benchmark_raw_storage(payloads: List[dict], dictionary: Optional[bytes], repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    """
+    Stored bytes and per-match read-decode latency of `payloads` for plain JSON (parsed from text,
+    as the JSON column is read), zlib, and zlib with `dictionary`.
+    """
+    texts = [_serialize(raw) for raw in payloads]
+    variants = {
+        "json": (texts, json.loads),
+        "zlib": ([compress_payload(raw) for raw in payloads], decompress_payload),
+    }
+    if dictionary:
+        variants["zlib+dictionary"] = (
+            [compress_payload(raw, dictionary) for raw in payloads],
+            lambda data: decompress_payload(data, dictionary),
+        )
+
+    json_bytes = sum(len(text) for text in texts)
+    results: Dict[str, Dict[str, float]] = {}
+    for name, (stored, decode) in variants.items():
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for data in stored:
+                decode(data)
+            best = min(best, time.perf_counter() - started)
+        stored_bytes = sum(len(data) for data in stored)
+        results[name] = {
+            "bytes": stored_bytes,
+            "ratio": stored_bytes / json_bytes if json_bytes else 0.0,
+            "decode_ms_per_match": best * 1000.0 / len(stored) if stored else 0.0,
+        }
+    return results
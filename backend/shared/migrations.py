@@ -0,0 +1,222 @@
+"""
+Schema changes for databases created before a model gained new indexes or constraints.
+`init_db()` (create_all) only creates missing tables, so existing MariaDB tables are upgraded here.
+Data migrations run once and are recorded in applied_migrations.
+
+The API, the Celery worker and the collector call `upgrade_database()` when they start; it can
+also be run by hand:
+
+    python -m backend.shared.migrations
+"""
+import argparse
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy import UniqueConstraint, bindparam, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import AddConstraint
+
+from backend.shared.database import (
+    AppliedMigration,
+    Base,
+    MatchDetail,
+    MatchParticipant,
+    MatchPerformance,
+    SummonerIngestState,
+    engine as default_engine,
+    utc_from_millis,
+)
+from backend.shared.match_storage import load_raw_matches
+
+logger = logging.getLogger(__name__)
+
+
+def _existing_index_names(bind: Engine, table_name: str) -> set:
+    inspector = inspect(bind)
+    names = {index["name"] for index in inspector.get_indexes(table_name)}
+    names |= {constraint["name"] for constraint in inspector.get_unique_constraints(table_name)}
+    return names
+
+
+def remove_duplicate_match_performances(bind: Engine) -> int:
+    """Deletes repeated (summoner_id, match_id) rows, keeping the oldest one."""
+    # The derived table keeps MariaDB from rejecting a subquery on the table being deleted from
+    statement = text(
+        "DELETE FROM match_performances WHERE id NOT IN ("
+        " SELECT keep_id FROM ("
+        "  SELECT MIN(id) AS keep_id FROM match_performances GROUP BY summoner_id, match_id"
+        " ) AS keep"
+        ")"
+    )
+    with bind.begin() as conn:
+        return conn.execute(statement).rowcount or 0
+
+
+def migrate_match_performance_indexes(bind: Engine = default_engine) -> Dict[str, object]:
+    """
+    Adds the composite indexes and the (summoner_id, match_id) unique constraint of MatchPerformance
+    to an existing table. Duplicates are removed first so the constraint can be created.
+    Safe to run repeatedly.
+    """
+    table = MatchPerformance.__table__
+    existing = _existing_index_names(bind, table.name)
+    created: List[str] = []
+    removed = 0
+
+    for constraint in table.constraints:
+        if not isinstance(constraint, UniqueConstraint) or constraint.name in existing:
+            continue
+        removed = remove_duplicate_match_performances(bind)
+        if removed:
+            logger.warning(
+                f"[migrate] removed {removed} duplicate match performances; "
+                f"run `python -m backend.collector.backfill role-aggregates` to rebuild aggregates"
+            )
+        with bind.begin() as conn:
+            if bind.dialect.name in ("mysql", "mariadb"):
+                conn.execute(AddConstraint(constraint))
+            else:
+                # SQLite can't add constraints to an existing table; a unique index enforces the same
+                columns = ", ".join(column.name for column in constraint.columns)
+                conn.execute(text(f"CREATE UNIQUE INDEX {constraint.name} ON {table.name} ({columns})"))
+        created.append(constraint.name)
+
+    for index in table.indexes:
+        if index.name in existing:
+            continue
+        index.create(bind)
+        created.append(index.name)
+
+    for name in created:
+        logger.info(f"[migrate] {table.name}: created {name}")
+    return {"duplicates_removed": removed, "created": created}
+
+
+def _add_missing_columns(bind: Engine, table, column_names: List[str]) -> List[str]:
+    existing = {column["name"] for column in inspect(bind).get_columns(table.name)}
+    added = []
+    with bind.begin() as conn:
+        for name in column_names:
+            if name in existing:
+                continue
+            column_type = table.c[name].type.compile(dialect=bind.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}"))
+            added.append(name)
+    return added
+
+
+def migrate_match_detail_storage(bind: Engine = default_engine) -> Dict[str, object]:
+    """
+    Adds the compressed storage columns of MatchDetail. Existing rows keep their plain JSON until
+    `python -m backend.collector.backfill compress-raw` rewrites them.
+    """
+    added = _add_missing_columns(bind, MatchDetail.__table__, ["raw_compressed", "raw_dictionary_id"])
+    for name in added:
+        logger.info(f"[migrate] {MatchDetail.__tablename__}: added column {name}")
+    return {"added": added}
+
+
+def migrate_game_creation_to_utc(bind: Engine = default_engine, batch_size: int = 500) -> Dict[str, object]:
+    """
+    Rewrites game_creation of stored matches, and the ingest watermarks taken from it, in UTC.
+    It used to be stored in the host's local time; recomputing it from the raw JSON needs no
+    knowledge of that host's offset. Runs once.
+    """
+    name = "game-creation-utc"
+    with Session(bind=bind) as session:
+        if session.get(AppliedMigration, name) is not None:
+            return {"skipped": True}
+
+        updated = 0
+        last_id = 0
+        while True:
+            batch = session.execute(
+                select(MatchDetail.id, MatchDetail.match_id)
+                .where(MatchDetail.id > last_id)
+                .order_by(MatchDetail.id)
+                .limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            last_id = batch[-1].id
+            raws = load_raw_matches(session, [row.match_id for row in batch])
+            params = [
+                {"key": match_id, "game_creation": utc_from_millis(raw["info"]["gameCreation"])}
+                for match_id, raw in raws.items()
+                if (raw.get("info") or {}).get("gameCreation")
+            ]
+            if params:
+                for table in (MatchPerformance.__table__, MatchParticipant.__table__):
+                    session.execute(
+                        table.update().where(table.c.match_id == bindparam("key")).values(game_creation=bindparam("game_creation")),
+                        params,
+                    )
+            session.commit()
+            updated += len(params)
+
+        performance = MatchPerformance.__table__
+        state = SummonerIngestState.__table__
+        session.execute(
+            state.update()
+            .where(state.c.last_match_id.is_not(None))
+            .values(last_game_creation=(
+                select(performance.c.game_creation)
+                .where(performance.c.summoner_id == state.c.summoner_id, performance.c.match_id == state.c.last_match_id)
+                .scalar_subquery()
+            ))
+        )
+        session.add(AppliedMigration(name=name))
+        session.commit()
+    if updated:
+        logger.info(f"[migrate] game_creation of {updated} matches rewritten in UTC")
+    return {"matches": updated}
+
+
+MIGRATIONS = [
+    ("match-performance-indexes", migrate_match_performance_indexes),
+    ("match-detail-storage", migrate_match_detail_storage),
+    ("game-creation-utc", migrate_game_creation_to_utc),
+]
+
+
+def run_migrations(bind: Engine = default_engine) -> Dict[str, Dict[str, object]]:
+    return {name: migration(bind) for name, migration in MIGRATIONS}
+
+
+MIGRATION_LOCK = "lol_flex_analyst_migrations"
+MIGRATION_LOCK_TIMEOUT_SECONDS = 600
+
+
+def upgrade_database(bind: Engine = default_engine) -> Dict[str, Dict[str, object]]:
+    """
+    Creates missing tables, then runs the migrations. On MariaDB a named lock makes processes that
+    start together take turns; whoever comes second finds nothing left to do.
+    """
+    if bind.dialect.name not in ("mysql", "mariadb"):
+        Base.metadata.create_all(bind=bind)
+        return run_migrations(bind)
+    with bind.connect() as conn:
+        acquired = conn.execute(
+            text("SELECT GET_LOCK(:name, :timeout)"),
+            {"name": MIGRATION_LOCK, "timeout": MIGRATION_LOCK_TIMEOUT_SECONDS},
+        ).scalar()
+        if acquired != 1:
+            raise RuntimeError(f"Timed out waiting for another process to finish the migrations ({MIGRATION_LOCK})")
+        try:
+            Base.metadata.create_all(bind=bind)
+            return run_migrations(bind)
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK})
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m backend.shared.migrations", description=__doc__.strip().splitlines()[0])
+    parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    for name, result in upgrade_database().items():
+        logger.info(f"[migrate] {name}: {result}")
+
+
+if __name__ == "__main__":
+    main()
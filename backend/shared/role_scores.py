@@ -0,0 +1,112 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+
+from backend.shared.database import MatchPerformance
+
+ROLES = ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"]
+
+# Lane values Riot reports for each role; the one definition shared by role scores and playstyle tags
+ROLE_MAPPINGS: Dict[str, List[str]] = {
+    "TOP": ["TOP"],
+    "JUNGLE": ["JUNGLE"],
+    "MIDDLE": ["MIDDLE", "MID"],
+    "BOTTOM": ["BOTTOM", "BOT", "ADC"],
+    "UTILITY": ["UTILITY", "SUPPORT"],
+}
+
+LANE_TO_ROLE = {lane: role for role, lanes in ROLE_MAPPINGS.items() for lane in lanes}
+
+
+def score_role(role: str, total_games: int, wins: int, sum_kda: float, sum_gold: float, sum_vision: float) -> Dict[str, object]:
+    """Role score (0-100) and averages from aggregated match stats."""
+    avg_kda = sum_kda / total_games
+    avg_gold = sum_gold / total_games
+    avg_vision = sum_vision / total_games
+    win_rate = (wins / total_games) * 100
+
+    # Simple Scoring Algorithm (0-100)
+    # Weights: WR(40%), KDA(30%), Gold(15%), Vision(15%)
+    score_wr = min(100, win_rate)
+    score_kda = min(100, (avg_kda / 5.0) * 100)
+    score_gold = min(100, (avg_gold / 600) * 100)
+    score_vision = min(100, (avg_vision / 40) * 100)
+
+    final_score = (
+        score_wr * 0.4
+        + score_kda * 0.3
+        + score_gold * 0.15
+        + score_vision * 0.15
+    )
+
+    return {
+        "role": role,
+        "score": round(final_score, 1),
+        "win_rate": round(win_rate, 1),
+        "kda": round(avg_kda, 2),
+        "avg_gold": round(avg_gold, 1),
+        "vision_score": round(avg_vision, 1),
+    }
+
+
+def aggregate_role_totals(
+    db: Session,
+    summoner_ids: Optional[Iterable[int]] = None,
+    since: Optional[datetime] = None,
+) -> Dict[int, Dict[str, List]]:
+    """
+    One GROUP BY (summoner, lane) aggregate, folded into roles through ROLE_MAPPINGS.
+    Returns {summoner_id: {role: [games, wins, sum_kda, sum_gold_per_min, sum_vision]}}.
+    """
+    query = db.query(
+        MatchPerformance.summoner_id,
+        MatchPerformance.lane,
+        func.count(MatchPerformance.id),
+        func.sum(case((MatchPerformance.win == True, 1), else_=0)),  # noqa: E712
+        func.sum(MatchPerformance.kda),
+        func.sum(MatchPerformance.gold_per_min),
+        func.sum(MatchPerformance.vision_score),
+    ).filter(MatchPerformance.lane.in_(list(LANE_TO_ROLE.keys())))
+    if summoner_ids is not None:
+        query = query.filter(MatchPerformance.summoner_id.in_(list(summoner_ids)))
+    if since is not None:
+        query = query.filter(MatchPerformance.game_creation >= since)
+
+    totals: Dict[int, Dict[str, List]] = {}
+    rows = query.group_by(MatchPerformance.summoner_id, MatchPerformance.lane).all()
+    for summoner_id, lane, games, wins, sum_kda, sum_gold, sum_vision in rows:
+        acc = totals.setdefault(summoner_id, {}).setdefault(LANE_TO_ROLE[lane], [0, 0, 0.0, 0.0, 0.0])
+        acc[0] += games or 0
+        acc[1] += wins or 0
+        acc[2] += sum_kda or 0.0
+        acc[3] += sum_gold or 0.0
+        acc[4] += sum_vision or 0.0
+    return totals
+
+
+def scores_from_totals(role_totals: Dict[str, List]) -> List[Dict[str, object]]:
+    """Scores in ROLES order for one summoner's role totals."""
+    scores = []
+    for role in ROLES:
+        acc = role_totals.get(role)
+        if not acc or acc[0] == 0:
+            continue
+        scores.append(score_role(role, *acc))
+    return scores
+
+
+def volume_weight(games: int, target_games: int) -> float:
+    """Return a weight 0~1 that penalizes low game counts.
+
+    - 0 games: 0
+    - few games: ~0.3~0.5
+    - target_games 이상: 1.0
+    """
+    if games <= 0 or target_games <= 0:
+        return 0.0
+
+    ratio = min(1.0, games / float(target_games))
+    base = 0.3  # 최소 신뢰도
+    return base + (1.0 - base) * ratio
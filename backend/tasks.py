@@ -1,5 +1,7 @@
 from backend.celery_app import celery_app
 from backend.collector.collector_service import CollectorService
+from backend.shared.leaderboard import refresh_all_leaderboards
+from backend.core_api.playstyle_retag import retag_population
 from backend.shared.database import SessionLocal, Summoner
 import logging
 
@@ -27,3 +29,31 @@ def collect_summoner_data(self, summoner_id: int):
         raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
     finally:
         db.close()
+
+
+@celery_app.task
+def refresh_leaderboards():
+    """
+    Periodic full rebuild of the materialized leaderboards. The collector only refreshes
+    summoners it ingested, so this is what ages matches out of the timeframe windows.
+    """
+    db = SessionLocal()
+    try:
+        counts = refresh_all_leaderboards(db)
+        logger.info(f"Refreshed leaderboards: {counts}")
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True)
+def retag_playstyles(self, chunk_size: int = 200, workers: int = 4):
+    """
+    Recomputes SummonerPlaystyleTag for every summoner whose snapshot is outdated
+    (TAG_VERSION change or new matches). Progress is reported through the task state.
+    """
+    def progress(done: int, total: int):
+        self.update_state(state="PROGRESS", meta={"done": done, "total": total})
+
+    result = retag_population(chunk_size=chunk_size, workers=workers, progress=progress)
+    logger.info(f"Playstyle re-tagging finished: {result}")
+    return result
@@ -0,0 +1,91 @@
+"""Factories shared by the test modules: match JSON and match_performances rows."""
+import copy
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from backend.collector.mock_data import MOCK_MATCH_DETAIL
+
+
+def make_match(match_id, puuids=("mock_puuid_123",), game_creation=1600000000000):
+    detail = copy.deepcopy(MOCK_MATCH_DETAIL)
+    detail["metadata"]["matchId"] = match_id
+    detail["info"]["gameCreation"] = game_creation
+    template = detail["info"]["participants"][0]
+    participants = []
+    for puuid in puuids:
+        p = dict(template)
+        p["puuid"] = puuid
+        participants.append(p)
+    detail["info"]["participants"] = participants
+    return detail
+
+
+def make_detail(match_id, puuids, rng):
+    """Match JSON with randomized stats for every participant in `puuids`."""
+    participants = []
+    for puuid in puuids:
+        participants.append({
+            "puuid": puuid,
+            "teamPosition": rng.choice(["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY", ""]),
+            "win": rng.random() < 0.5,
+            "goldEarned": rng.randint(5000, 20000),
+            "visionScore": rng.randint(5, 90),
+            "totalDamageDealtToChampions": rng.randint(3000, 60000),
+            "timePlayed": rng.randint(900, 2400),
+            "kills": rng.randint(0, 15),
+            "deaths": rng.randint(0, 12),
+            "assists": rng.randint(0, 20),
+            "dragonKills": rng.randint(0, 3),
+            "baronKills": rng.randint(0, 1),
+            "damageDealtToObjectives": rng.randint(0, 30000),
+            "damageDealtToBuildings": rng.randint(0, 20000),
+            "totalMinionsKilled": rng.randint(0, 300),
+            "neutralMinionsKilled": rng.randint(0, 150),
+            "challenges": {
+                "takedownsFirstXMinutes": rng.randint(0, 8),
+                "soloKills": rng.randint(0, 4),
+                "damagePerMinute": rng.uniform(200, 1200),
+                "teamDamagePercentage": rng.uniform(0.05, 0.45),
+                "laneMinionsFirst10Minutes": rng.randint(0, 100),
+                "visionScorePerMinute": rng.uniform(0.2, 2.5),
+                "controlWardsPlaced": rng.randint(0, 8),
+                "killParticipation": rng.uniform(0.1, 0.9),
+                "goldPerMinute": rng.uniform(250, 600),
+            },
+        })
+    return {
+        "metadata": {"matchId": match_id},
+        "info": {"gameDuration": 1800, "gameCreation": 1700000000000, "participants": participants},
+    }
+
+
+def make_full_match(match_id, rng, puuids=None):
+    puuids = puuids or [f"{match_id}_x{k}" for k in range(10)]
+    detail = make_detail(match_id, puuids, rng)
+    for index, p in enumerate(detail["info"]["participants"]):
+        p["participantId"] = index + 1
+        p["teamId"] = 100 if index < 5 else 200
+        p["championName"] = rng.choice(["Ahri", "Garen", "Lee Sin", "Jinx", "Thresh"])
+    return detail
+
+
+def performance_row(summoner_id, match_id, hours_ago, lane="MIDDLE"):
+    return {
+        "summoner_id": summoner_id,
+        "match_id": match_id,
+        "game_creation": datetime(2025, 3, 1) - timedelta(hours=hours_ago),
+        "lane": lane,
+        "win": hours_ago % 2 == 0,
+        "kills": 3,
+        "deaths": 2,
+        "assists": 5,
+        "kda": 4.0,
+        "gold_per_min": 400.0,
+        "vision_score": 20,
+    }
+
+
+def query_plan(db, query):
+    sql = str(query.statement.compile(db.get_bind(), compile_kwargs={"literal_binds": True}))
+    return " | ".join(row[-1] for row in db.execute(text("EXPLAIN QUERY PLAN " + sql)))
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.collector.async_riot_client import AsyncRiotAPIClient
+from backend.collector.rate_limiter import RateLimiter
+from backend.collector.mock_data import MOCK_MATCH_DETAIL, MOCK_MATCH_IDS, MOCK_SUMMONER
+
+
+class _StandInRiotHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the Riot API. Paths are prefixed with the routing value."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.ports.add(self.client_address[1])
+        try:
+            time.sleep(0.02)
+            path = self.path.split("?", 1)[0]
+            if path.startswith("/asia/lol/match/v5/matches/by-puuid/"):
+                self._send_json(200, MOCK_MATCH_IDS)
+            elif path.startswith("/asia/lol/match/v5/matches/"):
+                match_id = path.rsplit("/", 1)[-1]
+                if match_id == "KR_RATE_LIMITED" and not server.rate_limited_once:
+                    server.rate_limited_once = True
+                    self._send_json(429, {}, headers={"Retry-After": "0"})
+                    return
+                if match_id == "KR_MISSING":
+                    self._send_json(404, {"status": {"message": "Data not found"}})
+                    return
+                detail = dict(MOCK_MATCH_DETAIL)
+                detail["metadata"] = {"matchId": match_id}
+                self._send_json(200, detail)
+            elif path.startswith("/kr/lol/summoner/v4/summoners/by-puuid/"):
+                self._send_json(200, MOCK_SUMMONER)
+            elif path.startswith("/asia/riot/account/v1/accounts/by-riot-id/"):
+                self._send_json(200, {"puuid": MOCK_SUMMONER["puuid"], "gameName": "Faker", "tagLine": "KR1"})
+            else:
+                self._send_json(404, {})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+class TestAsyncRiotAPIClient(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInRiotHandler)
+        self.server.lock = threading.Lock()
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.ports = set()
+        self.server.rate_limited_once = False
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        port = self.server.server_address[1]
+        self.base_url_template = f"http://127.0.0.1:{port}/{{routing}}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _client(self, **kwargs):
+        return AsyncRiotAPIClient(
+            base_url_template=self.base_url_template,
+            rate_limiter=RateLimiter(app_limits="1000:1"),
+            **kwargs,
+        )
+
+    def test_method_surface(self):
+        async def run():
+            async with self._client() as client:
+                ids = await client.get_match_ids("mock_puuid_123", start=0, count=50)
+                detail = await client.get_match_details("KR_1001")
+                account = await client.get_account_by_riot_id("Faker", "KR1")
+                summoner = await client.get_summoner_by_puuid(account["puuid"])
+                missing = await client.get_match_details("KR_MISSING")
+            return ids, detail, summoner, missing
+
+        ids, detail, summoner, missing = asyncio.run(run())
+        self.assertEqual(ids, MOCK_MATCH_IDS)
+        self.assertEqual(detail["metadata"]["matchId"], "KR_1001")
+        self.assertEqual(summoner["puuid"], MOCK_SUMMONER["puuid"])
+        self.assertIsNone(missing)
+
+    def test_concurrency_is_bounded_and_connections_reused(self):
+        match_ids = [f"KR_{i}" for i in range(60)]
+
+        async def run():
+            async with self._client(max_concurrency=4, connections_per_host=4) as client:
+                return await client.get_many_match_details(match_ids)
+
+        results = asyncio.run(run())
+        self.assertEqual(len(results), 60)
+        self.assertTrue(all(results[m]["metadata"]["matchId"] == m for m in match_ids))
+        self.assertLessEqual(self.server.max_in_flight, 4)
+        self.assertGreater(self.server.max_in_flight, 1)
+        # 60 requests over a pool of 4 keep-alive connections
+        self.assertLessEqual(len(self.server.ports), 4)
+
+    def test_retries_after_429(self):
+        async def run():
+            async with self._client() as client:
+                return await client.get_match_details("KR_RATE_LIMITED")
+
+        detail = asyncio.run(run())
+        self.assertTrue(self.server.rate_limited_once)
+        self.assertEqual(detail["metadata"]["matchId"], "KR_RATE_LIMITED")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,310 @@
+import os
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from backend.collector.collector_service import CollectorService
+from backend.collector.config import Config
+from backend.collector.pipeline import MatchClaims
+from backend.shared.database import SessionLocal, Summoner, MatchPerformance, MatchDetail, MatchAdvancedDimension, SummonerIngestState, insert_ignore, utc_timestamp
+from backend.shared.migrations import migrate_game_creation_to_utc
+from backend.tests.helpers import make_match
+
+
+class TestCollectorService(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.summoner = Summoner(summoner_name="Faker", puuid="mock_puuid_123", summoner_id="s1", summoner_level=30)
+        self.db.add(self.summoner)
+        self.db.commit()
+        self.service = CollectorService()
+        self.service.riot_client = MagicMock()
+
+    def tearDown(self):
+        self.db.close()
+        self.service.db.close()
+
+    def test_stored_matches_are_not_downloaded_again(self):
+        self.db.add(MatchDetail(match_id="KR_1", raw=make_match("KR_1")))
+        self.db.commit()
+
+        self.service.riot_client.get_match_ids.return_value = ["KR_1", "KR_2"]
+        self.service.riot_client.get_match_details.side_effect = lambda match_id: make_match(match_id)
+
+        self.service.update_summoner_data(self.db, self.summoner)
+
+        self.service.riot_client.get_match_details.assert_called_once_with("KR_2")
+        self.assertEqual(self.service.stats["match_cache_hits"], 1)
+        self.assertEqual(self.service.stats["match_cache_misses"], 1)
+
+        saved = {m.match_id for m in self.db.query(MatchPerformance).filter_by(summoner_id=self.summoner.id)}
+        self.assertEqual(saved, {"KR_1", "KR_2"})
+        self.assertEqual(self.db.query(MatchDetail).count(), 2)
+
+    def test_page_is_written_in_one_transaction_for_all_registered_participants(self):
+        teammate = Summoner(summoner_name="Zeus", puuid="mock_puuid_456", summoner_id="s2", summoner_level=30)
+        self.db.add(teammate)
+        self.db.commit()
+
+        match_ids = [f"KR_{i}" for i in range(5)]
+        self.service.riot_client.get_match_ids.return_value = match_ids
+        self.service.riot_client.get_match_details.side_effect = (
+            lambda match_id: make_match(match_id, puuids=("mock_puuid_123", "mock_puuid_456", "unregistered"))
+        )
+
+        writes = []
+        original_write_rows = self.service._write_rows
+        self.service._write_rows = lambda *args: (writes.append(1), original_write_rows(*args))[1]
+        self.service.update_summoner_data(self.db, self.summoner)
+        self.service._write_rows = original_write_rows
+
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(self.db.query(MatchPerformance).filter_by(summoner_id=self.summoner.id).count(), 5)
+        self.assertEqual(self.db.query(MatchPerformance).filter_by(summoner_id=teammate.id).count(), 5)
+        # Advanced dimensions are computed at ingest for the same participants
+        self.assertEqual(self.db.query(MatchAdvancedDimension).filter_by(summoner_id=self.summoner.id).count(), 5)
+        self.assertEqual(self.db.query(MatchAdvancedDimension).filter_by(summoner_id=teammate.id).count(), 5)
+
+        # Re-running the same page adds nothing
+        self.service.update_summoner_data(self.db, self.summoner)
+        self.assertEqual(self.db.query(MatchPerformance).count(), 10)
+
+    def test_insert_ignore_skips_existing_unique_keys(self):
+        insert_ignore(self.db, MatchDetail, [{"match_id": "KR_1", "raw": make_match("KR_1")}])
+        insert_ignore(self.db, MatchDetail, [
+            {"match_id": "KR_1", "raw": make_match("KR_1")},
+            {"match_id": "KR_2", "raw": make_match("KR_2")},
+        ])
+        self.db.commit()
+        self.assertEqual(self.db.query(MatchDetail).count(), 2)
+
+    def test_poll_deduplicates_matches_shared_between_summoners(self):
+        puuids = ("mock_puuid_123", "mock_puuid_456", "mock_puuid_789")
+        self.db.add_all([
+            Summoner(summoner_name="Zeus", puuid=puuids[1], summoner_id="s2", summoner_level=30),
+            Summoner(summoner_name="Oner", puuid=puuids[2], summoner_id="s3", summoner_level=30),
+        ])
+        self.db.commit()
+
+        shared_ids = [f"KR_{i}" for i in range(10)]
+        self.service.riot_client.get_match_ids.side_effect = (
+            lambda puuid, start=0, count=20, start_time=None: shared_ids[start:start + count]
+        )
+        self.service.riot_client.get_match_details.side_effect = lambda match_id: make_match(match_id, puuids=puuids)
+
+        self.service.poll_summoners()
+
+        fetched = [c.args[0] for c in self.service.riot_client.get_match_details.call_args_list]
+        self.assertEqual(sorted(fetched), sorted(shared_ids))
+        self.assertEqual(self.db.query(MatchPerformance).count(), 30)
+
+    def test_failed_fetch_releases_claim(self):
+        puuids = ("mock_puuid_123", "mock_puuid_456")
+        zeus = Summoner(summoner_name="Zeus", puuid=puuids[1], summoner_id="s2", summoner_level=30)
+        self.db.add(zeus)
+        self.db.commit()
+
+        shared_ids = [f"KR_{i}" for i in range(5)]
+        self.service.riot_client.get_match_ids.side_effect = (
+            lambda puuid, start=0, count=20, start_time=None: shared_ids[start:start + count]
+        )
+        attempts = []
+
+        def get_match_details(match_id):
+            attempts.append(match_id)
+            if match_id == "KR_3" and attempts.count("KR_3") == 1:
+                return None
+            return make_match(match_id, puuids=puuids)
+
+        self.service.riot_client.get_match_details.side_effect = get_match_details
+        claims = MatchClaims()
+        self.service.update_summoner_data(self.db, self.summoner, claims=claims)
+        self.service.update_summoner_data(self.db, zeus, claims=claims)
+
+        # Zeus's pipeline took over the match Faker's couldn't download, and saved it for both
+        self.assertEqual(sorted(attempts), sorted(shared_ids + ["KR_3"]))
+        self.assertEqual(self.db.query(MatchPerformance).count(), 10)
+
+    def test_failed_fetch_keeps_incremental_watermark(self):
+        self.service.riot_client.get_match_ids.return_value = ["KR_1"]
+        self.service.riot_client.get_match_details.side_effect = lambda match_id: make_match(match_id)
+        self.service.update_summoner_data(self.db, self.summoner)
+        state = self.db.query(SummonerIngestState).filter_by(summoner_id=self.summoner.id).one()
+        polled_at = state.last_polled_at
+
+        self.service.riot_client.get_match_ids.return_value = ["KR_2"]
+        self.service.riot_client.get_match_details.side_effect = lambda match_id: None
+        self.service.update_summoner_data_incremental(self.db, self.summoner)
+        self.db.refresh(state)
+        self.assertEqual(state.last_polled_at, polled_at)
+
+    def test_interrupted_backfill_resumes_from_cursor(self):
+        all_ids = [f"KR_{i}" for i in range(120)]
+        pages_requested = []
+
+        def get_match_ids(puuid, start=0, count=20, start_time=None):
+            pages_requested.append(start)
+            if start == 100 and len(pages_requested) == 3:
+                raise RuntimeError("worker killed")
+            return all_ids[start:start + count]
+
+        self.service.riot_client.get_match_ids.side_effect = get_match_ids
+        self.service.riot_client.get_match_details.side_effect = lambda match_id: make_match(match_id)
+
+        self.service.update_summoner_data(self.db, self.summoner)
+        state = self.db.query(SummonerIngestState).filter_by(summoner_id=self.summoner.id).one()
+        self.assertFalse(state.backfill_complete)
+        self.assertEqual(state.backfill_cursor, 100)
+
+        # The next poll continues the backfill instead of starting over
+        self.service.update_summoner_data_incremental(self.db, self.summoner)
+        self.assertEqual(pages_requested, [0, 50, 100, 100])
+        self.db.refresh(state)
+        self.assertTrue(state.backfill_complete)
+        self.assertEqual(state.backfill_cursor, 0)
+        self.assertIsNotNone(state.last_polled_at)
+        self.assertEqual(self.db.query(MatchPerformance).count(), 120)
+
+    def test_failed_listing_does_not_end_backfill(self):
+        all_ids = [f"KR_{i}" for i in range(120)]
+        failing = {"start": 50}
+
+        def get_match_ids(puuid, start=0, count=20, start_time=None):
+            # What RiotAPIClient returns for a 5xx, an expired key or too many 429s
+            if start == failing["start"]:
+                return None
+            return all_ids[start:start + count]
+
+        self.service.riot_client.get_match_ids.side_effect = get_match_ids
+        self.service.riot_client.get_match_details.side_effect = lambda match_id: make_match(match_id)
+
+        self.service.update_summoner_data(self.db, self.summoner)
+        state = self.db.query(SummonerIngestState).filter_by(summoner_id=self.summoner.id).one()
+        self.assertFalse(state.backfill_complete)
+        self.assertEqual(state.backfill_cursor, 50)
+        self.assertIsNone(state.last_polled_at)
+
+        failing["start"] = None
+        self.service.update_summoner_data_incremental(self.db, self.summoner)
+        self.db.refresh(state)
+        self.assertTrue(state.backfill_complete)
+        self.assertEqual(self.db.query(MatchPerformance).count(), 120)
+
+    def test_failed_download_does_not_end_backfill(self):
+        all_ids = [f"KR_{i}" for i in range(120)]
+        self.service.riot_client.get_match_ids.side_effect = (
+            lambda puuid, start=0, count=20, start_time=None: all_ids[start:start + count]
+        )
+        failing = {"KR_60"}
+        self.service.riot_client.get_match_details.side_effect = (
+            lambda match_id: None if match_id in failing else make_match(match_id)
+        )
+
+        self.service.update_summoner_data(self.db, self.summoner)
+        state = self.db.query(SummonerIngestState).filter_by(summoner_id=self.summoner.id).one()
+        self.assertFalse(state.backfill_complete)
+        # KR_60 is on the page starting at 50
+        self.assertEqual(state.backfill_cursor, 50)
+        self.assertEqual(self.db.query(MatchPerformance).count(), 119)
+
+        failing.clear()
+        self.service.update_summoner_data_incremental(self.db, self.summoner)
+        self.db.refresh(state)
+        self.assertTrue(state.backfill_complete)
+        self.assertEqual(self.db.query(MatchPerformance).count(), 120)
+
+    def test_failed_incremental_poll_keeps_watermark(self):
+        self.service.riot_client.get_match_ids.return_value = []
+        self.service.update_summoner_data(self.db, self.summoner)
+        state = self.db.query(SummonerIngestState).filter_by(summoner_id=self.summoner.id).one()
+        polled_at = state.last_polled_at
+
+        self.service.riot_client.get_match_ids.return_value = None
+        self.service.update_summoner_data_incremental(self.db, self.summoner)
+        self.db.refresh(state)
+        self.assertEqual(state.last_polled_at, polled_at)
+
+    def test_summoner_without_games_does_not_trigger_full_crawl(self):
+        self.service.riot_client.get_match_ids.return_value = []
+        self.service.update_summoner_data(self.db, self.summoner)
+        self.service.update_summoner_data_incremental(self.db, self.summoner)
+
+        calls = self.service.riot_client.get_match_ids.call_args_list
+        self.assertEqual(len(calls), 2)
+        self.assertIsNone(calls[0].kwargs.get("start_time"))
+        self.assertIsNotNone(calls[1].kwargs.get("start_time"))
+
+    def test_stored_local_times_are_migrated_to_utc(self):
+        self.service.riot_client.get_match_ids.return_value = ["KR_1"]
+        self.service.riot_client.get_match_details.side_effect = (
+            lambda match_id: make_match(match_id, game_creation=1700000000000)
+        )
+        self.service.update_summoner_data(self.db, self.summoner)
+        # What a host at UTC+9 stored before game_creation was UTC
+        local = datetime(2023, 11, 15, 7, 13, 20)
+        self.db.query(MatchPerformance).update({"game_creation": local})
+        self.db.query(SummonerIngestState).update({"last_game_creation": local})
+        self.db.commit()
+
+        self.assertEqual(migrate_game_creation_to_utc(self.engine, batch_size=1), {"matches": 1})
+        self.db.expire_all()
+        utc = datetime(2023, 11, 14, 22, 13, 20)
+        self.assertEqual(self.db.query(MatchPerformance.game_creation).scalar(), utc)
+        self.assertEqual(self.db.query(SummonerIngestState.last_game_creation).scalar(), utc)
+        # Recorded, so it never shifts UTC rows written afterwards
+        self.assertEqual(migrate_game_creation_to_utc(self.engine), {"skipped": True})
+
+    def test_poll_without_games_overlaps_the_last_one(self):
+        self.service.riot_client.get_match_ids.return_value = []
+        self.service.update_summoner_data(self.db, self.summoner)
+        state = self.db.query(SummonerIngestState).filter_by(summoner_id=self.summoner.id).one()
+
+        self.service.update_summoner_data_incremental(self.db, self.summoner)
+        start_time = self.service.riot_client.get_match_ids.call_args.kwargs["start_time"]
+        overlap = timedelta(minutes=Config.COLLECTOR_POLL_OVERLAP_MINUTES)
+        self.assertEqual(start_time, int(utc_timestamp(state.last_polled_at - overlap)))
+        self.assertGreaterEqual(overlap, timedelta(hours=1))
+
+    def test_incremental_uses_watermark(self):
+        self.service.riot_client.get_match_ids.return_value = ["KR_1"]
+        self.service.riot_client.get_match_details.side_effect = (
+            lambda match_id: make_match(match_id, game_creation=1700000000000)
+        )
+        self.service.update_summoner_data(self.db, self.summoner)
+        state = self.db.query(SummonerIngestState).filter_by(summoner_id=self.summoner.id).one()
+        self.assertEqual(state.last_match_id, "KR_1")
+
+        self.service.riot_client.get_match_ids.reset_mock()
+        self.service.riot_client.get_match_ids.return_value = []
+        self.service.update_summoner_data_incremental(self.db, self.summoner)
+        start_time = self.service.riot_client.get_match_ids.call_args.kwargs["start_time"]
+        self.assertEqual(start_time, 1700000000 + 1)
+
+    def test_watermark_does_not_depend_on_host_timezone(self):
+        original_tz = os.environ.get("TZ")
+        os.environ["TZ"] = "Asia/Seoul"
+        time.tzset()
+        try:
+            self.service.riot_client.get_match_ids.return_value = ["KR_1"]
+            self.service.riot_client.get_match_details.side_effect = (
+                lambda match_id: make_match(match_id, game_creation=1700000000000)
+            )
+            self.service.update_summoner_data(self.db, self.summoner)
+            state = self.db.query(SummonerIngestState).filter_by(summoner_id=self.summoner.id).one()
+            self.assertEqual(state.last_game_creation, datetime(2023, 11, 14, 22, 13, 20))
+
+            self.service.riot_client.get_match_ids.return_value = []
+            self.service.update_summoner_data_incremental(self.db, self.summoner)
+            start_time = self.service.riot_client.get_match_ids.call_args.kwargs["start_time"]
+            self.assertEqual(start_time, 1700000000 + 1)
+        finally:
+            if original_tz is None:
+                os.environ.pop("TZ", None)
+            else:
+                os.environ["TZ"] = original_tz
+            time.tzset()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,414 @@
+import random
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from backend.collector.backfill import backfill_team_index
+from backend.collector.collector_service import CollectorService
+from backend.core_api import duo_synergy
+from backend.core_api.duo_synergy import (
+    _get_duo_match_stats,
+    compute_duo_synergy,
+    compute_duo_synergy_matrix,
+    compute_style_synergy,
+    compute_style_synergy_matrix,
+    find_top_duo_partners,
+)
+from backend.core_api.main import app
+from backend.core_api.playstyle_tags import ADVANCED_DIMENSIONS_VERSION, DimensionScores
+from backend.shared.database import (
+    SessionLocal,
+    Summoner,
+    MatchPerformance,
+    MatchDetail,
+    MatchTeamMember,
+    SummonerRoleAggregate,
+    insert_ignore,
+)
+from backend.tests.helpers import make_detail
+
+
+def reference_duo_match_stats(db, s1, s2):
+    """Python intersection plus raw JSON parsing, as before the team index."""
+    by_id1 = {m.match_id: m for m in db.query(MatchPerformance).filter(MatchPerformance.summoner_id == s1.id)}
+    by_id2 = {m.match_id: m for m in db.query(MatchPerformance).filter(MatchPerformance.summoner_id == s2.id)}
+    duo = []
+    for match_id in set(by_id1) & set(by_id2):
+        db_match = db.query(MatchDetail).filter(MatchDetail.match_id == match_id).first()
+        if not db_match or not db_match.raw:
+            continue
+        participants = db_match.raw["info"]["participants"]
+        team1 = next((p["teamId"] for p in participants if p["puuid"] == s1.puuid), None)
+        team2 = next((p["teamId"] for p in participants if p["puuid"] == s2.puuid), None)
+        if team1 is None or team1 != team2:
+            continue
+        team_kills = sum(p["kills"] for p in participants if p["teamId"] == team1)
+        duo.append((by_id1[match_id], by_id2[match_id], team_kills))
+    return duo
+
+
+def as_comparable(duo):
+    return sorted((m1.match_id, m1.summoner_id, m2.summoner_id, team_kills) for m1, m2, team_kills in duo)
+
+
+class TestDuoMatchIndex(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.s1 = Summoner(summoner_name="Faker", puuid="p1", summoner_id="s1", summoner_level=30)
+        self.s2 = Summoner(summoner_name="Keria", puuid="p2", summoner_id="s2", summoner_level=30)
+        self.db.add_all([self.s1, self.s2])
+        self.db.commit()
+        self.registered = {s.puuid: (s.id, s.summoner_name) for s in (self.s1, self.s2)}
+
+        rng = random.Random(21)
+        self.details = []
+        for i in range(120):
+            puuids = [p for p in ("p1", "p2") if rng.random() < 0.8] + [f"x{i}_{k}" for k in range(4)]
+            detail = make_detail(f"KR_{i}", puuids, rng)
+            for p in detail["info"]["participants"]:
+                p["teamId"] = rng.choice([100, 200])
+            self.details.append(detail)
+
+    def tearDown(self):
+        self.db.close()
+
+    def ingest(self, details):
+        service = CollectorService()
+        try:
+            service._write_rows(
+                self.db,
+                [{"match_id": d["metadata"]["matchId"], "raw": d} for d in details],
+                [row for d in details for row in CollectorService._extract_match_rows(d, self.registered)],
+                [row for d in details for row in CollectorService._extract_dimension_rows(d, self.registered)],
+                [row for d in details for row in CollectorService._extract_team_rows(d, self.registered)],
+            )
+        finally:
+            service.db.close()
+
+    def test_index_matches_raw_json_reference(self):
+        self.ingest(self.details)
+        expected = as_comparable(reference_duo_match_stats(self.db, self.s1, self.s2))
+        self.assertTrue(expected)
+        self.assertEqual(as_comparable(_get_duo_match_stats(self.db, self.s1, self.s2)), expected)
+        self.assertEqual(
+            as_comparable(_get_duo_match_stats(self.db, self.s2, self.s1)),
+            as_comparable(reference_duo_match_stats(self.db, self.s2, self.s1)),
+        )
+
+    def test_single_query(self):
+        self.ingest(self.details)
+        self.db.refresh(self.s1)
+        self.db.refresh(self.s2)
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(self.engine, "before_cursor_execute", listener)
+        try:
+            _get_duo_match_stats(self.db, self.s1, self.s2)
+        finally:
+            event.remove(self.engine, "before_cursor_execute", listener)
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn("match_details", statements[0])
+
+    def test_backfill_for_matches_stored_before_the_index(self):
+        for detail in self.details:
+            self.db.add(MatchDetail(match_id=detail["metadata"]["matchId"], raw=detail))
+            insert_ignore(self.db, MatchPerformance, CollectorService._extract_match_rows(detail, self.registered))
+        self.db.commit()
+        self.assertEqual(_get_duo_match_stats(self.db, self.s1, self.s2), [])
+
+        backfill_team_index(self.db, batch_size=50)
+        self.assertEqual(self.db.query(MatchTeamMember).count(), self.db.query(MatchPerformance).count())
+        self.assertEqual(
+            as_comparable(_get_duo_match_stats(self.db, self.s1, self.s2)),
+            as_comparable(reference_duo_match_stats(self.db, self.s1, self.s2)),
+        )
+        result = compute_duo_synergy(self.db, self.s1, self.s2)
+        self.assertEqual(result["games_together"], len(reference_duo_match_stats(self.db, self.s1, self.s2)))
+
+    def test_index_is_built_lazily_for_matches_stored_before_it(self):
+        for detail in self.details:
+            self.db.add(MatchDetail(match_id=detail["metadata"]["matchId"], raw=detail))
+            insert_ignore(self.db, MatchPerformance, CollectorService._extract_match_rows(detail, self.registered))
+        self.db.commit()
+
+        expected = reference_duo_match_stats(self.db, self.s1, self.s2)
+        self.assertTrue(expected)
+        self.assertEqual(compute_duo_synergy(self.db, self.s1, self.s2)["games_together"], len(expected))
+        self.assertEqual(self.db.query(MatchTeamMember).count(), self.db.query(MatchPerformance).count())
+        self.assertEqual(compute_duo_synergy_matrix(self.db, [self.s1, self.s2])[0][1]["games_together"], len(expected))
+        self.assertEqual(find_top_duo_partners(self.db, self.s1, limit=1)[0][1]["games_together"], len(expected))
+
+
+class TestDuoSynergyMatrix(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.summoners = [
+            Summoner(summoner_name=f"Player{n}", puuid=f"p{n}", summoner_id=f"s{n}", summoner_level=30)
+            for n in range(5)
+        ]
+        self.db.add_all(self.summoners)
+        self.db.commit()
+        registered = {s.puuid: (s.id, s.summoner_name) for s in self.summoners}
+
+        rng = random.Random(13)
+        details = []
+        for i in range(80):
+            puuids = [s.puuid for s in self.summoners if rng.random() < 0.5] + ["x1", "x2"]
+            detail = make_detail(f"KR_{i}", puuids, rng)
+            for p in detail["info"]["participants"]:
+                p["teamId"] = rng.choice([100, 200])
+            details.append(detail)
+        service = CollectorService()
+        try:
+            service._write_rows(
+                self.db,
+                [{"match_id": d["metadata"]["matchId"], "raw": d} for d in details],
+                [row for d in details for row in CollectorService._extract_match_rows(d, registered)],
+                [row for d in details for row in CollectorService._extract_dimension_rows(d, registered)],
+                [row for d in details for row in CollectorService._extract_team_rows(d, registered)],
+            )
+        finally:
+            service.db.close()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_style_matrix_matches_pairwise(self):
+        rng = random.Random(2)
+        dims_list = [DimensionScores(**{f: rng.random() for f in DimensionScores.model_fields}) for _ in range(8)]
+        style, breakdown = compute_style_synergy_matrix(dims_list)
+        for i, d1 in enumerate(dims_list):
+            for j, d2 in enumerate(dims_list):
+                expected_style, expected_breakdown = compute_style_synergy(d1, d2)
+                self.assertAlmostEqual(style[i, j], expected_style, places=12)
+                for category, value in expected_breakdown.items():
+                    self.assertAlmostEqual(breakdown[category][i, j], value, places=12)
+
+    def test_matrix_matches_pairwise_synergy(self):
+        matrix = compute_duo_synergy_matrix(self.db, self.summoners)
+        for i, s1 in enumerate(self.summoners):
+            self.assertIsNone(matrix[i][i])
+            for j, s2 in enumerate(self.summoners):
+                if i == j:
+                    continue
+                expected = compute_duo_synergy(self.db, s1, s2)
+                actual = matrix[i][j]
+                for key in ("synergy_score", "games_together", "summoner1_games", "summoner2_games"):
+                    self.assertEqual(actual[key], expected[key], key)
+                for key in ("style_score", "performance_score"):
+                    self.assertAlmostEqual(actual[key], expected[key], places=12)
+        self.assertTrue(any(matrix[0][j]["games_together"] for j in range(1, 5)))
+
+    def test_endpoint(self):
+        client = TestClient(app)
+        names = [s.summoner_name for s in self.summoners]
+        response = client.post("/duo/synergy/matrix", json={"summoner_names": names})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["summoners"], names)
+        self.assertIsNone(body["matrix"][1][1])
+        self.assertEqual(body["matrix"][0][1]["summoner1"], names[0])
+        self.assertEqual(body["matrix"][1][0]["summoner1"], names[1])
+        self.assertEqual(body["matrix"][0][1]["synergy_score"], body["matrix"][1][0]["synergy_score"])
+
+        pair = client.get("/duo/synergy", params={"summoner1": names[0], "summoner2": names[2]}).json()
+        self.assertEqual(body["matrix"][0][2]["synergy_score"], pair["synergy_score"])
+        self.assertEqual(body["matrix"][0][2]["games_together"], pair["games_together"])
+
+        self.assertEqual(client.post("/duo/synergy/matrix", json={"summoner_names": names[:1]}).status_code, 400)
+        self.assertEqual(client.post("/duo/synergy/matrix", json={"summoner_names": [f"n{i}" for i in range(11)]}).status_code, 400)
+        self.assertEqual(client.post("/duo/synergy/matrix", json={"summoner_names": names[:2] + ["Nobody"]}).status_code, 404)
+
+
+def ingest_details(db, summoners, details):
+    registered = {s.puuid: (s.id, s.summoner_name) for s in summoners}
+    service = CollectorService()
+    try:
+        service._write_rows(
+            db,
+            [{"match_id": d["metadata"]["matchId"], "raw": d} for d in details],
+            [row for d in details for row in CollectorService._extract_match_rows(d, registered)],
+            [row for d in details for row in CollectorService._extract_dimension_rows(d, registered)],
+            [row for d in details for row in CollectorService._extract_team_rows(d, registered)],
+        )
+    finally:
+        service.db.close()
+
+
+def total_of(result):
+    return 0.6 * result["style_score"] + 0.4 * result["performance_score"]
+
+
+class TestDuoPartners(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.summoners = [
+            Summoner(summoner_name=f"Player{n}", puuid=f"p{n}", summoner_id=f"s{n}", summoner_level=30)
+            for n in range(30)
+        ]
+        self.db.add_all(self.summoners)
+        self.db.commit()
+
+        rng = random.Random(17)
+        details = []
+        for i in range(150):
+            # Player0 plays with a few regulars so some partners have many shared games
+            regulars = [s.puuid for s in self.summoners[1:6] if rng.random() < 0.4]
+            others = [s.puuid for s in self.summoners[6:] if rng.random() < 0.05]
+            detail = make_detail(f"KR_{i}", ["p0"] + regulars + others + ["x1", "x2"], rng)
+            for p in detail["info"]["participants"]:
+                p["teamId"] = rng.choice([100, 200])
+            details.append(detail)
+        ingest_details(self.db, self.summoners, details)
+        # Player29 never played a stored match
+        self.db.query(MatchPerformance).filter(MatchPerformance.summoner_id == self.summoners[29].id).delete()
+        self.db.query(MatchTeamMember).filter(MatchTeamMember.summoner_id == self.summoners[29].id).delete()
+        self.db.query(SummonerRoleAggregate).filter(SummonerRoleAggregate.summoner_id == self.summoners[29].id).delete()
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def brute_force(self, summoner):
+        results = [(other.id, compute_duo_synergy(self.db, summoner, other)) for other in self.summoners if other.id != summoner.id]
+        results.sort(key=lambda item: (-total_of(item[1]), -item[1]["games_together"], item[0]))
+        return results
+
+    def test_matches_brute_force(self):
+        for summoner in (self.summoners[0], self.summoners[3], self.summoners[29]):
+            expected = self.brute_force(summoner)
+            for limit in (1, 5, 29, 50):
+                top = find_top_duo_partners(self.db, summoner, limit=limit)
+                self.assertEqual(len(top), min(limit, len(expected)))
+                by_id = dict(expected)
+                for (partner_id, actual), (_, reference) in zip(top, expected):
+                    self.assertAlmostEqual(total_of(actual), total_of(reference), places=12)
+                    for key in ("synergy_score", "games_together", "summoner1_games", "summoner2_games"):
+                        self.assertEqual(actual[key], by_id[partner_id][key], key)
+                    self.assertAlmostEqual(actual["style_score"], by_id[partner_id]["style_score"], places=12)
+        self.assertTrue(any(result["games_together"] for _, result in find_top_duo_partners(self.db, self.summoners[0], 29)))
+
+    def test_prunes_partners_that_cannot_reach_the_top(self):
+        calls = []
+        original = duo_synergy.compute_duo_performance
+
+        def counting(duo_matches):
+            calls.append(len(duo_matches))
+            return original(duo_matches)
+
+        with mock.patch.object(duo_synergy, "compute_duo_performance", counting):
+            find_top_duo_partners(self.db, self.summoners[0], limit=1)
+        self.assertLess(len(calls), len(self.summoners) - 1)
+
+    def test_cache_follows_new_matches(self):
+        find_top_duo_partners(self.db, self.summoners[0], limit=3)
+        cached = duo_synergy._population
+        find_top_duo_partners(self.db, self.summoners[0], limit=3)
+        self.assertIs(duo_synergy._population, cached)
+
+        rng = random.Random(4)
+        detail = make_detail("KR_new", ["p0", "p7", "x1"], rng)
+        for p in detail["info"]["participants"]:
+            p["teamId"] = 100
+        ingest_details(self.db, self.summoners, [detail])
+        self.db.expire_all()
+        top = dict(find_top_duo_partners(self.db, self.summoners[0], limit=29))
+        self.assertIsNot(duo_synergy._population, cached)
+        self.assertEqual(top[self.summoners[7].id], compute_duo_synergy(self.db, self.summoners[0], self.summoners[7]))
+
+    def test_endpoint(self):
+        client = TestClient(app)
+        response = client.get("/summoners/Player0/duo-partners", params={"limit": 3})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["summoner"], "Player0")
+        self.assertEqual(len(body["partners"]), 3)
+        self.assertTrue(all(p["summoner1"] == "Player0" for p in body["partners"]))
+        best = body["partners"][0]
+        pair = client.get("/duo/synergy", params={"summoner1": "Player0", "summoner2": best["summoner2"]}).json()
+        self.assertEqual(best["synergy_score"], pair["synergy_score"])
+
+        self.assertEqual(client.get("/summoners/Nobody/duo-partners").status_code, 404)
+        self.assertEqual(client.get("/summoners/Player0/duo-partners", params={"limit": 0}).status_code, 400)
+        self.assertEqual(client.get("/summoners/Player0/duo-partners", params={"limit": 51}).status_code, 400)
+
+
+class TestDuoPartnersScale(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        n = 3000
+        self.db.bulk_insert_mappings(Summoner, [
+            {"id": i + 1, "summoner_name": f"Player{i}", "puuid": f"p{i}", "summoner_id": f"s{i}", "summoner_level": 30}
+            for i in range(n)
+        ])
+        rng = random.Random(8)
+        now = datetime.utcnow()
+        aggregates = []
+        for i in range(n):
+            games = rng.randint(1, 200)
+            row = {
+                "summoner_id": i + 1,
+                "role": "ALL",
+                "games": games,
+                "wins": rng.randint(0, games),
+                "kills": rng.randint(0, 10 * games),
+                "deaths": rng.randint(0, 8 * games),
+                "assists": rng.randint(0, 12 * games),
+                "sum_gold_per_min": rng.uniform(250, 550) * games,
+                "sum_vision_score": rng.randint(5, 90) * games,
+                "sum_minions_killed": rng.randint(0, 300) * games,
+                "sum_damage_to_champions": rng.randint(3000, 60000) * games,
+                "adv_games": games,
+                "adv_version": ADVANCED_DIMENSIONS_VERSION,
+                "updated_at": now,
+            }
+            for column in ("early_aggro", "late_carry", "lane_lead", "objective_focus", "teamfight",
+                           "roam", "split_push", "farm_focus", "vision_control"):
+                row["sum_" + column] = rng.random() * games
+            aggregates.append(row)
+        self.db.bulk_insert_mappings(SummonerRoleAggregate, aggregates)
+        # Summoner 1 shared 25 games with each of 100 partners
+        team_rows, performance_rows = [], []
+        for m in range(25):
+            for partner in range(2, 102):
+                match_id = f"KR_{m}_{partner}"
+                for summoner_id in (1, partner):
+                    team_rows.append({"summoner_id": summoner_id, "match_id": match_id, "team_id": 100, "team_kills": 20})
+                    performance_rows.append({
+                        "summoner_id": summoner_id, "match_id": match_id, "win": rng.random() < 0.5,
+                        "kills": rng.randint(0, 10), "deaths": rng.randint(0, 8), "assists": rng.randint(0, 12),
+                    })
+        insert_ignore(self.db, MatchTeamMember, team_rows)
+        insert_ignore(self.db, MatchPerformance, performance_rows)
+        self.db.commit()
+        self.summoner = self.db.get(Summoner, 1)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_thousands_of_summoners(self):
+        find_top_duo_partners(self.db, self.summoner, limit=10)
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, "before_cursor_execute", count)
+        self.addCleanup(event.remove, self.engine, "before_cursor_execute", count)
+        with mock.patch.object(duo_synergy, "_get_partner_duo_match_stats", wraps=duo_synergy._get_partner_duo_match_stats) as load, \
+                mock.patch.object(duo_synergy, "compute_duo_performance", wraps=duo_synergy.compute_duo_performance) as score:
+            top = find_top_duo_partners(self.db, self.summoner, limit=10)
+        self.assertEqual(len(top), 10)
+        # Only partners whose bound can reach the top 10 are scored, and only those with shared
+        # games have their duo games loaded, in one call
+        self.assertLess(score.call_count, 300)
+        load.assert_called_once()
+        self.assertTrue(set(load.call_args.args[2]) <= set(range(2, 102)))
+        # A fixed number of queries, however many summoners are registered
+        self.assertLessEqual(len(statements), 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Query
+
+from backend.shared.leaderboard import TIMEFRAMES, refresh_leaderboard, read_leaderboard
+from backend.core_api.main import app, _compute_role_scores_for_summoner
+from backend.shared.role_scores import ROLE_MAPPINGS, volume_weight
+from backend.shared.database import SessionLocal, Summoner, MatchPerformance, LeaderboardEntryRow
+
+
+def reference_leaderboard(db, timeframe, now):
+    """Per-summoner scan the materialized table replaced."""
+    window, target_games = TIMEFRAMES[timeframe]
+    since = now - window
+    entries = []
+    for summoner in db.query(Summoner).all():
+        candidates = []
+        for s in _compute_role_scores_for_summoner(summoner, db, since=since):
+            games = db.query(MatchPerformance).filter(
+                MatchPerformance.summoner_id == summoner.id,
+                MatchPerformance.game_creation >= since,
+                MatchPerformance.lane.in_(ROLE_MAPPINGS[s.role]),
+            ).count()
+            candidates.append((s.role, round(s.score * volume_weight(games, target_games), 1), games))
+        if candidates:
+            role, score, games = max(candidates, key=lambda x: x[1])
+            entries.append((summoner.summoner_name, role, score, games, summoner.id))
+    entries.sort(key=lambda e: (-e[2], -e[3], e[4]))
+    return [e[:4] for e in entries]
+
+
+class TestLeaderboard(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.now = datetime.utcnow()
+
+        rng = random.Random(11)
+        for n in range(8):
+            summoner = Summoner(summoner_name=f"Player{n}", puuid=f"p{n}", summoner_id=f"s{n}", summoner_level=30)
+            self.db.add(summoner)
+            self.db.commit()
+            for i in range(rng.randint(0, 40)):
+                kills, deaths, assists = rng.randint(0, 15), rng.randint(0, 12), rng.randint(0, 20)
+                self.db.add(MatchPerformance(
+                    summoner_id=summoner.id,
+                    match_id=f"KR_{n}_{i}",
+                    game_creation=self.now - timedelta(hours=rng.randint(0, 24 * 60)),
+                    lane=rng.choice(["TOP", "JUNGLE", "MID", "BOTTOM", "UTILITY"]),
+                    win=rng.random() < 0.5,
+                    kills=kills,
+                    deaths=deaths,
+                    assists=assists,
+                    kda=(kills + assists) / max(1, deaths),
+                    gold_per_min=rng.uniform(250, 550),
+                    vision_score=rng.randint(5, 90),
+                ))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def materialized(self, timeframe):
+        return [
+            (summoner.summoner_name, entry.best_role, entry.best_score, entry.games)
+            for entry, summoner in read_leaderboard(self.db, timeframe)
+        ]
+
+    def test_matches_reference(self):
+        for timeframe in TIMEFRAMES:
+            refresh_leaderboard(self.db, timeframe, now=self.now)
+            self.assertEqual(self.materialized(timeframe), reference_leaderboard(self.db, timeframe, self.now))
+
+    def test_incremental_refresh_only_touches_given_summoners(self):
+        refresh_leaderboard(self.db, "monthly", now=self.now)
+        summoner = self.db.query(Summoner).filter(Summoner.summoner_name == "Player0").first()
+        other_rows = {
+            row.summoner_id: row.computed_at
+            for row in self.db.query(LeaderboardEntryRow).filter(LeaderboardEntryRow.summoner_id != summoner.id)
+        }
+
+        for i in range(10):
+            self.db.add(MatchPerformance(
+                summoner_id=summoner.id, match_id=f"NEW_{i}", game_creation=self.now,
+                lane="TOP", win=True, kills=10, deaths=1, assists=10, kda=20.0,
+                gold_per_min=600, vision_score=40,
+            ))
+        self.db.commit()
+        later = self.now + timedelta(minutes=1)
+        refresh_leaderboard(self.db, "monthly", summoner_ids=[summoner.id], now=later)
+
+        self.assertEqual(self.materialized("monthly"), reference_leaderboard(self.db, "monthly", self.now))
+        for row in self.db.query(LeaderboardEntryRow).filter(LeaderboardEntryRow.summoner_id != summoner.id):
+            self.assertEqual(row.computed_at, other_rows[row.summoner_id])
+
+    def test_concurrent_refreshes_overwrite_each_other(self):
+        refresh_leaderboard(self.db, "weekly", now=self.now - timedelta(days=3))
+        # Another refresh committed its rows after our delete ran: ours must still go in
+        with mock.patch.object(Query, "delete", return_value=0):
+            refresh_leaderboard(self.db, "weekly", now=self.now)
+        self.assertLessEqual(set(reference_leaderboard(self.db, "weekly", self.now)), set(self.materialized("weekly")))
+
+        # Summoners that dropped out of the window are removed, the rest overwritten
+        refresh_leaderboard(self.db, "weekly", now=self.now)
+        self.assertEqual(self.materialized("weekly"), reference_leaderboard(self.db, "weekly", self.now))
+
+    def test_endpoint_builds_on_empty_table(self):
+        client = TestClient(app)
+        response = client.get("/leaderboard", params={"timeframe": "weekly"})
+        self.assertEqual(response.status_code, 200)
+        expected = reference_leaderboard(self.db, "weekly", datetime.utcnow())
+        self.assertEqual(
+            [(e["name"], e["best_role"], e["best_score"], e["games"]) for e in response.json()],
+            expected,
+        )
+        self.assertEqual(client.get("/leaderboard", params={"timeframe": "hourly"}).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import random
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from backend.core_api import main
+from backend.core_api.match_detail import MATCH_DETAIL_RESPONSE_VERSION, etag_matches
+from backend.shared.cache import ResponseCache
+from backend.shared.database import SessionLocal, MatchDetail, MatchDetailResponseRow
+from backend.tests.helpers import make_full_match
+
+
+class TestMatchDetailResponses(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.detail = make_full_match("KR_1", random.Random(4))
+        self.db.add(MatchDetail(match_id="KR_1", raw=self.detail))
+        self.db.commit()
+        self.cache_patch = mock.patch.object(main, "response_cache", ResponseCache(enabled=False))
+        self.cache_patch.start()
+        self.client = TestClient(main.app)
+
+    def tearDown(self):
+        self.cache_patch.stop()
+        self.db.close()
+
+    def test_built_once_then_served_from_storage(self):
+        first = self.client.get("/matches/KR_1")
+        self.assertEqual(first.status_code, 200)
+        body = first.json()
+        participants = self.detail["info"]["participants"]
+        self.assertEqual(body["blue_total_kills"], sum(p["kills"] for p in participants[:5]))
+        self.assertEqual(len(body["blue_team"]) + len(body["red_team"]), 10)
+
+        stored = self.db.query(MatchDetailResponseRow).one()
+        self.assertEqual(stored.version, MATCH_DETAIL_RESPONSE_VERSION)
+        self.assertEqual(bytes(stored.body), first.content)
+
+        with mock.patch.object(main, "_match_detail_response", side_effect=AssertionError("rebuilt")):
+            again = self.client.get("/matches/KR_1")
+        self.assertEqual(again.content, first.content)
+        self.assertEqual(again.headers["ETag"], first.headers["ETag"])
+
+    def test_conditional_requests(self):
+        first = self.client.get("/matches/KR_1")
+        etag = first.headers["ETag"]
+        self.assertTrue(etag.startswith('"') and etag.endswith('"'))
+        self.assertIn("immutable", first.headers["Cache-Control"])
+
+        for header in (etag, f'"other", {etag}', f"W/{etag}", "*"):
+            response = self.client.get("/matches/KR_1", headers={"If-None-Match": header})
+            self.assertEqual(response.status_code, 304, header)
+            self.assertEqual(response.content, b"")
+            self.assertEqual(response.headers["ETag"], etag)
+
+        response = self.client.get("/matches/KR_1", headers={"If-None-Match": '"other"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, first.content)
+
+    def test_outdated_rows_are_rebuilt(self):
+        self.db.add(MatchDetailResponseRow(match_id="KR_1", version=MATCH_DETAIL_RESPONSE_VERSION - 1, body=b"{}"))
+        self.db.commit()
+        response = self.client.get("/matches/KR_1")
+        self.assertEqual(response.json()["match_id"], "KR_1")
+        self.db.expire_all()
+        stored = self.db.query(MatchDetailResponseRow).one()
+        self.assertEqual(stored.version, MATCH_DETAIL_RESPONSE_VERSION)
+        self.assertEqual(bytes(stored.body), response.content)
+
+    def test_unknown_match(self):
+        self.assertEqual(self.client.get("/matches/KR_404").status_code, 404)
+        self.assertEqual(self.db.query(MatchDetailResponseRow).count(), 0)
+
+    def test_etag_matching(self):
+        self.assertFalse(etag_matches(None, '"a"'))
+        self.assertFalse(etag_matches('"ab"', '"a"'))
+        self.assertTrue(etag_matches(' "b" ,W/"a"', '"a"'))
+
+
+if __name__ == '__main__':
+    unittest.main()
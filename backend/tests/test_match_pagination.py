@@ -0,0 +1,108 @@
+import unittest
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from backend.core_api import main
+from backend.shared.database import SessionLocal, Summoner, MatchPerformance, insert_ignore
+from backend.tests.helpers import performance_row as index_row, query_plan
+
+
+def performance_row(summoner_id, match_id, hours_ago):
+    return {
+        **index_row(summoner_id, match_id, hours_ago),
+        "role": "SOLO",
+        "champion_name": "Ahri",
+        "total_minions_killed": 200,
+        "total_damage_dealt_to_champions": 20000,
+    }
+
+
+class TestMatchPagination(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.summoner = Summoner(summoner_name="Faker", puuid="p1", summoner_id="s1", summoner_level=30)
+        self.db.add(self.summoner)
+        self.db.commit()
+        rows = [performance_row(self.summoner.id, f"KR_{i}", i) for i in range(40)]
+        # Matches created at the same time must still land on exactly one page
+        for i in range(5):
+            rows.append(performance_row(self.summoner.id, f"KR_tie_{i}", 10))
+        insert_ignore(self.db, MatchPerformance, rows)
+        self.db.commit()
+        self.client = TestClient(main.app)
+
+    def tearDown(self):
+        self.db.close()
+
+    def page(self, **params):
+        response = self.client.get("/summoners/Faker/matches", params=params)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    def expected_order(self):
+        return [
+            row.match_id for row in self.db.query(MatchPerformance)
+            .order_by(MatchPerformance.game_creation.desc(), MatchPerformance.id.desc())
+        ]
+
+    def test_cursor_walks_every_match_once(self):
+        seen = []
+        page = self.page(limit=7)
+        while True:
+            seen.extend(match["match_id"] for match in page["matches"])
+            if not page["has_more"]:
+                self.assertIsNone(page["next_cursor"])
+                break
+            page = self.page(limit=7, cursor=page["next_cursor"])
+        self.assertEqual(seen, self.expected_order())
+
+    def test_new_matches_do_not_shift_pages(self):
+        first = self.page(limit=10)
+        insert_ignore(self.db, MatchPerformance, [
+            {**performance_row(self.summoner.id, f"KR_new_{i}", 0), "game_creation": datetime(2025, 3, 2) + timedelta(minutes=i)}
+            for i in range(3)
+        ])
+        self.db.commit()
+
+        by_cursor = self.page(limit=10, cursor=first["next_cursor"])
+        by_offset = self.page(limit=10, offset=10)
+        order = [m for m in self.expected_order() if not m.startswith("KR_new")]
+        self.assertEqual([m["match_id"] for m in by_cursor["matches"]], order[10:20])
+        # The offset page repeats the 3 matches that were pushed down
+        self.assertEqual([m["match_id"] for m in by_offset["matches"]][:3], order[7:10])
+
+    def test_offset_is_still_supported(self):
+        page = self.page(limit=5, offset=40)
+        self.assertEqual([m["match_id"] for m in page["matches"]], self.expected_order()[40:45])
+        self.assertFalse(page["has_more"])
+
+    def test_bad_requests(self):
+        response = self.client.get("/summoners/Faker/matches", params={"cursor": "not a cursor"})
+        self.assertEqual(response.status_code, 400)
+        cursor = self.page(limit=5)["next_cursor"]
+        response = self.client.get("/summoners/Faker/matches", params={"cursor": cursor, "offset": 5})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_query_seeks_on_index(self):
+        cursor = self.page(limit=5)["next_cursor"]
+        game_creation, match_pk = main._decode_match_cursor(cursor)
+        query = (
+            self.db.query(MatchPerformance)
+            .filter(
+                MatchPerformance.summoner_id == self.summoner.id,
+                MatchPerformance.game_creation <= game_creation,
+                (MatchPerformance.game_creation < game_creation)
+                | ((MatchPerformance.game_creation == game_creation) & (MatchPerformance.id < match_pk)),
+            )
+            .order_by(MatchPerformance.game_creation.desc(), MatchPerformance.id.desc())
+            .limit(6)
+        )
+        plan = query_plan(self.db, query)
+        self.assertIn("ix_match_performances_summoner_created", plan)
+        self.assertIn("game_creation<?", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
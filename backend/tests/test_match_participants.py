@@ -0,0 +1,194 @@
+import random
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+
+from backend.collector.backfill import backfill_participants
+from backend.collector.collector_service import CollectorService
+from backend.collector.data_processor import DataProcessor
+from backend.collector.pipeline import IngestPipeline
+from backend.core_api.main import app, get_collector_service
+from backend.shared.database import (
+    SessionLocal,
+    Summoner,
+    MatchDetail,
+    MatchParticipant,
+    MatchPerformance,
+    MatchTeamMember,
+    SummonerIngestState,
+    SummonerRoleAggregate,
+)
+from backend.tests.helpers import make_detail, make_full_match
+
+
+class TestExtractParticipants(unittest.TestCase):
+    def test_all_participants_are_extracted(self):
+        rng = random.Random(1)
+        detail = make_full_match("KR_1", rng)
+        del detail["info"]["participants"][3]["challenges"]
+        rows = DataProcessor.extract_participants(detail)
+
+        self.assertEqual(len(rows), 10)
+        self.assertEqual([row["participant_id"] for row in rows], list(range(1, 11)))
+        self.assertEqual([row["team_id"] for row in rows], [100] * 5 + [200] * 5)
+        for row, p in zip(rows, detail["info"]["participants"]):
+            self.assertEqual(row["puuid"], p["puuid"])
+            self.assertEqual(row["kills"], p["kills"])
+            self.assertEqual(row["total_minions_killed"], p["totalMinionsKilled"] + p["neutralMinionsKilled"])
+            self.assertEqual(row["game_duration"], 1800)
+        self.assertEqual(rows[0]["kill_participation"], detail["info"]["participants"][0]["challenges"]["killParticipation"])
+        self.assertIsNone(rows[3]["kill_participation"])
+        self.assertIsNone(rows[3]["solo_kills"])
+
+
+class TestMatchParticipants(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.summoner = Summoner(summoner_name="Faker", puuid="p1", summoner_id="s1", summoner_level=30)
+        self.db.add(self.summoner)
+        self.db.commit()
+
+        rng = random.Random(5)
+        self.details = {
+            f"KR_{i}": make_full_match(f"KR_{i}", rng, ["p1"] + [f"KR_{i}_x{k}" for k in range(9)])
+            for i in range(30)
+        }
+        self.collector = CollectorService()
+        self.collector.riot_client = MagicMock()
+
+        def get_match_ids(puuid, start=0, count=20, start_time=None):
+            return list(self.details)[start:start + count]
+
+        def get_match_details(match_id):
+            time.sleep(0.001)
+            return self.details[match_id]
+
+        self.collector.riot_client.get_match_ids.side_effect = get_match_ids
+        self.collector.riot_client.get_match_details.side_effect = get_match_details
+
+    def tearDown(self):
+        self.db.close()
+        self.collector.db.close()
+
+    def test_ingest_writes_every_participant(self):
+        # KR_0 is already stored (from before the participant table): the crawl doesn't re-extract it
+        self.db.add(MatchDetail(match_id="KR_0", raw=self.details["KR_0"]))
+        self.db.commit()
+
+        IngestPipeline(self.collector, fetch_workers=4, queue_size=8, batch_size=10).run(self.db, self.summoner)
+        self.assertEqual(self.db.query(MatchParticipant).count(), 29 * 10)
+        self.assertEqual(self.db.query(MatchParticipant).filter(MatchParticipant.match_id == "KR_0").count(), 0)
+
+        # The backfill covers the rest and is idempotent
+        self.assertEqual(backfill_participants(self.db, batch_size=7), 30 * 10)
+        backfill_participants(self.db)
+        self.assertEqual(self.db.query(MatchParticipant).count(), 30 * 10)
+
+        # Participant rows are enough for SQL-only analytics such as team kill totals
+        team_kills = dict(
+            ((match_id, team_id), kills)
+            for match_id, team_id, kills in self.db.query(
+                MatchParticipant.match_id, MatchParticipant.team_id, func.sum(MatchParticipant.kills)
+            ).group_by(MatchParticipant.match_id, MatchParticipant.team_id)
+        )
+        members = self.db.query(MatchTeamMember).filter(MatchTeamMember.summoner_id == self.summoner.id).all()
+        self.assertEqual(len(members), 30)
+        for member in members:
+            self.assertEqual(team_kills[(member.match_id, member.team_id)], member.team_kills)
+
+        history = (
+            self.db.query(MatchParticipant)
+            .filter(MatchParticipant.puuid == "p1")
+            .order_by(MatchParticipant.game_creation.desc())
+            .all()
+        )
+        self.assertEqual(len(history), 30)
+
+
+class TestStoredMatchBackfill(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.teammate = Summoner(summoner_name="Faker", puuid="p1", summoner_id="s1", summoner_level=30)
+        self.db.add(self.teammate)
+        self.db.commit()
+
+        # Faker's matches are stored; "p2" played 12 of them and isn't registered yet
+        rng = random.Random(11)
+        details = []
+        for i in range(20):
+            others = ["p2"] if i < 12 else []
+            puuids = ["p1"] + others + [f"KR_{i}_x{k}" for k in range(9 - len(others))]
+            details.append(make_full_match(f"KR_{i}", rng, puuids))
+        registered = {"p1": (self.teammate.id, self.teammate.summoner_name)}
+        service = CollectorService()
+        try:
+            service._write_rows(
+                self.db,
+                [{"match_id": d["metadata"]["matchId"], "raw": d} for d in details],
+                [row for d in details for row in CollectorService._extract_match_rows(d, registered)],
+                [row for d in details for row in CollectorService._extract_dimension_rows(d, registered)],
+                [row for d in details for row in CollectorService._extract_team_rows(d, registered)],
+                [row for d in details for row in CollectorService._extract_participant_rows(d)],
+            )
+        finally:
+            service.db.close()
+
+        self.collector = CollectorService()
+        self.collector.riot_client = MagicMock()
+        self.collector.riot_client.get_summoner_by_name.return_value = {
+            "puuid": "p2", "name": "Keria", "id": "s2", "summonerLevel": 40,
+        }
+
+    def tearDown(self):
+        self.db.close()
+        self.collector.db.close()
+        app.dependency_overrides.clear()
+
+    def test_backfill_uses_only_stored_matches(self):
+        summoner = Summoner(summoner_name="Keria", puuid="p2", summoner_id="s2", summoner_level=40)
+        self.db.add(summoner)
+        self.db.commit()
+
+        self.assertEqual(self.collector.backfill_from_stored_matches(self.db, summoner, chunk_size=5), 12)
+        self.collector.riot_client.get_match_details.assert_not_called()
+        rows = self.db.query(MatchPerformance).filter(MatchPerformance.summoner_id == summoner.id).all()
+        self.assertEqual(sorted(row.match_id for row in rows), sorted(f"KR_{i}" for i in range(12)))
+        self.assertEqual(
+            self.db.query(MatchTeamMember).filter(MatchTeamMember.summoner_id == summoner.id).count(), 12
+        )
+        aggregate = (
+            self.db.query(SummonerRoleAggregate)
+            .filter(SummonerRoleAggregate.summoner_id == summoner.id, SummonerRoleAggregate.role == "ALL")
+            .one()
+        )
+        self.assertEqual(aggregate.games, 12)
+
+        # The Riot crawl still has to run: the ingest state is not marked as a finished backfill
+        state = self.db.query(SummonerIngestState).filter(SummonerIngestState.summoner_id == summoner.id).one()
+        self.assertFalse(state.backfill_complete)
+
+        # Running it again finds nothing new
+        self.assertEqual(self.collector.backfill_from_stored_matches(self.db, summoner), 0)
+
+    def test_registration_is_usable_before_the_crawl(self):
+        app.dependency_overrides[get_collector_service] = lambda: self.collector
+        client = TestClient(app)
+        with patch("backend.core_api.main.collect_summoner_data") as task:
+            response = client.post("/summoners/", json={"name": "Keria"})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["name"], "Keria")
+        self.assertEqual(body["stored_matches_loaded"], 12)
+        task.delay.assert_called_once_with(body["id"])
+        self.collector.riot_client.get_match_details.assert_not_called()
+
+        scores = client.get("/summoners/Keria/scores")
+        self.assertEqual(scores.status_code, 200)
+        self.assertTrue(scores.json())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+from datetime import datetime
+
+from sqlalchemy import Column, MetaData, Table, func, inspect
+
+from backend.collector.collector_service import CollectorService
+from backend.shared.role_scores import aggregate_role_totals
+from backend.shared.database import (
+    SessionLocal,
+    Summoner,
+    MatchPerformance,
+    insert_ignore,
+)
+from backend.shared.migrations import migrate_match_performance_indexes
+from backend.tests.helpers import performance_row, query_plan
+
+
+class TestMatchPerformanceIndexes(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.summoner = Summoner(summoner_name="Faker", puuid="p1", summoner_id="s1", summoner_level=30)
+        self.db.add(self.summoner)
+        self.db.commit()
+        lanes = ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"]
+        insert_ignore(self.db, MatchPerformance, [
+            performance_row(self.summoner.id, f"KR_{i}", i, lanes[i % 5]) for i in range(50)
+        ])
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_unique_key_skips_duplicates(self):
+        insert_ignore(self.db, MatchPerformance, [performance_row(self.summoner.id, "KR_0", 0)])
+        self.db.commit()
+        self.assertEqual(self.db.query(MatchPerformance).count(), 50)
+
+    def test_write_rows_skips_repeats_within_a_batch(self):
+        rows = [performance_row(self.summoner.id, "KR_new", 0), performance_row(self.summoner.id, "KR_new", 0)]
+        service = CollectorService()
+        try:
+            written = service._write_rows(self.db, [], rows)
+        finally:
+            service.db.close()
+        self.assertEqual(len(written), 1)
+        self.assertEqual(self.db.query(MatchPerformance).count(), 51)
+
+    def test_fresh_schema_needs_no_migration(self):
+        self.assertEqual(migrate_match_performance_indexes(self.engine), {"duplicates_removed": 0, "created": []})
+
+    def test_history_query_uses_summoner_created_index(self):
+        plan = query_plan(
+            self.db,
+            self.db.query(MatchPerformance)
+            .filter(MatchPerformance.summoner_id == self.summoner.id)
+            .order_by(MatchPerformance.game_creation.desc()),
+        )
+        self.assertIn("ix_match_performances_summoner_created", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_time_window_query_uses_summoner_created_index(self):
+        plan = query_plan(
+            self.db,
+            self.db.query(func.count(MatchPerformance.id)).filter(
+                MatchPerformance.summoner_id == self.summoner.id,
+                MatchPerformance.game_creation >= datetime(2025, 2, 27),
+            ),
+        )
+        self.assertIn("ix_match_performances_summoner_created", plan)
+        self.assertIn("game_creation>?", plan)
+
+    def test_lane_query_uses_summoner_lane_created_index(self):
+        plan = query_plan(
+            self.db,
+            self.db.query(MatchPerformance).filter(
+                MatchPerformance.summoner_id == self.summoner.id,
+                MatchPerformance.lane == "MIDDLE",
+                MatchPerformance.game_creation >= datetime(2025, 2, 27),
+            ),
+        )
+        self.assertIn("ix_match_performances_summoner_lane_created", plan)
+
+    def test_role_totals_avoid_full_scan(self):
+        # Same filters as aggregate_role_totals with summoner ids and a time window
+        since = datetime(2025, 2, 27)
+        plan = query_plan(
+            self.db,
+            self.db.query(MatchPerformance.summoner_id, MatchPerformance.lane, func.count(MatchPerformance.id))
+            .filter(
+                MatchPerformance.lane.in_(["TOP", "MIDDLE"]),
+                MatchPerformance.summoner_id.in_([self.summoner.id]),
+                MatchPerformance.game_creation >= since,
+            )
+            .group_by(MatchPerformance.summoner_id, MatchPerformance.lane),
+        )
+        self.assertIn("ix_match_performances_summoner_lane_created", plan)
+        self.assertTrue(aggregate_role_totals(self.db, summoner_ids=[self.summoner.id], since=since))
+
+
+class TestMatchPerformanceMigration(unittest.TestCase):
+    def setUp(self):
+        # Recreate match_performances the way older databases have it: no composite indexes, no unique key
+        MatchPerformance.__table__.drop(bind=self.engine)
+        legacy = Table(
+            "match_performances",
+            MetaData(),
+            *[Column(c.name, c.type, primary_key=c.primary_key, index=c.index) for c in MatchPerformance.__table__.columns],
+        )
+        legacy.create(bind=self.engine)
+        self.db = SessionLocal()
+        rows = [performance_row(1, f"KR_{i}", i) for i in range(10)]
+        self.db.execute(legacy.insert(), rows + rows[:3] + rows[:1])
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_migration_dedupes_and_adds_indexes(self):
+        self.assertEqual(self.db.query(MatchPerformance).count(), 14)
+        kept = [row.id for row in self.db.query(MatchPerformance).order_by(MatchPerformance.id).limit(10)]
+
+        result = migrate_match_performance_indexes(self.engine)
+        self.assertEqual(result["duplicates_removed"], 4)
+        self.assertEqual(
+            sorted(result["created"]),
+            [
+                "ix_match_performances_summoner_created",
+                "ix_match_performances_summoner_lane_created",
+                "uq_match_performance_summoner_match",
+            ],
+        )
+        self.assertEqual(sorted(row.id for row in self.db.query(MatchPerformance)), kept)
+        indexes = {index["name"]: index for index in inspect(self.engine).get_indexes("match_performances")}
+        self.assertTrue(indexes["uq_match_performance_summoner_match"]["unique"])
+
+        insert_ignore(self.db, MatchPerformance, [performance_row(1, "KR_0", 0)])
+        self.db.commit()
+        self.assertEqual(self.db.query(MatchPerformance).count(), 10)
+
+        # Running it again is a no-op
+        self.assertEqual(migrate_match_performance_indexes(self.engine), {"duplicates_removed": 0, "created": []})
+
+
+if __name__ == '__main__':
+    unittest.main()
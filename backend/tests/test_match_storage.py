@@ -0,0 +1,186 @@
+import random
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from sqlalchemy import Column, MetaData, Table
+
+from backend.collector.backfill import backfill_compressed_raw, run_raw_storage_benchmark
+from backend.collector.collector_service import CollectorService
+from backend.core_api.main import app
+from backend.core_api.playstyle_tags import load_advanced_dimensions_by_match
+from backend.shared import match_storage
+from backend.shared.database import (
+    SessionLocal,
+    Summoner,
+    MatchDetail,
+    MatchRawDictionary,
+)
+from backend.shared.match_storage import (
+    DICTIONARY_SIZE,
+    compress_payload,
+    decode_raw,
+    load_raw_matches,
+    reset_dictionary_cache,
+    train_dictionary,
+)
+from backend.shared.migrations import migrate_match_detail_storage, upgrade_database
+from backend.tests.helpers import make_detail
+
+
+def make_details(count, seed, prefix="KR"):
+    rng = random.Random(seed)
+    return [make_detail(f"{prefix}_{i}", ["p1"] + [f"x{i}_{k}" for k in range(9)], rng) for i in range(count)]
+
+
+class TestMatchStorage(unittest.TestCase):
+    def setUp(self):
+        reset_dictionary_cache()
+        self.db = SessionLocal()
+        self.summoner = Summoner(summoner_name="Faker", puuid="p1", summoner_id="s1", summoner_level=30)
+        self.db.add(self.summoner)
+        self.db.commit()
+        self.details = make_details(40, seed=3)
+
+    def tearDown(self):
+        self.db.close()
+        reset_dictionary_cache()
+
+    def write(self, details, mode):
+        registered = {"p1": (self.summoner.id, self.summoner.summoner_name)}
+        service = CollectorService()
+        try:
+            with mock.patch.object(match_storage, "MATCH_RAW_STORAGE", mode):
+                service._write_rows(
+                    self.db,
+                    [{"match_id": d["metadata"]["matchId"], "raw": d} for d in details],
+                    [row for d in details for row in CollectorService._extract_match_rows(d, registered)],
+                )
+        finally:
+            service.db.close()
+
+    def test_accessor_round_trips_every_mode(self):
+        detail = self.details[0]
+        with mock.patch.object(match_storage, "MATCH_RAW_STORAGE", "zlib"):
+            self.db.add(MatchDetail(match_id="KR_zlib", raw=detail))
+        self.db.add(MatchDetail(match_id="KR_json", raw=detail))
+        self.db.commit()
+        self.db.expire_all()
+
+        stored = {row.match_id: row for row in self.db.query(MatchDetail)}
+        self.assertIsNone(stored["KR_zlib"].raw_json)
+        self.assertIsNotNone(stored["KR_zlib"].raw_compressed)
+        self.assertIsNone(stored["KR_json"].raw_compressed)
+        self.assertEqual(stored["KR_zlib"].raw, detail)
+        self.assertEqual(stored["KR_json"].raw, detail)
+
+    def test_readers_see_the_same_payloads(self):
+        self.write(self.details[:20], "json")
+        self.write(self.details[20:], "zlib")
+        match_ids = [d["metadata"]["matchId"] for d in self.details]
+
+        loaded = load_raw_matches(self.db, match_ids)
+        self.assertEqual(loaded, {d["metadata"]["matchId"]: d for d in self.details})
+        service = CollectorService()
+        try:
+            self.assertEqual(service._load_stored_matches(self.db, match_ids), loaded)
+        finally:
+            service.db.close()
+        self.assertEqual(len(load_advanced_dimensions_by_match(self.db, match_ids, "p1", chunk_size=7)), 40)
+
+        response = TestClient(app).get(f"/matches/{match_ids[-1]}")
+        self.assertEqual(response.status_code, 200)
+
+    def test_dictionary_beats_plain_zlib_on_unseen_payloads(self):
+        dictionary = train_dictionary(self.details)
+        self.assertLessEqual(len(dictionary), DICTIONARY_SIZE)
+        unseen = make_details(20, seed=99, prefix="EUW")
+        plain = sum(len(compress_payload(d)) for d in unseen)
+        with_dictionary = sum(len(compress_payload(d, dictionary)) for d in unseen)
+        self.assertLess(with_dictionary, plain)
+        self.assertEqual(train_dictionary(self.details), dictionary)
+
+    def test_backfill_compresses_and_retrains(self):
+        self.write(self.details, "json")
+        self.assertEqual(backfill_compressed_raw(self.db, batch_size=15, sample_size=10), 40)
+        first = self.db.query(MatchRawDictionary).one()
+        self.assertEqual(first.sample_size, 10)
+
+        self.db.expire_all()
+        rows = self.db.query(MatchDetail).all()
+        self.assertTrue(all(row.raw_json is None and row.raw_dictionary_id == first.id for row in rows))
+        self.assertEqual({row.match_id: row.raw for row in rows}, {d["metadata"]["matchId"]: d for d in self.details})
+        # Nothing left to do until a new dictionary is trained
+        self.assertEqual(backfill_compressed_raw(self.db), 0)
+
+        # New rows pick up the newest dictionary; retraining moves every row to a new one
+        self.write(make_details(5, seed=7, prefix="NA"), "zlib")
+        self.assertEqual(self.db.query(MatchDetail).filter(MatchDetail.raw_dictionary_id == first.id).count(), 45)
+        self.assertEqual(backfill_compressed_raw(self.db, retrain=True), 45)
+        latest = self.db.query(MatchRawDictionary).order_by(MatchRawDictionary.id.desc()).first()
+        self.assertNotEqual(latest.id, first.id)
+        self.db.expire_all()
+        self.assertEqual(self.db.query(MatchDetail).filter(MatchDetail.raw_dictionary_id == latest.id).count(), 45)
+        self.assertEqual(len(load_raw_matches(self.db, [row.match_id for row in self.db.query(MatchDetail)])), 45)
+
+    def test_unknown_dictionary_is_an_error(self):
+        data = compress_payload(self.details[0], b"not a real dictionary")
+        with self.assertRaises(KeyError):
+            decode_raw(None, data, 12345)
+
+    def test_benchmark(self):
+        self.write(self.details, "json")
+        result = run_raw_storage_benchmark(self.db, sample_size=40)
+        self.assertEqual(result["matches"], 20)
+        self.assertIsNone(result["table_bytes"])
+        modes = result["modes"]
+        self.assertEqual(set(modes), {"json", "zlib", "zlib+dictionary"})
+        self.assertEqual(modes["json"]["ratio"], 1.0)
+        self.assertLess(modes["zlib"]["ratio"], 0.5)
+        self.assertLess(modes["zlib+dictionary"]["bytes"], modes["zlib"]["bytes"])
+
+
+class TestMatchDetailStorageMigration(unittest.TestCase):
+    def setUp(self):
+        reset_dictionary_cache()
+        # match_details as older databases have it: plain JSON only
+        MatchDetail.__table__.drop(bind=self.engine)
+        self.legacy = Table(
+            "match_details",
+            MetaData(),
+            *[Column(c.name, c.type, primary_key=c.primary_key) for c in MatchDetail.__table__.columns if c.name in ("id", "match_id", "raw")],
+        )
+        self.legacy.create(bind=self.engine)
+        self.details = make_details(5, seed=1)
+        with self.engine.begin() as conn:
+            conn.execute(self.legacy.insert(), [{"match_id": d["metadata"]["matchId"], "raw": d} for d in self.details])
+
+    def test_adds_columns_and_keeps_rows_readable(self):
+        self.assertEqual(migrate_match_detail_storage(self.engine), {"added": ["raw_compressed", "raw_dictionary_id"]})
+        self.assertEqual(migrate_match_detail_storage(self.engine), {"added": []})
+        db = SessionLocal()
+        try:
+            self.assertEqual([row.raw for row in db.query(MatchDetail).order_by(MatchDetail.id)], self.details)
+            self.assertEqual(backfill_compressed_raw(db), 5)
+            self.assertEqual(len(load_raw_matches(db, [d["metadata"]["matchId"] for d in self.details])), 5)
+        finally:
+            db.close()
+
+    def test_startup_upgrade_makes_rows_readable(self):
+        results = upgrade_database(self.engine)
+        self.assertEqual(results["match-detail-storage"], {"added": ["raw_compressed", "raw_dictionary_id"]})
+        db = SessionLocal()
+        try:
+            self.assertEqual(len(load_raw_matches(db, [d["metadata"]["matchId"] for d in self.details])), 5)
+        finally:
+            db.close()
+        self.assertEqual(upgrade_database(self.engine)["match-detail-storage"], {"added": []})
+
+    def test_api_upgrades_the_database_on_startup(self):
+        with mock.patch("backend.core_api.main.upgrade_database") as upgrade:
+            with TestClient(app):
+                upgrade.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
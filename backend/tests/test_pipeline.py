@@ -0,0 +1,84 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from backend.collector.collector_service import CollectorService
+from backend.collector.pipeline import IngestPipeline
+from backend.shared.database import SessionLocal, Summoner, MatchPerformance, MatchDetail
+from backend.tests.helpers import make_match
+
+
+class TestIngestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.summoner = Summoner(summoner_name="Faker", puuid="mock_puuid_123", summoner_id="s1", summoner_level=30)
+        self.db.add(self.summoner)
+        self.db.commit()
+        self.collector = CollectorService()
+        self.collector.riot_client = MagicMock()
+
+        self.all_ids = [f"KR_{i}" for i in range(110)]
+
+        def get_match_ids(puuid, start=0, count=20, start_time=None):
+            return self.all_ids[start:start + count]
+
+        def get_match_details(match_id):
+            time.sleep(0.002)
+            if match_id == "KR_7":
+                return None
+            return make_match(match_id)
+
+        self.collector.riot_client.get_match_ids.side_effect = get_match_ids
+        self.collector.riot_client.get_match_details.side_effect = get_match_details
+
+    def tearDown(self):
+        self.db.close()
+        self.collector.db.close()
+
+    def test_pipeline_ingests_all_pages(self):
+        self.db.add(MatchDetail(match_id="KR_3", raw=make_match("KR_3")))
+        self.db.commit()
+
+        completed_pages = []
+        pipeline = IngestPipeline(
+            self.collector,
+            fetch_workers=4,
+            queue_size=8,
+            batch_size=20,
+            on_page_complete=lambda session, start, ids: completed_pages.append((start, len(ids))),
+        )
+        saved = pipeline.run(self.db, self.summoner)
+
+        # KR_7 failed to download; KR_3 came from the local store
+        self.assertEqual(saved, 109)
+        self.assertEqual(self.db.query(MatchPerformance).count(), 109)
+        self.assertEqual(self.db.query(MatchDetail).count(), 109)
+        self.assertEqual(self.collector.riot_client.get_match_details.call_count, 109)
+        self.assertEqual(completed_pages, [(0, 50), (50, 50), (100, 10)])
+
+        stats = pipeline.stats()
+        self.assertEqual(stats["stages"]["pager"]["processed"], 110)
+        self.assertEqual(stats["stages"]["fetcher"]["processed"], 109)
+        self.assertEqual(stats["stages"]["parser"]["processed"], 110)
+        self.assertEqual(stats["stages"]["writer"]["processed"], 110)
+        for q in stats["queues"].values():
+            self.assertLessEqual(q["max_depth"], q["capacity"])
+
+    def test_slow_writer_applies_back_pressure(self):
+        original_write_rows = self.collector._write_rows
+
+        def slow_write_rows(*args):
+            time.sleep(0.05)
+            return original_write_rows(*args)
+
+        self.collector._write_rows = slow_write_rows
+        pipeline = IngestPipeline(self.collector, fetch_workers=4, queue_size=4, batch_size=5)
+        pipeline.run(self.db, self.summoner)
+
+        stats = pipeline.stats()
+        self.assertEqual(stats["queues"]["write"]["max_depth"], 4)
+        self.assertEqual(self.db.query(MatchPerformance).count(), 109)
+
+
+if __name__ == '__main__':
+    unittest.main()
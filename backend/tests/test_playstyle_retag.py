@@ -0,0 +1,96 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from backend.core_api.playstyle_retag import find_stale_summoner_ids, retag_population
+from backend.core_api.playstyle_tags import TAG_VERSION, compute_playstyle_tags_for_summoner, load_role_aggregates
+from backend.shared.database import (
+    SessionLocal,
+    Summoner,
+    MatchPerformance,
+    SummonerPlaystyleTag,
+    SummonerRoleAggregate,
+)
+
+
+class TestPlaystyleRetag(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+
+        rng = random.Random(9)
+        self.summoners = []
+        for n in range(9):
+            summoner = Summoner(summoner_name=f"Player{n}", puuid=f"p{n}", summoner_id=f"s{n}", summoner_level=30)
+            self.db.add(summoner)
+            self.db.commit()
+            self.summoners.append(summoner)
+            for i in range(rng.randint(0, 30)):
+                self.db.add(MatchPerformance(
+                    summoner_id=summoner.id,
+                    match_id=f"KR_{n}_{i}",
+                    game_creation=datetime(2025, 3, 1) - timedelta(hours=i),
+                    lane=rng.choice(["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"]),
+                    win=rng.random() < 0.6,
+                    kills=rng.randint(0, 15),
+                    deaths=rng.randint(0, 10),
+                    assists=rng.randint(0, 20),
+                    gold_per_min=rng.uniform(250, 550),
+                    vision_score=rng.randint(5, 90),
+                    total_minions_killed=rng.randint(0, 300),
+                    total_damage_dealt_to_champions=rng.randint(3000, 60000),
+                ))
+            self.db.commit()
+            load_role_aggregates(self.db, summoner)
+
+        earlier = datetime.utcnow() - timedelta(hours=1)
+        self.db.query(SummonerRoleAggregate).update({SummonerRoleAggregate.updated_at: earlier})
+        # 0-2: up to date, 3: old tag version, 4: matches changed after tagging, 5-8: never tagged
+        for n in range(5):
+            self.db.add(SummonerPlaystyleTag(
+                summoner_id=self.summoners[n].id,
+                tags=[],
+                games_used=0,
+                calculated_at=earlier + timedelta(minutes=10),
+                version="v0" if n == 3 else TAG_VERSION,
+            ))
+        self.db.commit()
+        aggregate = (
+            self.db.query(SummonerRoleAggregate)
+            .filter(SummonerRoleAggregate.summoner_id == self.summoners[4].id, SummonerRoleAggregate.role == "ALL")
+            .one()
+        )
+        aggregate.updated_at = earlier + timedelta(minutes=20)
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_finds_outdated_snapshots(self):
+        self.assertEqual(find_stale_summoner_ids(self.db), [s.id for s in self.summoners[3:]])
+
+    def test_retags_in_parallel_chunks(self):
+        reports = []
+        result = retag_population(chunk_size=2, workers=3, progress=lambda done, total: reports.append((done, total)))
+        self.assertEqual(result, {"total": 6, "retagged": 6, "failed_chunks": 0})
+        self.assertEqual(len(reports), 3)
+        self.assertEqual(reports[-1], (6, 6))
+
+        self.db.expire_all()
+        snapshots = {row.summoner_id: row for row in self.db.query(SummonerPlaystyleTag)}
+        self.assertEqual(len(snapshots), len(self.summoners))
+        for summoner in self.summoners[3:]:
+            tags, primary_role, total_games = compute_playstyle_tags_for_summoner(self.db, summoner)
+            snapshot = snapshots[summoner.id]
+            self.assertEqual(snapshot.version, TAG_VERSION)
+            self.assertEqual(snapshot.tags, tags)
+            self.assertEqual(snapshot.primary_role, primary_role)
+            self.assertEqual(snapshot.games_used, total_games)
+        # Up-to-date snapshots are left alone
+        for summoner in self.summoners[:3]:
+            self.assertEqual(snapshots[summoner.id].games_used, 0)
+
+        self.assertEqual(retag_population()["total"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,309 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from unittest.mock import MagicMock
+
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql
+
+from backend.collector.backfill import backfill_advanced_dimensions, backfill_role_aggregates
+from backend.collector.collector_service import CollectorService
+from backend.core_api.duo_synergy import _compute_overall_dimension_scores_for_summoner
+from backend.core_api.playstyle_tags import (
+    ADVANCED_DIMENSIONS,
+    ADVANCED_DIMENSIONS_VERSION,
+    ROLE_ALL,
+    _compute_advanced_dimensions_for_match,
+    _extract_participant,
+    compute_advanced_dimensions_for_role,
+    compute_dimension_scores_for_role,
+    compute_playstyle_tags_for_summoner,
+    dimension_scores_from_aggregate,
+    evaluate_tags_for_role,
+    load_role_aggregates,
+)
+from backend.shared.database import (
+    SessionLocal,
+    Summoner,
+    MatchPerformance,
+    MatchDetail,
+    MatchAdvancedDimension,
+    SummonerRoleAggregate,
+    Base,
+    insert_ignore,
+)
+from backend.shared.role_scores import ROLE_MAPPINGS, ROLES
+from backend.tests.helpers import make_detail
+
+
+def reference_advanced_dimensions(db, summoner, matches):
+    """One MatchDetail query per match, as before the bulk loader."""
+    sums = {k: 0.0 for k in ADVANCED_DIMENSIONS}
+    count = 0
+    for mp in matches:
+        db_match = db.query(MatchDetail).filter(MatchDetail.match_id == mp.match_id).first()
+        if not db_match or not db_match.raw:
+            continue
+        participant = _extract_participant(db_match.raw, summoner.puuid)
+        if not participant:
+            continue
+        adv = _compute_advanced_dimensions_for_match(db_match.raw, participant)
+        for k in sums:
+            sums[k] += adv[k]
+        count += 1
+    return {k: (v / count if count else 0.0) for k, v in sums.items()}
+
+
+class TestAdvancedDimensions(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.summoner = Summoner(summoner_name="Faker", puuid="p1", summoner_id="s1", summoner_level=30)
+        self.db.add(self.summoner)
+        self.db.commit()
+
+        rng = random.Random(3)
+        now = datetime(2025, 3, 1)
+        for i in range(450):
+            match_id = f"KR_{i}"
+            # Some matches have no stored detail, some don't include the summoner
+            if i % 17 != 0:
+                puuids = ["p2", "p3"] if i % 23 == 0 else ["p1", "p2", "p3"]
+                self.db.add(MatchDetail(match_id=match_id, raw=make_detail(match_id, puuids, rng)))
+            self.db.add(MatchPerformance(
+                summoner_id=self.summoner.id,
+                match_id=match_id,
+                game_creation=now - timedelta(hours=i),
+                lane="TOP",
+            ))
+        self.db.commit()
+        self.matches = self.db.query(MatchPerformance).all()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_matches_per_match_reference(self):
+        expected = reference_advanced_dimensions(self.db, self.summoner, self.matches)
+        actual = compute_advanced_dimensions_for_role(self.db, self.summoner, self.matches)
+        self.assertEqual(set(actual), set(expected))
+        for k in ADVANCED_DIMENSIONS:
+            self.assertAlmostEqual(actual[k], expected[k], places=9)
+
+    def capture_statements(self, fn):
+        self.db.refresh(self.summoner)
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(self.engine, "before_cursor_execute", listener)
+        try:
+            result = fn()
+        finally:
+            event.remove(self.engine, "before_cursor_execute", listener)
+        return result, statements
+
+    def test_chunked_raw_loading_on_first_use(self):
+        _, statements = self.capture_statements(
+            lambda: compute_advanced_dimensions_for_role(self.db, self.summoner, self.matches)
+        )
+        raw_loads = [s for s in statements if "FROM match_details" in s]
+        # 450 matches with the default chunk size of 200
+        self.assertEqual(len(raw_loads), 3)
+        self.assertTrue(all("IN" in s for s in raw_loads))
+
+    def test_stored_rows_are_averaged_without_raw_json(self):
+        written = backfill_advanced_dimensions(self.db, batch_size=100)
+        # p1 is in every stored match except every 23rd
+        self.assertEqual(written, sum(1 for i in range(450) if i % 17 != 0 and i % 23 != 0))
+        self.assertEqual(backfill_advanced_dimensions(self.db, batch_size=100), 0)
+
+        # Matches the summoner has a stored row for
+        matches = [mp for mp in self.matches if int(mp.match_id[3:]) % 17 != 0 and int(mp.match_id[3:]) % 23 != 0]
+        expected = reference_advanced_dimensions(self.db, self.summoner, matches)
+        actual, statements = self.capture_statements(
+            lambda: compute_advanced_dimensions_for_role(self.db, self.summoner, matches)
+        )
+        self.assertFalse([s for s in statements if "match_details" in s])
+        self.assertEqual(len([s for s in statements if "sum(" in s.lower()]), 3)
+        for k in ADVANCED_DIMENSIONS:
+            self.assertAlmostEqual(actual[k], expected[k], places=9)
+
+    def test_outdated_version_is_recomputed(self):
+        backfill_advanced_dimensions(self.db)
+        row = self.db.query(MatchAdvancedDimension).first()
+        row.version = ADVANCED_DIMENSIONS_VERSION - 1
+        row.early_aggro = 99.0
+        self.db.commit()
+
+        expected = reference_advanced_dimensions(self.db, self.summoner, self.matches)
+        actual = compute_advanced_dimensions_for_role(self.db, self.summoner, self.matches)
+        self.assertAlmostEqual(actual["earlyAggro"], expected["earlyAggro"], places=9)
+        self.assertEqual(
+            self.db.query(MatchAdvancedDimension).filter(MatchAdvancedDimension.version != ADVANCED_DIMENSIONS_VERSION).count(),
+            0,
+        )
+
+    def test_no_matches(self):
+        self.assertEqual(
+            compute_advanced_dimensions_for_role(self.db, self.summoner, []),
+            {k: 0.0 for k in ADVANCED_DIMENSIONS},
+        )
+
+
+def reference_role_dimensions(db, summoner):
+    """Full recompute over every stored match, role by role."""
+    result = {}
+    for role in ROLES:
+        matches = (
+            db.query(MatchPerformance)
+            .filter(MatchPerformance.summoner_id == summoner.id, MatchPerformance.lane.in_(ROLE_MAPPINGS[role]))
+            .all()
+        )
+        if matches:
+            result[role] = (compute_dimension_scores_for_role(db, summoner, matches), len(matches))
+    return result
+
+
+class TestRoleAggregates(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.service = CollectorService()
+        self.service.riot_client = MagicMock()
+
+    def tearDown(self):
+        self.db.close()
+        self.service.db.close()
+
+    def assertDimensionsEqual(self, actual, expected):
+        for field, value in expected.__dict__.items():
+            self.assertAlmostEqual(getattr(actual, field), value, places=9, msg=field)
+
+    def ingest_random_history(self, seed):
+        """Some matches stored before aggregates existed, the rest written by the collector in random batches."""
+        rng = random.Random(seed)
+        summoners = [
+            Summoner(summoner_name=f"Player{n}", puuid=f"p{n}", summoner_id=f"s{n}", summoner_level=30)
+            for n in range(3)
+        ]
+        self.db.add_all(summoners)
+        self.db.commit()
+        registered = {s.puuid: (s.id, s.summoner_name) for s in summoners}
+
+        details = []
+        for i in range(rng.randint(20, 80)):
+            puuids = [s.puuid for s in summoners if rng.random() < 0.6] + ["unregistered"]
+            details.append(make_detail(f"KR_{seed}_{i}", puuids, rng))
+
+        legacy = rng.randint(0, len(details) // 2)
+        for detail in details[:legacy]:
+            self.db.add(MatchDetail(match_id=detail["metadata"]["matchId"], raw=detail))
+            insert_ignore(self.db, MatchPerformance, CollectorService._extract_match_rows(detail, registered))
+        self.db.commit()
+
+        pending = details[legacy:]
+        while pending:
+            size = rng.randint(1, 10)
+            batch, pending = pending[:size], pending[size:]
+            self.service._write_rows(
+                self.db,
+                [{"match_id": d["metadata"]["matchId"], "raw": d} for d in batch],
+                [row for d in batch for row in CollectorService._extract_match_rows(d, registered)],
+                [row for d in batch for row in CollectorService._extract_dimension_rows(d, registered)],
+            )
+        return summoners
+
+    def test_running_sums_match_full_recompute(self):
+        for seed in range(6):
+            self.db.close()
+            Base.metadata.drop_all(bind=self.engine)
+            Base.metadata.create_all(bind=self.engine)
+            self.db = SessionLocal()
+            for summoner in self.ingest_random_history(seed):
+                aggregates = load_role_aggregates(self.db, summoner)
+                expected = reference_role_dimensions(self.db, summoner)
+                self.assertEqual(
+                    {role for role in ROLES if role in aggregates and aggregates[role].games},
+                    set(expected),
+                )
+                for role, (dims, games) in expected.items():
+                    self.assertEqual(aggregates[role].games, games)
+                    self.assertDimensionsEqual(dimension_scores_from_aggregate(aggregates[role]), dims)
+
+                all_matches = self.db.query(MatchPerformance).filter(MatchPerformance.summoner_id == summoner.id).all()
+                self.assertEqual(aggregates[ROLE_ALL].games, len(all_matches))
+                overall, games = _compute_overall_dimension_scores_for_summoner(self.db, summoner)
+                self.assertEqual(games, len(all_matches))
+                if all_matches:
+                    self.assertDimensionsEqual(overall, compute_dimension_scores_for_role(self.db, summoner, all_matches))
+
+                tags, primary_role, total_games = compute_playstyle_tags_for_summoner(self.db, summoner)
+                expected_tags = []
+                for role, (dims, games) in expected.items():
+                    for tag in evaluate_tags_for_role(dims, games, role):
+                        if tag["id"] not in [t["id"] for t in expected_tags]:
+                            expected_tags.append(tag)
+                self.assertEqual([t["id"] for t in tags], [t["id"] for t in expected_tags])
+                self.assertEqual(total_games, sum(games for _, games in expected.values()))
+                if expected:
+                    self.assertEqual(primary_role, max(expected.items(), key=lambda item: item[1][1])[0])
+
+    def test_writers_of_a_summoner_take_turns(self):
+        summoner = Summoner(summoner_name="Player", puuid="p0", summoner_id="s0", summoner_level=30)
+        self.db.add(summoner)
+        self.db.commit()
+        detail = make_detail("KR_lock", ["p0"], random.Random(1))
+        registered = {"p0": (summoner.id, "Player")}
+
+        statements = []
+        def listener(state):
+            if state.is_select:
+                statements.append(str(state.statement.compile(dialect=mysql.dialect())))
+
+        event.listen(self.db, "do_orm_execute", listener)
+        try:
+            self.service._write_rows(
+                self.db,
+                [{"match_id": "KR_lock", "raw": detail}],
+                CollectorService._extract_match_rows(detail, registered),
+                CollectorService._extract_dimension_rows(detail, registered),
+            )
+        finally:
+            event.remove(self.db, "do_orm_execute", listener)
+        # The summoner rows are locked before anything else, then existing rows are read past the snapshot
+        self.assertIn("FROM summoners", statements[0])
+        self.assertTrue(statements[0].endswith("FOR UPDATE"))
+        self.assertIn("FROM match_performances", statements[1])
+        self.assertTrue(statements[1].endswith("LOCK IN SHARE MODE"))
+
+    def test_tags_read_only_the_aggregate_rows(self):
+        summoner = self.ingest_random_history(42)[0]
+        load_role_aggregates(self.db, summoner)
+        self.db.refresh(summoner)
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(self.engine, "before_cursor_execute", listener)
+        try:
+            compute_playstyle_tags_for_summoner(self.db, summoner)
+        finally:
+            event.remove(self.engine, "before_cursor_execute", listener)
+        self.assertEqual(len(statements), 1)
+        self.assertIn("summoner_role_aggregates", statements[0])
+
+    def test_backfill_rebuilds_aggregates(self):
+        summoners = self.ingest_random_history(7)
+        before = {
+            (row.summoner_id, row.role): (row.games, row.adv_games)
+            for row in self.db.query(SummonerRoleAggregate)
+        }
+        self.db.query(SummonerRoleAggregate).delete()
+        self.db.commit()
+
+        self.assertEqual(backfill_role_aggregates(self.db), len(summoners))
+        after = {
+            (row.summoner_id, row.role): (row.games, row.adv_games)
+            for row in self.db.query(SummonerRoleAggregate)
+        }
+        self.assertEqual(after, before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+import unittest
+from unittest import mock
+
+from backend.collector.rate_limiter import RateLimiter, RedisRateLimiter, parse_rate_limit_header
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(app_limits="5:1,20:10", margin=1, clock=self.clock)
+
+    def test_parse_rate_limit_header(self):
+        self.assertEqual(parse_rate_limit_header("20:1,100:120"), [(20, 1), (100, 120)])
+        self.assertEqual(parse_rate_limit_header(None), [])
+        self.assertEqual(parse_rate_limit_header("bad,3:5"), [(3, 5)])
+
+    def test_stays_under_app_limit(self):
+        for _ in range(4):
+            self.assertEqual(self.limiter.reserve("asia", "match-v5.getMatch"), 0.0)
+        # 5th request would hit the limit exactly; margin keeps us one below
+        wait = self.limiter.reserve("asia", "match-v5.getMatch")
+        self.assertAlmostEqual(wait, 1.0)
+
+        self.clock.now += 1.0
+        self.assertEqual(self.limiter.reserve("asia", "match-v5.getMatch"), 0.0)
+
+    def test_app_limit_shared_across_methods_but_not_routings(self):
+        for _ in range(4):
+            self.limiter.reserve("asia", "match-v5.getMatch")
+        self.assertGreater(self.limiter.reserve("asia", "match-v5.getMatchIdsByPUUID"), 0.0)
+        self.assertEqual(self.limiter.reserve("kr", "summoner-v4.getByPUUID"), 0.0)
+
+    def test_method_limits_from_headers(self):
+        self.limiter.update_from_headers("asia", "match-v5.getMatch", {
+            "X-App-Rate-Limit": "100:1",
+            "X-App-Rate-Limit-Count": "1:1",
+            "X-Method-Rate-Limit": "3:10",
+            "X-Method-Rate-Limit-Count": "1:10",
+        })
+        # method bucket: 3 allowed, margin 1, one already spent server-side
+        self.assertEqual(self.limiter.reserve("asia", "match-v5.getMatch"), 0.0)
+        wait = self.limiter.reserve("asia", "match-v5.getMatch")
+        self.assertAlmostEqual(wait, 10.0)
+        # other methods only share the (raised) app limit
+        for _ in range(10):
+            self.assertEqual(self.limiter.reserve("asia", "match-v5.getMatchIdsByPUUID"), 0.0)
+
+    def test_penalize_blocks_scope(self):
+        delay = self.limiter.penalize("asia", "match-v5.getMatch", {"Retry-After": "7", "X-Rate-Limit-Type": "method"})
+        self.assertEqual(delay, 7.0)
+        self.assertAlmostEqual(self.limiter.reserve("asia", "match-v5.getMatch"), 7.0)
+        self.assertEqual(self.limiter.reserve("asia", "match-v5.getMatchIdsByPUUID"), 0.0)
+
+        self.limiter.penalize("asia", "match-v5.getMatch", {"Retry-After": "3", "X-Rate-Limit-Type": "application"})
+        self.assertAlmostEqual(self.limiter.reserve("asia", "match-v5.getMatchIdsByPUUID"), 3.0)
+
+        self.clock.now += 7.0
+        self.assertEqual(self.limiter.reserve("asia", "match-v5.getMatch"), 0.0)
+
+
+class FakeRedis:
+    """The subset of redis.Redis the rate limiter uses, with key expiry driven by a FakeClock."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+        self.expires = {}
+
+    def _alive(self, key):
+        if key in self.expires and self.clock() >= self.expires[key]:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def incr(self, key):
+        self.data[key] = (self.data[key] if self._alive(key) else 0) + 1
+        return self.data[key]
+
+    def decr(self, key):
+        self.data[key] = (self.data[key] if self._alive(key) else 0) - 1
+        return self.data[key]
+
+    def expire(self, key, seconds):
+        self.expires[key] = self.clock() + seconds
+        return True
+
+    def set(self, key, value, px=None):
+        self.data[key] = value
+        if px is not None:
+            self.expires[key] = self.clock() + px / 1000.0
+        return True
+
+    def pttl(self, key):
+        if not self._alive(key):
+            return -2
+        if key not in self.expires:
+            return -1
+        return int(round((self.expires[key] - self.clock()) * 1000))
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class TestRedisRateLimiter(unittest.TestCase):
+    """Two limiters on one Redis stand in for two Celery workers."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.redis = FakeRedis(self.clock)
+        patches = [
+            mock.patch("redis.Redis.from_url", return_value=self.redis),
+            # Buckets are aligned to wall-clock time
+            mock.patch("backend.collector.rate_limiter.time.time", self.clock),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.worker_a = RedisRateLimiter("redis://fake", app_limits="5:1,20:10", margin=1, clock=self.clock)
+        self.worker_b = RedisRateLimiter("redis://fake", app_limits="5:1,20:10", margin=1, clock=self.clock)
+
+    def counts(self):
+        return {key.split(":")[-2]: value for key, value in self.redis.data.items() if ":blocked:" not in key}
+
+    def test_reserve_shares_budget_across_workers(self):
+        for _ in range(2):
+            self.assertEqual(self.worker_a.reserve("asia", "match-v5.getMatch"), 0.0)
+            self.assertEqual(self.worker_b.reserve("asia", "match-v5.getMatch"), 0.0)
+        self.assertAlmostEqual(self.worker_a.reserve("asia", "match-v5.getMatch"), 1.0)
+        self.assertAlmostEqual(self.worker_b.reserve("asia", "match-v5.getMatchIdsByPUUID"), 1.0)
+        self.assertEqual(self.worker_b.reserve("kr", "summoner-v4.getByPUUID"), 0.0)
+
+        self.clock.now += 1.0
+        self.assertEqual(self.worker_b.reserve("asia", "match-v5.getMatch"), 0.0)
+
+    def test_rejected_reservation_gives_its_slots_back(self):
+        for _ in range(4):
+            self.worker_a.reserve("asia", "match-v5.getMatch")
+        for _ in range(10):
+            self.assertGreater(self.worker_b.reserve("asia", "match-v5.getMatch"), 0.0)
+        # Rejected requests count against neither window
+        self.assertEqual(self.counts(), {"1": 4, "10": 4})
+
+        self.clock.now += 1.0
+        for _ in range(4):
+            self.assertEqual(self.worker_b.reserve("asia", "match-v5.getMatch"), 0.0)
+        self.assertEqual(self.counts()["10"], 8)
+
+    def test_penalize_blocks_scope_for_every_worker(self):
+        delay = self.worker_a.penalize("asia", "match-v5.getMatch", {"Retry-After": "7", "X-Rate-Limit-Type": "method"})
+        self.assertEqual(delay, 7.0)
+        self.assertAlmostEqual(self.worker_b.reserve("asia", "match-v5.getMatch"), 7.0)
+        self.assertEqual(self.worker_b.reserve("asia", "match-v5.getMatchIdsByPUUID"), 0.0)
+
+        self.worker_a.penalize("asia", "match-v5.getMatch", {"Retry-After": "3", "X-Rate-Limit-Type": "application"})
+        self.assertAlmostEqual(self.worker_b.reserve("asia", "match-v5.getMatchIdsByPUUID"), 3.0)
+        self.assertEqual(self.worker_b.reserve("kr", "match-v5.getMatch"), 0.0)
+
+        self.clock.now += 7.0
+        self.assertEqual(self.worker_b.reserve("asia", "match-v5.getMatch"), 0.0)
+
+    def test_penalize_without_retry_after_uses_default_delay(self):
+        self.assertEqual(self.worker_a.penalize("asia", "match-v5.getMatch"), 2.0)
+        self.assertAlmostEqual(self.worker_b.reserve("asia", "match-v5.getMatch"), 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,267 @@
+import random
+import time
+import unittest
+from unittest import mock
+
+import redis
+from sqlalchemy import event
+from fastapi.testclient import TestClient
+
+from backend.collector.collector_service import CollectorService
+from backend.core_api import main
+from backend.core_api.playstyle_tags import upsert_playstyle_snapshot
+from backend.shared.cache import ResponseCache
+from backend.shared.database import SessionLocal, Summoner
+from backend.tests.helpers import make_full_match
+
+
+class FakeRedis:
+    """The subset of redis.Redis the response cache uses."""
+
+    def __init__(self):
+        self.data = {}
+        self.down = False
+        self.failing_incrs = 0
+
+    def _check(self):
+        if self.down:
+            raise redis.ConnectionError("connection refused")
+
+    def get(self, key):
+        self._check()
+        return self.data.get(key)
+
+    def mget(self, keys):
+        self._check()
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self._check()
+        self.data[key] = value
+
+    def incr(self, key):
+        self._check()
+        if self.failing_incrs:
+            self.failing_incrs -= 1
+            raise redis.TimeoutError("timed out")
+        value = int(self.data.get(key, 0)) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.faker = Summoner(summoner_name="Faker", puuid="p1", summoner_id="s1", summoner_level=30)
+        self.keria = Summoner(summoner_name="Keria", puuid="p2", summoner_id="s2", summoner_level=40)
+        self.db.add_all([self.faker, self.keria])
+        self.db.commit()
+
+        self.redis = FakeRedis()
+        self.cache = ResponseCache(client=self.redis, enabled=True)
+        self.patches = [
+            mock.patch(f"{module}.response_cache", self.cache)
+            for module in (
+                "backend.core_api.main",
+                "backend.collector.collector_service",
+                "backend.shared.leaderboard",
+                "backend.core_api.playstyle_tags",
+            )
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.client = TestClient(main.app)
+        self.rng = random.Random(3)
+        self.match_count = 0
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.db.close()
+
+    def ingest(self, count, puuids=("p1", "p2")):
+        registered = {s.puuid: (s.id, s.summoner_name) for s in (self.faker, self.keria)}
+        details = []
+        for _ in range(count):
+            match_id = f"KR_{self.match_count}"
+            self.match_count += 1
+            others = [f"{match_id}_x{k}" for k in range(10 - len(puuids))]
+            detail = make_full_match(match_id, self.rng, list(puuids) + others)
+            # Recent enough for every leaderboard timeframe
+            detail["info"]["gameCreation"] = int((time.time() - 3600) * 1000)
+            details.append(detail)
+        service = CollectorService()
+        try:
+            service._write_rows(
+                self.db,
+                [{"match_id": d["metadata"]["matchId"], "raw": d} for d in details],
+                [row for d in details for row in CollectorService._extract_match_rows(d, registered)],
+                [row for d in details for row in CollectorService._extract_dimension_rows(d, registered)],
+                [row for d in details for row in CollectorService._extract_team_rows(d, registered)],
+            )
+            service._refresh_derived(self.db, {self.faker.id, self.keria.id})
+        finally:
+            service.db.close()
+        return details
+
+    def get(self, path, **params):
+        response = self.client.get(path, params=params)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response
+
+    def test_hits_until_ingest_invalidates(self):
+        self.ingest(6)
+        paths = [
+            ("/summoners/Faker/scores", {}),
+            ("/summoners/Faker/playstyle-tags", {}),
+            ("/duo/synergy", {"summoner1": "Faker", "summoner2": "Keria"}),
+            ("/leaderboard", {"timeframe": "yearly"}),
+            ("/matches/KR_0", {}),
+        ]
+        first = {path: self.get(path, **params) for path, params in paths}
+        for path, params in paths:
+            self.assertEqual(first[path].headers["X-Cache"], "MISS")
+            again = self.get(path, **params)
+            self.assertEqual(again.headers["X-Cache"], "HIT")
+            self.assertEqual(again.json(), first[path].json())
+
+        # Hits never touch the DB
+        main.app.dependency_overrides[main.get_db] = lambda: mock.Mock(spec=[])
+        try:
+            for path, params in paths:
+                self.assertEqual(self.get(path, **params).headers["X-Cache"], "HIT")
+        finally:
+            main.app.dependency_overrides.clear()
+
+        # Faker plays ranked games alone: every response depending on Faker is recomputed
+        self.ingest(4, puuids=("p1",))
+        scores = self.get("/summoners/Faker/scores")
+        self.assertEqual(scores.headers["X-Cache"], "MISS")
+        self.assertNotEqual(scores.json(), first["/summoners/Faker/scores"].json())
+        self.assertEqual(self.get("/duo/synergy", summoner1="Faker", summoner2="Keria").headers["X-Cache"], "MISS")
+        leaderboard = self.get("/leaderboard", timeframe="yearly")
+        self.assertEqual(leaderboard.headers["X-Cache"], "MISS")
+        self.assertNotEqual(leaderboard.json(), first["/leaderboard"].json())
+        # Stored matches are immutable
+        self.assertEqual(self.get("/matches/KR_0").headers["X-Cache"], "HIT")
+
+        # A new playstyle snapshot is visible immediately
+        upsert_playstyle_snapshot(self.db, self.faker)
+        tags = self.get("/summoners/Faker/playstyle-tags")
+        self.assertEqual(tags.headers["X-Cache"], "MISS")
+        self.assertGreater(tags.json()["games_used"], 0)
+
+    def test_write_during_computation_is_not_cached(self):
+        self.ingest(3)
+        real = main._compute_role_scores_for_summoner
+
+        def compute_then_ingest(summoner, db, since=None):
+            result = real(summoner, db, since)
+            self.ingest(2)
+            return result
+
+        with mock.patch.object(main, "_compute_role_scores_for_summoner", side_effect=compute_then_ingest):
+            stale = self.get("/summoners/Faker/scores").json()
+        fresh = self.get("/summoners/Faker/scores")
+        self.assertEqual(fresh.headers["X-Cache"], "MISS")
+        self.assertNotEqual(fresh.json(), stale)
+
+    def test_versions_are_read_before_the_computing_snapshot(self):
+        self.ingest(3)
+        events = []
+        real_versions = self.cache.versions
+
+        def record_begin(conn):
+            events.append("begin")
+
+        def record_versions(names):
+            events.append("versions")
+            return real_versions(names)
+
+        event.listen(self.engine, "begin", record_begin)
+        try:
+            with mock.patch.object(self.cache, "versions", side_effect=record_versions):
+                for path, params in (
+                    ("/summoners/Faker/scores", {}),
+                    ("/summoners/Faker/playstyle-tags", {}),
+                    ("/duo/synergy", {"summoner1": "Faker", "summoner2": "Keria"}),
+                ):
+                    events.clear()
+                    self.assertEqual(self.get(path, **params).headers["X-Cache"], "MISS")
+                    # The lookup's transaction ends and the response is computed in a new one
+                    read_at = events.index("versions")
+                    self.assertEqual(events[:read_at], ["begin"], path)
+                    self.assertEqual(events[read_at + 1:], ["begin"], path)
+        finally:
+            event.remove(self.engine, "begin", record_begin)
+
+    @mock.patch("backend.shared.cache.time.sleep")
+    def test_falls_back_to_db_when_redis_is_down(self, _sleep):
+        self.ingest(3)
+        self.get("/summoners/Faker/scores")
+        self.redis.down = True
+        response = self.get("/summoners/Faker/scores")
+        self.assertEqual(response.headers["X-Cache"], "MISS")
+
+        # Invalidations missed while Redis was down flush everything once it is back
+        self.ingest(2)
+        self.redis.down = False
+        self.cache._down_until = 0.0
+        fresh = self.get("/summoners/Faker/scores")
+        self.assertEqual(fresh.headers["X-Cache"], "MISS")
+        self.assertNotEqual(fresh.json(), response.json())
+
+    @mock.patch("backend.shared.cache.time.sleep")
+    def test_invalidation_is_retried(self, _sleep):
+        self.ingest(3)
+        stale = self.get("/summoners/Faker/scores")
+        self.redis.failing_incrs = 2
+        self.ingest(2)
+        fresh = self.get("/summoners/Faker/scores")
+        self.assertEqual(fresh.headers["X-Cache"], "MISS")
+        self.assertNotEqual(fresh.json(), stale.json())
+        # Nothing was lost, so the cache kept working
+        self.assertEqual(self.get("/summoners/Faker/scores").headers["X-Cache"], "HIT")
+
+    @mock.patch("backend.shared.cache.time.sleep")
+    def test_lost_invalidation_is_noticed_by_other_processes(self, _sleep):
+        # The collector runs in another process with its own cache client
+        collector_cache = ResponseCache(client=self.redis, enabled=True)
+        with mock.patch("backend.collector.collector_service.response_cache", collector_cache), \
+                mock.patch("backend.shared.leaderboard.response_cache", collector_cache), \
+                mock.patch("backend.core_api.playstyle_tags.response_cache", collector_cache):
+            self.ingest(3)
+            stale = self.get("/summoners/Faker/scores")
+            self.redis.down = True
+            self.assertEqual(self.get("/summoners/Faker/scores").headers["X-Cache"], "MISS")
+            self.ingest(2)
+        self.redis.down = False
+        self.cache._down_until = 0.0
+        fresh = self.get("/summoners/Faker/scores")
+        self.assertEqual(fresh.headers["X-Cache"], "MISS")
+        self.assertNotEqual(fresh.json(), stale.json())
+
+    def test_hit_runs_no_query(self):
+        self.ingest(20)
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, "before_cursor_execute", count)
+        self.addCleanup(event.remove, self.engine, "before_cursor_execute", count)
+        self.assertEqual(self.get("/summoners/Faker/scores").headers["X-Cache"], "MISS")
+        self.assertTrue(statements)
+
+        statements.clear()
+        session = mock.Mock(wraps=SessionLocal())
+        self.addCleanup(session.close)
+        main.app.dependency_overrides[main.get_db] = lambda: session
+        self.addCleanup(main.app.dependency_overrides.clear)
+        self.assertEqual(self.get("/summoners/Faker/scores").headers["X-Cache"], "HIT")
+        self.assertEqual(statements, [])
+        session.query.assert_not_called()
+        session.execute.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
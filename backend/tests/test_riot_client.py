@@ -0,0 +1,18 @@
+import unittest
+from unittest import mock
+
+from backend.collector.config import Config
+from backend.collector.riot_client import RiotAPIClient
+
+
+class TestRiotAPIClientSession(unittest.TestCase):
+    def test_connection_pool_fits_every_fetch_thread(self):
+        with mock.patch.object(Config, "COLLECTOR_POLL_WORKERS", 3), mock.patch.object(Config, "COLLECTOR_FETCH_WORKERS", 7):
+            client = RiotAPIClient()
+        url = Config.RIOT_API_BASE_URL.format(routing="asia")
+        pool = client.session.get_adapter(url).poolmanager.connection_from_url(url)
+        self.assertEqual(pool.pool.maxsize, 21)
+
+
+if __name__ == '__main__':
+    unittest.main()
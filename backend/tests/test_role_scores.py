@@ -0,0 +1,92 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from backend.core_api.main import _compute_role_scores_for_summoner, ScoreResponse
+from backend.shared.role_scores import ROLE_MAPPINGS, score_role
+from backend.shared.database import SessionLocal, Summoner, MatchPerformance
+
+
+def reference_role_scores(summoner, db, since=None):
+    """Per-role implementation the aggregate query replaced."""
+    scores = []
+    for role in ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"]:
+        query = db.query(MatchPerformance).filter(
+            MatchPerformance.summoner_id == summoner.id,
+            MatchPerformance.lane.in_(ROLE_MAPPINGS[role]),
+        )
+        if since is not None:
+            query = query.filter(MatchPerformance.game_creation >= since)
+        matches = query.all()
+        if not matches:
+            continue
+        scores.append(ScoreResponse(**score_role(
+            role,
+            len(matches),
+            sum(1 for m in matches if m.win),
+            sum(m.kda for m in matches),
+            sum(m.gold_per_min for m in matches),
+            sum(m.vision_score for m in matches),
+        )))
+    return scores
+
+
+class TestRoleScores(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.summoner = Summoner(summoner_name="Faker", puuid="p1", summoner_id="s1", summoner_level=30)
+        self.db.add(self.summoner)
+        self.db.commit()
+
+        rng = random.Random(7)
+        lanes = ["TOP", "JUNGLE", "MIDDLE", "MID", "BOTTOM", "UTILITY", "SUPPORT", ""]
+        now = datetime(2025, 3, 1)
+        for i in range(300):
+            kills, deaths, assists = rng.randint(0, 15), rng.randint(0, 12), rng.randint(0, 20)
+            self.db.add(MatchPerformance(
+                summoner_id=self.summoner.id,
+                match_id=f"KR_{i}",
+                game_creation=now - timedelta(hours=i * 7),
+                lane=rng.choice(lanes),
+                win=rng.random() < 0.5,
+                kills=kills,
+                deaths=deaths,
+                assists=assists,
+                kda=(kills + assists) / max(1, deaths),
+                gold_per_min=rng.uniform(250, 550),
+                vision_score=rng.randint(5, 90),
+            ))
+        self.db.commit()
+        self.since = now - timedelta(days=30)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_matches_per_role_reference(self):
+        self.assertEqual(
+            _compute_role_scores_for_summoner(self.summoner, self.db),
+            reference_role_scores(self.summoner, self.db),
+        )
+        self.assertEqual(
+            _compute_role_scores_for_summoner(self.summoner, self.db, since=self.since),
+            reference_role_scores(self.summoner, self.db, since=self.since),
+        )
+
+    def test_single_query(self):
+        self.db.refresh(self.summoner)
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(self.engine, "before_cursor_execute", listener)
+        try:
+            scores = _compute_role_scores_for_summoner(self.summoner, self.db)
+        finally:
+            event.remove(self.engine, "before_cursor_execute", listener)
+        self.assertEqual(len(statements), 1)
+        self.assertIn("GROUP BY", statements[0])
+        self.assertEqual([s.role for s in scores], ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"])
+
+
+if __name__ == '__main__':
+    unittest.main()
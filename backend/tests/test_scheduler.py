@@ -0,0 +1,112 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from backend.collector.config import Config
+from backend.collector.scheduler import AdaptivePollScheduler, compute_poll_interval, estimate_backfill_cost, estimate_poll_cost
+from backend.shared.database import SessionLocal, Summoner, MatchPerformance, SummonerIngestState
+
+
+class FakeCollector:
+    def __init__(self):
+        self.polled = []
+
+    def poll_summoners(self, summoner_ids):
+        self.polled.extend(summoner_ids)
+
+
+class TestPollInterval(unittest.TestCase):
+    def test_interval_tiers(self):
+        now = datetime(2025, 3, 1)
+        self.assertEqual(compute_poll_interval(12, now, now), timedelta(minutes=15))
+        self.assertEqual(compute_poll_interval(4, now, now), timedelta(minutes=30))
+        self.assertEqual(compute_poll_interval(1, now, now), timedelta(minutes=120))
+        self.assertEqual(compute_poll_interval(0, now - timedelta(days=10), now), timedelta(minutes=360))
+        self.assertEqual(compute_poll_interval(0, now - timedelta(days=90), now), timedelta(days=1))
+        self.assertEqual(compute_poll_interval(0, None, now), timedelta(days=1))
+
+    def test_cost_estimate(self):
+        self.assertEqual(estimate_poll_cost(0, timedelta(days=1)), 1)
+        # 14 games a week polled daily: ~2 new matches per poll
+        self.assertEqual(estimate_poll_cost(14, timedelta(days=1)), 3)
+
+    @mock.patch.object(Config, "COLLECTOR_BACKFILL_MATCHES_ESTIMATE", 500)
+    def test_backfill_cost_estimate(self):
+        # 10 pages of 50: one list call plus 50 downloads each
+        self.assertEqual(estimate_backfill_cost(0), 10 * 51)
+        self.assertEqual(estimate_backfill_cost(450), 51)
+        # Histories longer than assumed still cost at least a page per poll
+        self.assertEqual(estimate_backfill_cost(800), 51)
+
+
+class TestAdaptivePollScheduler(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime(2025, 3, 1, 12, 0)
+        db = SessionLocal()
+        active = Summoner(summoner_name="Active", puuid="p1", summoner_id="s1", summoner_level=30)
+        dormant = Summoner(summoner_name="Dormant", puuid="p2", summoner_id="s2", summoner_level=30)
+        newbie = Summoner(summoner_name="Newbie", puuid="p3", summoner_id="s3", summoner_level=30)
+        db.add_all([active, dormant, newbie])
+        db.commit()
+        for i in range(12):
+            db.add(MatchPerformance(summoner_id=active.id, match_id=f"KR_{i}", game_creation=self.now - timedelta(hours=i)))
+        db.add(SummonerIngestState(summoner_id=active.id, backfill_complete=True, last_game_creation=self.now))
+        db.add(SummonerIngestState(
+            summoner_id=dormant.id,
+            backfill_complete=True,
+            last_game_creation=self.now - timedelta(days=200),
+            next_poll_at=self.now - timedelta(minutes=5),
+        ))
+        db.commit()
+        self.ids = {"active": active.id, "dormant": dormant.id, "newbie": newbie.id}
+        db.close()
+
+        self.collector = FakeCollector()
+        self.scheduler = AdaptivePollScheduler(self.collector, requests_per_minute=2, clock=lambda: self.now)
+
+    def test_budget_limits_polls_per_tick_and_earliest_goes_first(self):
+        self.scheduler.tick()
+        # Dormant was due earliest; budget of 2 leaves the third for the next minute
+        self.assertEqual(len(self.collector.polled), 2)
+        self.assertEqual(self.collector.polled[0], self.ids["dormant"])
+
+        self.scheduler.tick()
+        self.assertEqual(len(self.collector.polled), 2)
+
+        self.now += timedelta(minutes=1)
+        self.scheduler.tick()
+        self.assertEqual(sorted(self.collector.polled), sorted(self.ids.values()))
+
+    def test_next_poll_reflects_activity(self):
+        # Enough budget for Newbie's backfill too
+        self.scheduler = AdaptivePollScheduler(self.collector, requests_per_minute=100000, clock=lambda: self.now)
+        self.scheduler.tick()
+
+        db = SessionLocal()
+        states = {s.summoner_id: s for s in db.query(SummonerIngestState).all()}
+        db.close()
+        self.assertEqual(states[self.ids["active"]].next_poll_at, self.now + timedelta(minutes=15))
+        self.assertEqual(states[self.ids["dormant"]].next_poll_at, self.now + timedelta(days=1))
+
+        # Active player comes round again after 15 minutes, the dormant one doesn't
+        self.collector.polled = []
+        self.now += timedelta(minutes=15)
+        self.scheduler.tick()
+        self.assertEqual(self.collector.polled, [self.ids["active"]])
+
+    @mock.patch.object(Config, "COLLECTOR_BACKFILL_MATCHES_ESTIMATE", 500)
+    def test_unfinished_backfill_is_charged_by_remaining_pages(self):
+        self.scheduler = AdaptivePollScheduler(self.collector, requests_per_minute=100, clock=lambda: self.now)
+        self.scheduler.tick()
+        # Newbie's whole backfill doesn't fit what is left of this minute's budget
+        self.assertEqual(self.collector.polled, [self.ids["dormant"], self.ids["active"]])
+
+        self.now += timedelta(minutes=1)
+        self.scheduler.tick()
+        self.assertEqual(self.collector.polled[-1], self.ids["newbie"])
+        # ...and once it runs, later polls wait until its cost is paid back
+        self.assertEqual(self.scheduler.tokens, 100 - 10 * 51)
+
+
+if __name__ == '__main__':
+    unittest.main()
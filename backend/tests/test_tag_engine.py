@@ -0,0 +1,74 @@
+import random
+import unittest
+
+import numpy as np
+
+from backend.core_api.playstyle_tags import (
+    TAG_DEFINITIONS,
+    TAG_MATRIX,
+    DimensionScores,
+    evaluate_tags_batch,
+    evaluate_tags_for_role,
+)
+
+
+def reference_tags_for_role(dims, games, role):
+    """Per-definition loop the compiled matrix replaced."""
+    if games <= 0:
+        return []
+    results = []
+    for definition in TAG_DEFINITIONS:
+        if definition.role_scope not in ("ANY", role):
+            continue
+        if games < definition.min_games:
+            continue
+        if definition.risk_max is not None and dims.risk > definition.risk_max:
+            continue
+        score = 0.0
+        for key, weight in definition.weights.items():
+            score += getattr(dims, key, 0.0) * weight
+        if score >= definition.threshold:
+            results.append({"id": definition.id, "label_ko": definition.label_ko, "color": definition.color})
+    return results
+
+
+def random_dims(rng):
+    return DimensionScores(**{field: rng.random() for field in DimensionScores.model_fields})
+
+
+class TestTagEngine(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(5)
+        roles = ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY", "ALL"]
+        self.rows = [
+            (random_dims(rng), rng.choice([0, 1, 7, 8, 9, 10, 40]), rng.choice(roles))
+            for _ in range(2000)
+        ]
+
+    def test_compiled_shapes(self):
+        n_tags = len(TAG_DEFINITIONS)
+        self.assertEqual(TAG_MATRIX.weights.shape, (n_tags, len(DimensionScores.model_fields)))
+        self.assertEqual(TAG_MATRIX.thresholds.shape, (n_tags,))
+        # Every tag applies to its own role; unknown roles only get "ANY" tags
+        for t, definition in enumerate(TAG_DEFINITIONS):
+            self.assertEqual(bool(TAG_MATRIX.role_mask[TAG_MATRIX.other_role, t]), definition.role_scope == "ANY")
+            self.assertEqual(np.isfinite(TAG_MATRIX.risk_max[t]), definition.risk_max is not None)
+
+    def test_batch_matches_reference(self):
+        dims_list, games, roles = zip(*self.rows)
+        results = evaluate_tags_batch(list(dims_list), list(games), list(roles))
+        self.assertEqual(len(results), len(self.rows))
+        for (dims, g, role), tags in zip(self.rows, results):
+            self.assertEqual(tags, reference_tags_for_role(dims, g, role))
+        # The random rows should exercise both outcomes
+        self.assertTrue(any(results))
+        self.assertFalse(all(results))
+
+    def test_single_row(self):
+        for dims, games, role in self.rows[:100]:
+            self.assertEqual(evaluate_tags_for_role(dims, games, role), reference_tags_for_role(dims, games, role))
+        self.assertEqual(evaluate_tags_batch([], [], []), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -57,6 +57,7 @@ export interface MatchPerformance {
 export interface MatchListResponse {
   matches: MatchPerformance[];
   has_more: boolean;
+  next_cursor: string | null;
 }
 
 export interface MatchDetailParticipant {
@@ -130,9 +131,9 @@ export const api = {
   recommendComp: (names: string[]) => axios.post<AnalysisResponse>(`${API_URL}/analysis/recommend-comp`, { summoner_names: names }),
   updateRiotKey: (key: string) => axios.put(`${API_URL}/admin/config/riot-key`, { riot_api_key: key }),
   updateOpenAIKey: (key: string) => axios.put(`${API_URL}/admin/config/openai-key`, { openai_api_key: key }),
-  getMatches: (name: string, offset: number, limit: number) =>
+  getMatches: (name: string, limit: number, cursor?: string | null) =>
     axios.get<MatchListResponse>(`${API_URL}/summoners/${name}/matches`, {
-      params: { offset, limit },
+      params: cursor ? { cursor, limit } : { limit },
     }),
   getMatchDetail: (matchId: string) =>
     axios.get<MatchDetailResponse>(`${API_URL}/matches/${matchId}`),
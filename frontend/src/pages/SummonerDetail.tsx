@@ -23,7 +23,7 @@ const SummonerDetail: React.FC = () => {
   const [analysisLoading, setAnalysisLoading] = useState(false);
   const [analysisError, setAnalysisError] = useState<string | null>(null);
   const [matches, setMatches] = useState<MatchPerformance[]>([]);
-  const [matchesOffset, setMatchesOffset] = useState(0);
+  const [matchesCursor, setMatchesCursor] = useState<string | null>(null);
   const [hasMoreMatches, setHasMoreMatches] = useState(true);
   const [matchesLoading, setMatchesLoading] = useState(false);
   const [matchDetailOpen, setMatchDetailOpen] = useState(false);
@@ -64,12 +64,12 @@ const SummonerDetail: React.FC = () => {
     try {
       const [scoresRes, matchesRes] = await Promise.all([
         api.getScores(summonerName),
-        api.getMatches(summonerName, 0, PAGE_SIZE),
+        api.getMatches(summonerName, PAGE_SIZE),
       ]);
       setScores(scoresRes.data);
       setMatches(matchesRes.data.matches);
       setHasMoreMatches(matchesRes.data.has_more);
-      setMatchesOffset(matchesRes.data.matches.length);
+      setMatchesCursor(matchesRes.data.next_cursor);
       await loadPlaystyleTags(summonerName);
     } catch (err) {
       console.error(err);
@@ -131,10 +131,10 @@ const SummonerDetail: React.FC = () => {
 
     setMatchesLoading(true);
     try {
-      const res = await api.getMatches(name, matchesOffset, PAGE_SIZE);
+      const res = await api.getMatches(name, PAGE_SIZE, matchesCursor);
       setMatches((prev) => [...prev, ...res.data.matches]);
       setHasMoreMatches(res.data.has_more);
-      setMatchesOffset((prev) => prev + res.data.matches.length);
+      setMatchesCursor(res.data.next_cursor);
     } catch (err) {
       console.error(err);
     } finally {